@@ -147,8 +147,10 @@ def get_tool_description(tool):
 async def get_tools_(mcp_server):
     async with Client(mcp_server) as mcp_client:
         tools = await mcp_client.list_tools()
+        # Underscore-prefixed tools manage server-side state sessions and are
+        # not part of the library.
         tool_descriptions = ([
-            get_tool_description(tool) for tool in tools
+            get_tool_description(tool) for tool in tools if not tool.name.startswith("_")
         ])
         return tool_descriptions
     
@@ -1,12 +1,13 @@
-from mcp.server.fastmcp import FastMCP
+from tau_bench.envs.state_store import SessionFastMCP, get_data
 from typing import Any, Dict, List
 import json
 from copy import deepcopy
+from tau_bench.envs.airline import indexes
 
-mcp = FastMCP('MCP server for airline env')
+mcp = SessionFastMCP('MCP server for airline env', default_source="tau_bench.envs.airline.data:load_data")
 
 @mcp.tool()
-def calculate(data: Dict[str, Any], expression: str) -> str:
+def calculate(expression: str) -> str:
     """
     {
         "type": "function",
@@ -34,7 +35,7 @@ def calculate(data: Dict[str, Any], expression: str) -> str:
         return f"Error: {e}"
 
 @mcp.tool()
-def get_user_details(data: Dict[str, Any], user_id: str) -> str:
+def get_user_details(user_id: str) -> str:
     """
     {
         "type": "function",
@@ -54,13 +55,14 @@ def get_user_details(data: Dict[str, Any], user_id: str) -> str:
         },
     }
     """
+    data = get_data()
     users = data["users"]
     if user_id in users:
         return json.dumps(users[user_id])
     return "Error: user not found"
 
 @mcp.tool()
-def get_reservation_details(data: Dict[str, Any], reservation_id: str) -> str:
+def get_reservation_details(reservation_id: str) -> str:
     """
     {
         "type": "function",
@@ -80,13 +82,14 @@ def get_reservation_details(data: Dict[str, Any], reservation_id: str) -> str:
         },
     }
     """
+    data = get_data()
     reservations = data["reservations"]
     if reservation_id in reservations:
         return json.dumps(reservations[reservation_id])
     return "Error: user not found"
 
 @mcp.tool()
-def search_direct_flight(data: Dict[str, Any], origin: str, destination: str, date: str) -> str:
+def search_direct_flight(origin: str, destination: str, date: str) -> str:
     """
     {
         "type": "function",
@@ -114,21 +117,11 @@ def search_direct_flight(data: Dict[str, Any], origin: str, destination: str, da
         },
     }
     """
-    flights = data["flights"]
-    results = []
-    for flight in flights.values():
-        if flight["origin"] == origin and flight["destination"] == destination:
-            if (
-                date in flight["dates"]
-                and flight["dates"][date]["status"] == "available"
-            ):
-                # results add flight except dates, but add flight["datas"][date]
-                results.append({k: v for k, v in flight.items() if k != "dates"})
-                results[-1].update(flight["dates"][date])
-    return json.dumps(results)
+    data = get_data()
+    return json.dumps(indexes.search_direct_flights(data["flights"], origin, destination, date))
 
 @mcp.tool()
-def list_all_airports(data: Dict[str, Any]) -> str:
+def list_all_airports() -> str:
     """
     {
         "type": "function",
@@ -190,7 +183,7 @@ def list_all_airports(data: Dict[str, Any]) -> str:
     return json.dumps({airport: city for airport, city in zip(airports, cities)})
 
 @mcp.tool()
-def cancel_reservation(data: Dict[str, Any], reservation_id: str) -> str:
+def cancel_reservation(reservation_id: str) -> str:
     """
     {
         "type": "function",
@@ -210,6 +203,7 @@ def cancel_reservation(data: Dict[str, Any], reservation_id: str) -> str:
         },
     }
     """
+    data = get_data()
     reservations = data["reservations"]
     if reservation_id not in reservations:
         return "Error: reservation not found"
@@ -229,7 +223,7 @@ def cancel_reservation(data: Dict[str, Any], reservation_id: str) -> str:
     return json.dumps(reservation)
 
 @mcp.tool()
-def think(data: Dict[str, Any], thought: str) -> str:
+def think(thought: str) -> str:
     """
     {
         "type": "function",
@@ -253,7 +247,7 @@ def think(data: Dict[str, Any], thought: str) -> str:
     return ""
 
 @mcp.tool()
-def transfer_to_human_agents(data: Dict[str, Any], summary: str) -> str:
+def transfer_to_human_agents(summary: str) -> str:
     """
     {
         "type": "function",
@@ -277,7 +271,7 @@ def transfer_to_human_agents(data: Dict[str, Any], summary: str) -> str:
     return "Transfer successful"
 
 @mcp.tool()
-def search_onestop_flight(data: Dict[str, Any], origin: str, destination: str, date: str) -> str:
+def search_onestop_flight(origin: str, destination: str, date: str) -> str:
     """
     {
         "type": "function",
@@ -305,45 +299,11 @@ def search_onestop_flight(data: Dict[str, Any], origin: str, destination: str, d
         },
     }
     """
-    flights = data["flights"]
-    results = []
-    for flight1 in flights.values():
-        if flight1["origin"] == origin:
-            for flight2 in flights.values():
-                if (
-                    flight2["destination"] == destination
-                    and flight1["destination"] == flight2["origin"]
-                ):
-                    date2 = (
-                        f"2024-05-{int(date[-2:])+1}"
-                        if "+1" in flight1["scheduled_arrival_time_est"]
-                        else date
-                    )
-                    if (
-                        flight1["scheduled_arrival_time_est"]
-                        > flight2["scheduled_departure_time_est"]
-                    ):
-                        continue
-                    if date in flight1["dates"] and date2 in flight2["dates"]:
-                        if (
-                            flight1["dates"][date]["status"] == "available"
-                            and flight2["dates"][date2]["status"] == "available"
-                        ):
-                            result1 = {
-                                k: v for k, v in flight1.items() if k != "dates"
-                            }
-                            result1.update(flight1["dates"][date])
-                            result1["date"] = date
-                            result2 = {
-                                k: v for k, v in flight2.items() if k != "dates"
-                            }
-                            result2.update(flight2["dates"][date])
-                            result2["date"] = date2
-                            results.append([result1, result2])
-    return json.dumps(results)
+    data = get_data()
+    return json.dumps(indexes.search_onestop_flights(data["flights"], origin, destination, date))
 
 @mcp.tool()
-def book_reservation(data: Dict[str, Any], user_id: str, origin: str, destination: str, flight_type: str, cabin: str, flights: List[Dict[str, Any]], passengers: List[Dict[str, Any]], payment_methods: List[Dict[str, Any]], total_baggages: int, nonfree_baggages: int, insurance: str) -> str:
+def book_reservation(user_id: str, origin: str, destination: str, flight_type: str, cabin: str, flights: List[Dict[str, Any]], passengers: List[Dict[str, Any]], payment_methods: List[Dict[str, Any]], total_baggages: int, nonfree_baggages: int, insurance: str) -> str:
     """
     {
         "type": "function",
@@ -465,6 +425,7 @@ def book_reservation(data: Dict[str, Any], user_id: str, origin: str, destinatio
         },
     }
     """
+    data = get_data()
     reservations, users = data["reservations"], data["users"]
     if user_id not in users:
         return "Error: user not found"
@@ -547,7 +508,7 @@ def book_reservation(data: Dict[str, Any], user_id: str, origin: str, destinatio
     return json.dumps(reservation)
 
 @mcp.tool()
-def send_certificate(data: Dict[str, Any], user_id: str, amount: int) -> str:
+def send_certificate(user_id: str, amount: int) -> str:
     """
     {
         "type": "function",
@@ -571,6 +532,7 @@ def send_certificate(data: Dict[str, Any], user_id: str, amount: int) -> str:
         },
     }
     """
+    data = get_data()
     users = data["users"]
     if user_id not in users:
         return "Error: user not found"
@@ -588,7 +550,7 @@ def send_certificate(data: Dict[str, Any], user_id: str, amount: int) -> str:
             return f"Certificate {payment_id} added to user {user_id} with amount {amount}."
 
 @mcp.tool()
-def update_reservation_flights(data: Dict[str, Any], reservation_id: str, cabin: str, flights: List[Dict[str, Any]], payment_id: str) -> str:
+def update_reservation_flights(reservation_id: str, cabin: str, flights: List[Dict[str, Any]], payment_id: str) -> str:
     """
     {
         "type": "function",
@@ -638,6 +600,7 @@ def update_reservation_flights(data: Dict[str, Any], reservation_id: str, cabin:
         },
     }
     """
+    data = get_data()
     users, reservations = data["users"], data["reservations"]
     if reservation_id not in reservations:
         return "Error: reservation not found"
@@ -711,7 +674,7 @@ def update_reservation_flights(data: Dict[str, Any], reservation_id: str, cabin:
     return json.dumps(reservation)
 
 @mcp.tool()
-def update_reservation_passengers(data: Dict[str, Any], reservation_id: str, passengers: List[Dict[str, Any]]) -> str:
+def update_reservation_passengers(reservation_id: str, passengers: List[Dict[str, Any]]) -> str:
     """
     {
         "type": "function",
@@ -753,6 +716,7 @@ def update_reservation_passengers(data: Dict[str, Any], reservation_id: str, pas
         },
     }
     """
+    data = get_data()
     reservations = data["reservations"]
     if reservation_id not in reservations:
         return "Error: reservation not found"
@@ -763,7 +727,7 @@ def update_reservation_passengers(data: Dict[str, Any], reservation_id: str, pas
     return json.dumps(reservation)
 
 @mcp.tool()
-def update_reservation_baggages(data: Dict[str, Any], reservation_id: str, total_baggages: int, nonfree_baggages: int, payment_id: str) -> str:
+def update_reservation_baggages(reservation_id: str, total_baggages: int, nonfree_baggages: int, payment_id: str) -> str:
     """
     {
         "type": "function",
@@ -800,6 +764,7 @@ def update_reservation_baggages(data: Dict[str, Any], reservation_id: str, total
         },
     }
     """
+    data = get_data()
     users, reservations = data["users"], data["reservations"]
     if reservation_id not in reservations:
         return "Error: reservation not found"
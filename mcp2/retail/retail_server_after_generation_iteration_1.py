@@ -1,9 +1,9 @@
-from mcp.server.fastmcp import FastMCP
+from tau_bench.envs.state_store import SessionFastMCP, get_data
 from typing import Any, Dict, List
 import json
 from tau_bench.envs.my_data import global_data
 import builtins
-mcp = FastMCP('MCP server for retail env')
+mcp = SessionFastMCP('MCP server for retail env', default_source="tau_bench.envs.retail.data:load_data")
 
 import logging
 
@@ -31,9 +31,7 @@ def calculate(expression: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     if not all(char in "0123456789+-*/(). " for char in expression):
         return "Error: invalid characters in expression"
     try:
@@ -64,9 +62,7 @@ def get_user_details(user_id: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     users = data["users"]
     if user_id in users:
         return json.dumps(users[user_id])
@@ -93,9 +89,7 @@ def get_order_details(order_id: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     orders = data["orders"]
     if order_id in orders:
         return json.dumps(orders[order_id])
@@ -122,9 +116,7 @@ def get_product_details(product_id: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     products = data["products"]
     if product_id in products:
         return json.dumps(products[product_id])
@@ -151,9 +143,7 @@ def find_user_id_by_email(email: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     users = data["users"]
     for user_id, profile in users.items():
         if profile["email"].lower() == email.lower():
@@ -189,9 +179,7 @@ def find_user_id_by_name_zip(first_name: str, last_name: str, zip: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     users = data["users"]
     for user_id, profile in users.items():
         if (
@@ -218,9 +206,7 @@ def list_all_product_types() -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     products = data["products"]
     product_dict = {
         product["name"]: product["product_id"] for product in products.values()
@@ -254,9 +240,7 @@ def cancel_pending_order(order_id: str, reason: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     # check order exists and is pending
     orders = data["orders"]
     if order_id not in orders:
@@ -291,8 +275,6 @@ def cancel_pending_order(order_id: str, reason: str) -> str:
     order["cancel_reason"] = reason
     order["payment_history"].extend(refunds)
 
-    with open("data.json", "w") as f:
-        json.dump(data, f, indent=2)
 
     return json.dumps(order)
 
@@ -317,9 +299,7 @@ def get_input_from_user(thought: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     # This method does not change the state of the data; it simply returns an empty string.
     return ""
 
@@ -344,9 +324,7 @@ def think(thought: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     # This method does not change the state of the data; it simply returns an empty string.
     return ""
 
@@ -371,9 +349,7 @@ def transfer_to_human_agents(summary: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     # This method simulates the transfer to a human agent.
     return "Transfer successful"
 
@@ -421,9 +397,7 @@ def modify_pending_order_items(order_id: str, item_ids: List[str], new_item_ids:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     products, orders, users = data["products"], data["orders"], data["users"]
 
     # Check if the order exists and is pending
@@ -489,8 +463,6 @@ def modify_pending_order_items(order_id: str, item_ids: List[str], new_item_ids:
         item["options"] = products[item["product_id"]]["variants"][new_item_id]["options"]
     order["status"] = "pending (item modified)"
 
-    with open("data.json", "w") as f:
-        json.dump(data, f, indent=2)
     return json.dumps(order)
 
 @mcp.tool()
@@ -537,9 +509,7 @@ def exchange_delivered_order_items(order_id: str, item_ids: List[str], new_item_
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     products, orders, users = data["products"], data["orders"], data["users"]
 
     # check order exists and is delivered
@@ -593,8 +563,6 @@ def exchange_delivered_order_items(order_id: str, item_ids: List[str], new_item_
     order["exchange_payment_method_id"] = payment_method_id
     order["exchange_price_difference"] = diff_price
 
-    with open("data.json", "w") as f:
-        json.dump(data, f, indent=2)
     return json.dumps(order)
 
 @mcp.tool()
@@ -627,9 +595,7 @@ def return_delivered_order_items(order_id: str, item_ids: List[str], payment_met
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     orders = data["orders"]
 
     # Check if the order exists and is delivered
@@ -659,8 +625,6 @@ def return_delivered_order_items(order_id: str, item_ids: List[str], payment_met
     order["return_items"] = sorted(item_ids)
     order["return_payment_method_id"] = payment_method_id
 
-    with open("data.json", "w") as f:
-        json.dump(data, f, indent=2)
     return json.dumps(order)
 
 @mcp.tool()
@@ -716,9 +680,7 @@ def modify_pending_order_address(order_id: str, address1: str, address2: str, ci
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     # Check if the order exists and is pending
     orders = data["orders"]
     if order_id not in orders:
@@ -736,8 +698,6 @@ def modify_pending_order_address(order_id: str, address1: str, address2: str, ci
         "country": country,
         "zip": zip,
     }
-    with open("data.json", "w") as f:
-        json.dump(data, f, indent=2)
     return json.dumps(order)
 
 @mcp.tool()
@@ -768,9 +728,7 @@ def modify_pending_order_payment(order_id: str, payment_method_id: str) -> str:
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     orders = data["orders"]
 
     # Check if the order exists and is pending
@@ -836,8 +794,6 @@ def modify_pending_order_payment(order_id: str, payment_method_id: str) -> str:
         old_payment_method["balance"] += amount
         old_payment_method["balance"] = round(old_payment_method["balance"], 2)
 
-    with open("data.json", "w") as f:
-        json.dump(data, f, indent=2)
     return json.dumps(order)
 
 @mcp.tool()
@@ -893,9 +849,7 @@ def modify_user_address(user_id: str, address1: str, address2: str, city: str, s
         },
     }
     """
-    with open("data.json", "r") as f:
-        loaded_data = json.load(f)
-    data = loaded_data
+    data = get_data()
     users = data["users"]
     if user_id not in users:
         return "Error: user not found"
@@ -908,8 +862,6 @@ def modify_user_address(user_id: str, address1: str, address2: str, city: str, s
         "country": country,
         "zip": zip,
     }
-    with open("data.json", "w") as f:
-        json.dump(data, f, indent=2)
     return json.dumps(user)
 @mcp.tool()
 def count_available_product_variants(product_id):
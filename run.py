@@ -5,6 +5,7 @@ from tau_bench.types import RunConfig
 from tau_bench.run import run
 from litellm import provider_list
 from tau_bench.envs.user import UserStrategy
+from tau_bench.replay_provider import REPLAY_PROVIDER
 
 
 def parse_args() -> RunConfig:
@@ -27,7 +28,7 @@ def parse_args() -> RunConfig:
     parser.add_argument(
         "--model-provider",
         type=str,
-        choices=provider_list,
+        choices=provider_list + [REPLAY_PROVIDER],
         help="The model provider for the agent",
     )
     parser.add_argument(
@@ -39,7 +40,7 @@ def parse_args() -> RunConfig:
     parser.add_argument(
         "--user-model-provider",
         type=str,
-        choices=provider_list,
+        choices=provider_list + [REPLAY_PROVIDER],
         help="The model provider for the user simulator",
     )
     parser.add_argument(
@@ -73,6 +74,77 @@ def parse_args() -> RunConfig:
     )
     parser.add_argument("--seed", type=int, default=10)
     parser.add_argument("--ckpt-path", type=str, default="")
+    parser.add_argument(
+        "--completion-cache",
+        type=str,
+        default="off",
+        choices=["off", "read-write", "read-only", "replay-strict"],
+        help="Serve LLM calls from a disk cache; replay-strict fails on a cache miss",
+    )
+    parser.add_argument("--completion-cache-path", type=str, default=None)
+    parser.add_argument("--llm-rpm", type=int, default=None, help="Requests per minute allowed per model deployment")
+    parser.add_argument("--llm-tpm", type=int, default=None, help="Tokens per minute allowed per model deployment")
+    parser.add_argument(
+        "--llm-max-in-flight",
+        type=int,
+        default=None,
+        help="Upper bound of the adaptive in-flight window per model deployment",
+    )
+    parser.add_argument(
+        "--llm-max-retries",
+        type=int,
+        default=6,
+        help="Retries of a throttled or failed LLM call before the task fails",
+    )
+    parser.add_argument(
+        "--history-compaction",
+        type=str,
+        default="off",
+        choices=["off", "elide", "budget"],
+        help="Elide stale tool outputs from agent prompts; budget also truncates old ones to fit the token budget",
+    )
+    parser.add_argument(
+        "--history-token-budget",
+        type=int,
+        default=None,
+        help="Prompt token budget for --history-compaction budget (default: the model's context length)",
+    )
+    parser.add_argument(
+        "--observation-encoding",
+        type=str,
+        default="raw",
+        choices=["raw", "compact", "project"],
+        help="Re-encode JSON tool outputs compactly; project also applies the field projections declared by the tools",
+    )
+    parser.add_argument(
+        "--mcp-transport",
+        type=str,
+        default="stdio",
+        choices=["stdio", "inprocess"],
+        help="Run the MCP server in a subprocess (stdio) or in this process, sharing its datasets with forked workers",
+    )
+    parser.add_argument(
+        "--trace-path",
+        type=str,
+        default=None,
+        help="Write a Chrome trace-event JSON of every task, step, LLM call, tool call and user turn",
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default="0/1",
+        help="Run only shard i of N (given as i/N) of the (task, trial) pairs",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the (task, trial) pairs already in the checkpoint at --ckpt-path",
+    )
+    parser.add_argument(
+        "--resume-only-successful",
+        action="store_true",
+        help="When resuming, run failed tasks again and only keep successful ones",
+    )
     parser.add_argument("--shuffle", type=int, default=0)
     parser.add_argument("--user-strategy", type=str, default="llm", choices=[item.value for item in UserStrategy])
     parser.add_argument("--few-shot-displays-path", type=str, help="Path to a jsonlines file containing few shot displays")
@@ -80,6 +152,7 @@ def parse_args() -> RunConfig:
     # Fallbacks to avoid validation errors when user_model_provider is omitted
     if args.user_model_provider is None:
         args.user_model_provider = args.model_provider or "openai"
+    shard_index, _, num_shards = args.shard.partition("/")
     return RunConfig(
         model_provider=args.model_provider,
         user_model_provider=args.user_model_provider,
@@ -101,6 +174,21 @@ def parse_args() -> RunConfig:
         few_shot_displays_path=args.few_shot_displays_path,
         mcp_server=args.mcp_server,
         ckpt_path=args.ckpt_path,
+        resume=args.resume,
+        resume_only_successful=args.resume_only_successful,
+        shard_index=int(shard_index),
+        num_shards=int(num_shards or 1),
+        completion_cache=args.completion_cache,
+        completion_cache_path=args.completion_cache_path,
+        llm_rpm=args.llm_rpm,
+        llm_tpm=args.llm_tpm,
+        llm_max_in_flight=args.llm_max_in_flight,
+        llm_max_retries=args.llm_max_retries,
+        trace_path=args.trace_path,
+        history_compaction=args.history_compaction,
+        history_token_budget=args.history_token_budget,
+        observation_encoding=args.observation_encoding,
+        mcp_transport=args.mcp_transport,
         new_func=args.new_func,
     )
 
@@ -1,6 +1,7 @@
 # Copyright Sierra
 
 import abc
+import asyncio
 from typing import Optional
 from tau_bench.envs.base import Env
 from tau_bench.types import SolveResult
@@ -12,3 +13,33 @@ class Agent(abc.ABC):
         self, env: Env, task_index: Optional[int] = None, max_num_steps: int = 30
     ) -> SolveResult:
         raise NotImplementedError
+
+
+class AsyncAgent(Agent):
+    """An agent whose conversation loop is a coroutine.
+
+    Many of these can share one event loop; `solve` runs a single
+    conversation to completion for callers that are not async.
+    """
+
+    @abc.abstractmethod
+    async def solve_async(
+        self, env: Env, task_index: Optional[int] = None, max_num_steps: int = 30
+    ) -> SolveResult:
+        raise NotImplementedError
+
+    def solve(
+        self, env: Env, task_index: Optional[int] = None, max_num_steps: int = 30
+    ) -> SolveResult:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError(
+                f"{type(self).__name__}.solve cannot run inside an event loop; "
+                "use `await agent.solve_async(...)` instead"
+            )
+        return asyncio.run(
+            self.solve_async(env=env, task_index=task_index, max_num_steps=max_num_steps)
+        )
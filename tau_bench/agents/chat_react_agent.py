@@ -1,7 +1,8 @@
 # Copyright Sierra
 
 import json
-from litellm import completion
+# from litellm import completion
+from tau_bench.trapi_infer import completion, model_dump
 
 from tau_bench.agents.base import Agent
 from tau_bench.envs.base import Env
@@ -56,7 +57,8 @@ class ChatReActAgent(Agent):
         assert "name" in action_parsed
         assert "arguments" in action_parsed
         action = Action(name=action_parsed["name"], kwargs=action_parsed["arguments"])
-        return message.model_dump(), action, res._hidden_params["response_cost"]
+        # return message.model_dump(), action, res._hidden_params["response_cost"]
+        return model_dump(message), action, res.usage.total_tokens
 
     def solve(
         self, env: Env, task_index: Optional[int] = None, max_num_steps: int = 30
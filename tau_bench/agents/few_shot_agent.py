@@ -2,7 +2,8 @@
 
 import json
 import random
-from litellm import completion
+# from litellm import completion
+from tau_bench.trapi_infer import completion, model_dump
 from typing import List, Optional, Dict, Any
 
 from tau_bench.agents.base import Agent
@@ -43,8 +44,11 @@ class FewShotToolCallingAgent(Agent):
         info = env_reset_res.info.model_dump()
         reward = 0.0
         messages: List[Dict[str, Any]] = [
-            {"role": "system", "content": f"{self.wiki}\n\n{few_shots}"},
-            {"role": "user", "content": obs},
+            # The sampled examples differ per task, so they open the first
+            # user turn instead of joining the wiki, to keep the cached prefix
+            # intact. Some providers reject a second system message.
+            {"role": "system", "content": self.wiki},
+            {"role": "user", "content": f"{few_shots}\n\n{obs}"},
         ]
         for _ in range(max_num_steps):
             res = completion(
@@ -54,8 +58,9 @@ class FewShotToolCallingAgent(Agent):
                 tools=self.tools_info,
                 temperature=self.temperature,
             )
-            next_message = res.choices[0].message.model_dump()
-            total_cost += res._hidden_params["response_cost"]
+            next_message = model_dump(res.choices[0].message)
+            # total_cost += res._hidden_params["response_cost"]
+            total_cost += res.usage.total_tokens
             action = message_to_action(next_message)
             env_response = env.step(action)
             reward = env_response.reward
@@ -2,17 +2,17 @@
 
 import json
 # from litellm import completion
-from tau_bench.trapi_infer import completion, model_dump
+from tau_bench.trapi_infer import acompletion, model_dump
 from typing import List, Optional, Dict, Any
 
-from tau_bench.agents.base import Agent
+from tau_bench.agents.base import AsyncAgent
 from tau_bench.envs.base import Env
 from tau_bench.types import SolveResult, Action, RESPOND_ACTION_NAME
 from termcolor import colored
 
 from tau_bench.globals import *
 
-class ToolCallingAgent(Agent):
+class ToolCallingAgent(AsyncAgent):
     def __init__(
         self,
         tools_info: List[Dict[str, Any]],
@@ -27,11 +27,11 @@ class ToolCallingAgent(Agent):
         self.provider = provider
         self.temperature = temperature
 
-    def solve(
+    async def solve_async(
         self, env: Env, task_index: Optional[int] = None, max_num_steps: int = 30
     ) -> SolveResult:
         total_cost = 0.0
-        env_reset_res = env.reset(task_index=task_index)
+        env_reset_res = await env.reset_async(task_index=task_index)
         obs = env_reset_res.observation
         info = env_reset_res.info.model_dump()
         reward = 0.0
@@ -41,7 +41,7 @@ class ToolCallingAgent(Agent):
         ]
         for k in range(max_num_steps):
             start_time = time.time()
-            res = completion(
+            res = await acompletion(
                 messages=messages,
                 model=self.model,
                 custom_llm_provider=self.provider,
@@ -56,7 +56,7 @@ class ToolCallingAgent(Agent):
             action = message_to_action(next_message)
             action_agent_time.record_time(time.time() - start_time)
             start_time = time.time()
-            env_response = env.step(action)
+            env_response = await env.step_async(action)
             # print(env_response)
             env_time.record_time(time.time() - start_time)
             reward = env_response.reward
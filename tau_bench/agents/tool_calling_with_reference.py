@@ -44,10 +44,13 @@ class ToolCallingAgentWithReference(Agent):
         reward = 0.0
         self.new_func_name = new_func_name
         system_prompt = f'''You are also given the trajectory of the user's interaction with another agent. But now, we have a new function added to the tool set. You need to use this new function to improve the trajectory. Hopefully, this new function can combine several steps in the original trajectory into a single step. So, you should prioritise using this function. The new function is: {new_func_name}. Along with each invocation of this tool, also output the steps in the older trajectory that you combine. The older trajectory is: {self.old_trajectory}'''
-        system_prompt = self.wiki + "\n" + system_prompt
+        # The wiki is shared by every task and is the only system message, so
+        # the provider can serve it and the tool schemas from its prompt cache.
+        # The reference trajectory opens the first user turn instead, since
+        # some providers reject a second system message.
         messages: List[Dict[str, Any]] = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": obs},
+            {"role": "system", "content": self.wiki},
+            {"role": "user", "content": f"{system_prompt}\n\n{obs}"},
         ]
         # print(colored(self.tools_info, 'red'))
         for k in range(max_num_steps):
@@ -0,0 +1,130 @@
+# Copyright Sierra
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+from tau_bench.types import EnvRunResult
+
+
+def config_path(ckpt_path: str) -> str:
+    """Returns the sidecar file that records the RunConfig of a results file."""
+    return os.path.splitext(jsonl_path(ckpt_path))[0] + ".config.json"
+
+
+def is_successful(reward: float) -> bool:
+    return (1 - 1e-6) <= reward <= (1 + 1e-6)
+
+
+def is_error(result: EnvRunResult) -> bool:
+    """Whether the run raised, as recorded by `run.py`, rather than finished."""
+    return result.info.get("error") is not None
+
+
+def jsonl_path(ckpt_path: str) -> str:
+    """Returns the append-only checkpoint that goes with a results file."""
+    if ckpt_path.endswith(".jsonl"):
+        return ckpt_path
+    return os.path.splitext(ckpt_path)[0] + ".jsonl"
+
+
+def results_path(ckpt_path: str) -> str:
+    """Returns the JSON array a finished run writes its results to, which is
+    never the JSONL checkpoint itself."""
+    if ckpt_path.endswith(".jsonl"):
+        return os.path.splitext(ckpt_path)[0] + ".json"
+    return ckpt_path
+
+
+class CheckpointWriter(object):
+    """Appends one result per line to a JSONL checkpoint.
+
+    Each record is flushed and fsynced before `write` returns, so a crash can
+    at most lose the line being written, never the ones before it. Writes
+    from several threads are serialised.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() > 0 and not _ends_with_newline(path):
+            # Terminate a line left half-written by a crash so that it does
+            # not swallow the next record.
+            self._file.write("\n")
+            self._file.flush()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self) -> "CheckpointWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    """Reads a checkpoint, either JSONL or a legacy JSON array.
+
+    Lines truncated by a crash mid-write are skipped.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    records = []
+    for i, line in enumerate(text.splitlines()):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            print(f"Warning: Skipping a truncated record on line {i + 1} of {path}")
+    return records
+
+
+def load_results(path: str) -> List[EnvRunResult]:
+    return [EnvRunResult.model_validate(record) for record in load_records(path)]
+
+
+def load_completed(ckpt_path: str, only_successful: bool = False) -> Dict[Tuple[int, int], EnvRunResult]:
+    """Finished results of an earlier run, keyed by (trial, task_id).
+
+    Reads the JSONL checkpoint next to `ckpt_path`, falling back to the JSON
+    array at `ckpt_path` itself. When a pair was run more than once, the last
+    result wins. Runs that raised instead of finishing are always left out,
+    and with `only_successful` so are the ones that got a reward below 1, so
+    that they are run again.
+    """
+    path = jsonl_path(ckpt_path)
+    if not os.path.exists(path):
+        path = ckpt_path
+    completed: Dict[Tuple[int, int], EnvRunResult] = {}
+    for result in load_results(path):
+        completed[(result.trial, result.task_id)] = result
+    completed = {key: result for key, result in completed.items() if not is_error(result)}
+    if only_successful:
+        completed = {key: result for key, result in completed.items() if is_successful(result.reward)}
+    return completed
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import tabulate
+
+CACHE_MODES = ["off", "read-write", "read-only", "replay-strict"]
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "tau_bench", "completions.sqlite")
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+DEFAULT_MAX_AGE_DAYS = 90.0
+
+# Request fields that change the response. Credentials and endpoints are left
+# out on purpose, so a cache can be shared between machines.
+KEY_FIELDS = [
+    "model",
+    "custom_llm_provider",
+    "messages",
+    "tools",
+    "temperature",
+    "response_format",
+    "tool_choice",
+    "max_tokens",
+    "top_p",
+    "stop",
+    "seed",
+    "n",
+]
+
+# How often, in stores, to run eviction.
+EVICT_EVERY = 200
+
+_namespace: ContextVar[str] = ContextVar("tau_bench_completion_cache_namespace", default="")
+
+
+class CompletionCacheMiss(RuntimeError):
+    """Raised in replay-strict mode when a request has no cached response."""
+
+
+class CachedObject(object):
+    """Read-only attribute view of a cached response.
+
+    Exposes nested dicts as attributes, so callers written against the SDK
+    response objects (`res.choices[0].message.content`) work unchanged.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self._data = data
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return _wrap(self._data[name])
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, name: str) -> Any:
+        return _wrap(self._data[name])
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return _wrap(self._data.get(name, default))
+
+    def model_dump(self) -> Dict[str, Any]:
+        return self._data
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._data
+
+    def __repr__(self) -> str:
+        return f"CachedObject({self._data!r})"
+
+
+def _wrap(value: Any) -> Any:
+    if isinstance(value, dict):
+        return CachedObject(value)
+    if isinstance(value, list):
+        return [_wrap(v) for v in value]
+    return value
+
+
+def set_namespace(namespace: str):
+    """Scopes cache entries, e.g. per trial, so that repeated samples of the
+    same prompt are cached separately. Returns a token for `reset_namespace`."""
+    return _namespace.set(namespace)
+
+
+def reset_namespace(token) -> None:
+    _namespace.reset(token)
+
+
+def _canonical(value: Any) -> Any:
+    from tau_bench.trapi_infer import model_dump
+
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    dumped = model_dump(value)
+    if dumped is value:
+        return str(value)
+    return _canonical(dumped)
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    request = {field: _canonical(kwargs[field]) for field in KEY_FIELDS if kwargs.get(field) is not None}
+    request["namespace"] = _namespace.get()
+    payload = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache(object):
+    """Content-addressed cache of chat completion responses in sqlite.
+
+    Safe to share between threads and processes (WAL journal, busy timeout).
+    Entries older than `max_age_days` or beyond `max_bytes` in total, least
+    recently used first, are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "read-write",
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+    ) -> None:
+        if mode not in CACHE_MODES or mode == "off":
+            raise ValueError(f"Invalid completion cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used_at)")
+        self._conn.commit()
+
+    def lookup(self, key: str) -> Optional[CachedObject]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.mode == "read-write":
+                self._conn.execute("UPDATE completions SET last_used_at = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            if self.mode == "replay-strict":
+                raise CompletionCacheMiss(f"No cached completion for request {key} in {self.path}")
+            return None
+        return CachedObject(json.loads(row[0]))
+
+    def store(self, key: str, model: Optional[str], response: Any) -> None:
+        if self.mode != "read-write":
+            return
+        from tau_bench.trapi_infer import model_dump
+
+        payload = json.dumps(_canonical(model_dump(response)))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, payload, len(payload), now, now),
+            )
+            self._conn.commit()
+            self.stores += 1
+            if self.stores % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM completions WHERE last_used_at < ?", (now - self.max_age_days * 86400,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            rows = self._conn.execute("SELECT key, size FROM completions ORDER BY last_used_at").fetchall()
+            victims: List[str] = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                victims.append(key)
+                excess -= size
+            self._conn.executemany("DELETE FROM completions WHERE key = ?", [(key,) for key in victims])
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "stores": self.stores}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+
+def configure(mode: Optional[str] = None, path: Optional[str] = None) -> None:
+    """Sets the cache mode and path for this process and its children."""
+    if mode is not None:
+        os.environ["TAU_BENCH_COMPLETION_CACHE_MODE"] = mode
+    if path is not None:
+        os.environ["TAU_BENCH_COMPLETION_CACHE"] = path
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Returns the process-wide cache, or None when the mode is "off"."""
+    global _cache
+    mode = os.environ.get("TAU_BENCH_COMPLETION_CACHE_MODE", "off")
+    if mode == "off":
+        return None
+    path = os.environ.get("TAU_BENCH_COMPLETION_CACHE", DEFAULT_CACHE_PATH)
+    with _cache_lock:
+        if _cache is None or _cache.path != path or _cache.mode != mode:
+            _cache = CompletionCache(path, mode=mode)
+        return _cache
+
+
+def print_completion_cache_stats() -> None:
+    cache = _cache
+    if cache is None:
+        return
+    s = cache.stats()
+    lookups = s["hits"] + s["misses"]
+    hit_rate = f"{100.0 * s['hits'] / lookups:.1f}%" if lookups > 0 else "-"
+    print(
+        tabulate.tabulate(
+            [(cache.mode, s["hits"], s["misses"], hit_rate, s["stores"])],
+            headers=["Completion cache", "Hits", "Misses", "Hit rate", "Stored"],
+        )
+    )
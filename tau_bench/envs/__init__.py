@@ -1,6 +1,6 @@
 # Copyright Sierra
 
-from typing import Optional, Union
+from typing import Any, Callable, Dict, Optional, Union
 from tau_bench.envs.base import Env
 from tau_bench.envs.user import UserStrategy
 
@@ -38,3 +38,17 @@ def get_env(
         )
     else:
         raise ValueError(f"Unknown environment: {env_name}")
+
+
+def get_data_loader(env_name: str) -> Callable[[], Dict[str, Any]]:
+    """Returns the function that loads an environment's dataset."""
+    if env_name == "retail":
+        from tau_bench.envs.retail.data import load_data
+
+        return load_data
+    elif env_name == "airline":
+        from tau_bench.envs.airline.data import load_data
+
+        return load_data
+    else:
+        raise ValueError(f"Unknown environment: {env_name}")
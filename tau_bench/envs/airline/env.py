@@ -37,3 +37,5 @@ class MockAirlineDomainEnv(Env):
             mcp_server=mcp_server,
         )
         self.terminate_tools = ["transfer_to_human_agents"]
+        self.env_name = "airline"
+        self.task_split = task_split
@@ -0,0 +1,63 @@
+from typing import Any, Dict, List, Tuple
+
+from tau_bench.envs.airline.inventory import available_flight_items
+from tau_bench.envs.snapshot import find_items
+
+
+def flight_route(flight: Dict[str, Any]) -> Tuple[str, str]:
+    return (flight["origin"], flight["destination"])
+
+
+def is_available(flight: Dict[str, Any], date: str) -> bool:
+    return date in flight["dates"] and flight["dates"][date]["status"] == "available"
+
+
+def search_direct_flights(flights: Dict[str, Any], origin: str, destination: str, date: str) -> List[Dict[str, Any]]:
+    results = []
+    for _, flight in find_items(flights, flight_route, (origin, destination)):
+        if is_available(flight, date):
+            # results add flight except dates, but add flight["datas"][date]
+            results.append({k: v for k, v in flight.items() if k != "dates"})
+            results[-1].update(flight["dates"][date])
+    return results
+
+
+def search_onestop_flights(
+    flights: Dict[str, Any], origin: str, destination: str, date: str
+) -> List[List[Dict[str, Any]]]:
+    """Joins the flights leaving `origin` on `date` with the flights from
+    their destination to `destination`, in the order a scan over every pair
+    of flights would find them.
+
+    The first legs come from the flight inventory, which filters every
+    flight from `origin` by its status on `date` at once, and the second
+    legs from the route index.
+    """
+    results = []
+    for _, flight1 in available_flight_items(flights, date, origin=origin):
+        date2 = (
+            f"2024-05-{int(date[-2:])+1}"
+            if "+1" in flight1["scheduled_arrival_time_est"]
+            else date
+        )
+        for _, flight2 in find_items(flights, flight_route, (flight1["destination"], destination)):
+            if (
+                flight1["scheduled_arrival_time_est"]
+                > flight2["scheduled_departure_time_est"]
+            ):
+                continue
+            if is_available(flight2, date2):
+                result1 = {
+                    k: v for k, v in flight1.items() if k != "dates"
+                }
+                result1.update(flight1["dates"][date])
+                result1["date"] = date
+                result2 = {
+                    k: v for k, v in flight2.items() if k != "dates"
+                }
+                # The second leg reports its status and prices on the first
+                # leg's date, as the search always has.
+                result2.update(flight2["dates"][date])
+                result2["date"] = date2
+                results.append([result1, result2])
+    return results
@@ -0,0 +1,163 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tau_bench.envs.snapshot import ForkedCollection
+
+CABINS = ["basic_economy", "economy", "business"]
+# Status code 0 means the flight does not operate on the date.
+STATUSES = ["available", "on time", "delayed", "flying", "landed", "cancelled"]
+STATUS_CODES = {status: i + 1 for i, status in enumerate(STATUSES)}
+AVAILABLE = STATUS_CODES["available"]
+# Name of the inventory among the views of a flights collection.
+VIEW_NAME = "flight_inventory"
+
+
+class FlightInventory(object):
+    """Columnar copy of the per-date status, seats and prices of a flights
+    collection, for vectorised availability and price filters.
+
+    Row i is the i-th flight in iteration order and column j the j-th date;
+    seats and prices have a last axis by cabin. Prices are NaN and seats 0
+    where a flight has none. The JSON records stay the source of truth:
+    the inventory is built from them once per snapshot and never written.
+    """
+
+    def __init__(self, flights: Dict[str, Any]) -> None:
+        self.flight_numbers = list(flights)
+        self.rows = {flight_number: i for i, flight_number in enumerate(self.flight_numbers)}
+        dates = sorted({date for flight in flights.values() for date in flight["dates"]})
+        self.columns = {date: j for j, date in enumerate(dates)}
+        self.origin = np.array([flight["origin"] for flight in flights.values()], dtype=str)
+        self.destination = np.array([flight["destination"] for flight in flights.values()], dtype=str)
+        self.status = np.zeros((len(self.rows), len(dates)), dtype=np.int8)
+        self.seats = np.zeros((len(self.rows), len(dates), len(CABINS)), dtype=np.int64)
+        self.prices = np.full((len(self.rows), len(dates), len(CABINS)), np.nan)
+        for i, flight in enumerate(flights.values()):
+            for date, info in flight["dates"].items():
+                j = self.columns[date]
+                self.status[i, j] = STATUS_CODES.get(info["status"], len(STATUSES) + 1)
+                for c, cabin in enumerate(CABINS):
+                    self.seats[i, j, c] = info.get("available_seats", {}).get(cabin, 0)
+                    self.prices[i, j, c] = info.get("prices", {}).get(cabin, np.nan)
+
+    def select(
+        self,
+        date: str,
+        cabin: Optional[str] = None,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        max_price: Optional[float] = None,
+        min_seats: int = 1,
+    ) -> np.ndarray:
+        """Rows of the flights available on `date`, optionally on a route and,
+        given a `cabin`, with at least `min_seats` seats in it at most
+        `max_price`."""
+        if date not in self.columns or (cabin is not None and cabin not in CABINS):
+            return np.zeros(0, dtype=np.int64)
+        j = self.columns[date]
+        mask = self.status[:, j] == AVAILABLE
+        if origin is not None:
+            mask &= self.origin == origin
+        if destination is not None:
+            mask &= self.destination == destination
+        if cabin is not None:
+            c = CABINS.index(cabin)
+            mask &= self.seats[:, j, c] >= min_seats
+            if max_price is not None:
+                # NaN compares false, so flights without a price drop out.
+                mask &= self.prices[:, j, c] <= max_price
+        return np.flatnonzero(mask)
+
+
+def matches(
+    flight: Dict[str, Any],
+    date: str,
+    cabin: Optional[str] = None,
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    max_price: Optional[float] = None,
+    min_seats: int = 1,
+) -> bool:
+    """What `FlightInventory.select` tests, on one JSON record."""
+    info = flight["dates"].get(date)
+    if info is None or info["status"] != "available":
+        return False
+    if origin is not None and flight["origin"] != origin:
+        return False
+    if destination is not None and flight["destination"] != destination:
+        return False
+    if cabin is None:
+        return True
+    if info.get("available_seats", {}).get(cabin, 0) < min_seats:
+        return False
+    price = info.get("prices", {}).get(cabin)
+    return max_price is None or (price is not None and price <= max_price)
+
+
+def get_inventory(flights: ForkedCollection) -> FlightInventory:
+    return flights.base_view(VIEW_NAME, FlightInventory)
+
+
+def available_flight_items(
+    flights: Dict[str, Any],
+    date: str,
+    cabin: Optional[str] = None,
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    max_price: Optional[float] = None,
+    min_seats: int = 1,
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """(flight number, record) pairs of the flights available on `date`,
+    filtered as by `FlightInventory.select`, in iteration order.
+
+    On a fork, untouched flights are filtered on the snapshot's inventory
+    and the flights the fork wrote to, such as by a booking or a
+    cancellation, are checked on their JSON records. Plain dicts are
+    scanned. The records are read-only.
+    """
+    args = (date, cabin, origin, destination, max_price, min_seats)
+    if not isinstance(flights, ForkedCollection):
+        return [(flight_number, flight) for flight_number, flight in flights.items() if matches(flight, *args)]
+    inventory = get_inventory(flights)
+    touched = flights.touched_keys()
+    records = [
+        (inventory.flight_numbers[i], flights.base[inventory.flight_numbers[i]])
+        for i in inventory.select(*args)
+        if inventory.flight_numbers[i] not in touched
+    ]
+    changed = [(flight_number, flight) for flight_number, flight in flights.overlay.items() if matches(flight, *args)]
+    if len(changed) > 0:
+        # New flights come after the snapshot's, in the order they were added.
+        records = sorted(records + changed, key=lambda record: inventory.rows.get(record[0], len(inventory.rows)))
+    return records
+
+
+def available_flights(
+    flights: Dict[str, Any],
+    date: str,
+    cabin: str,
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    max_price: Optional[float] = None,
+    min_seats: int = 1,
+) -> List[Dict[str, Any]]:
+    """Flights with at least `min_seats` seats in `cabin` on `date`,
+    optionally between `origin` and `destination` and at most `max_price`,
+    in iteration order, e.g. all economy seats under $200 from JFK to SFO
+    on a date."""
+    records = available_flight_items(flights, date, cabin, origin, destination, max_price, min_seats)
+    results = []
+    for flight_number, flight in records:
+        info = flight["dates"][date]
+        results.append(
+            {
+                "flight_number": flight_number,
+                "origin": flight["origin"],
+                "destination": flight["destination"],
+                "date": date,
+                "available_seats": info["available_seats"][cabin],
+                "price": info["prices"][cabin],
+            }
+        )
+    return results
@@ -9,15 +9,35 @@ import inspect
 import re
 import importlib.util
 import builtins
+import time
 
-from hashlib import sha256
 from tau_bench.envs.tool import Tool
 from typing import Any, Callable, Dict, List, Type, Optional, Set, Union, Tuple
-from fastmcp import Client
 from termcolor import colored
 
 
+from tau_bench import tracing
 from tau_bench.envs.user import load_user, UserStrategy
+from tau_bench.envs.mcp_session import MCPSession, mcp_session_pool
+from tau_bench.envs.observation import ObservationEncoder, encoding_mode, split_observation_specs
+from tau_bench.envs.snapshot import load_snapshot
+from tau_bench.envs.gt_cache import (
+    GroundTruthKey,
+    dataset_content_hash,
+    get_gt_hash_cache,
+    task_content_hash,
+    tools_content_hash,
+)
+from tau_bench.envs.state_store import (
+    SESSION_ARG,
+    OPEN_SESSION_TOOL,
+    RESET_SESSION_TOOL,
+    CLOSE_SESSION_TOOL,
+    SESSION_HASH_TOOL,
+    SESSION_CHANGES_TOOL,
+    data_source,
+    is_importable_source,
+)
 from tau_bench.types import (
     Action,
     Task,
@@ -30,11 +50,15 @@ from tau_bench.types import (
     RESPOND_ACTION_NAME,
 )
 from tau_bench.envs.my_data import global_data
+from tau_bench.envs.hashing import (
+    ToHashable,
+    Hashable,
+    to_hashable,
+    consistent_hash,
+    data_hash,
+    diff_changed_records,
+)
 
-ToHashable = Union[
-    str, int, float, Dict[str, "ToHashable"], List["ToHashable"], Set["ToHashable"]
-]
-Hashable = Union[str, int, float, Tuple["Hashable"], Tuple[Tuple[str, "Hashable"]]]
 
 import logging
 
@@ -84,27 +108,14 @@ def extract_registered_tools(filepath):
             tools_descriptions.append(description_json)
         except json.JSONDecodeError as e:
             print(f"JSON decode error: {e}")
+    # Sorted by name, so the tool schemas every request starts with are the
+    # same bytes whatever order the server registered them in. That keeps
+    # them inside the provider's cached prompt prefix.
+    tools_descriptions.sort(key=lambda tool: tool["function"]["name"])
     return tools_descriptions
 
 
 
-def to_hashable(item: ToHashable) -> Hashable:
-    if isinstance(item, dict):
-        return tuple((key, to_hashable(value)) for key, value in sorted(item.items()))
-    elif isinstance(item, list):
-        return tuple(to_hashable(element) for element in item)
-    elif isinstance(item, set):
-        return tuple(sorted(to_hashable(element) for element in item))
-    else:
-        return item
-
-
-def consistent_hash(
-    value: Hashable,
-) -> str:
-    return sha256(str(value).encode("utf-8")).hexdigest()
-
-
 class Env(object):
     def __init__(
         self,
@@ -121,15 +132,31 @@ class Env(object):
     ) -> None:
         super().__init__()
         self.mcp_server = os.path.normpath(mcp_server)
+        self.mcp_session: MCPSession = mcp_session_pool.get(self.mcp_server)
+        self.tool_call_latencies: List[float] = []
         self.data_load_func = data_load_func
-        self.data = data_load_func()
-        with open("data.json", "w") as f:
-            json.dump(self.data, f, indent=2)
+        # Servers built on SessionFastMCP keep the state in memory on their
+        # side; older servers still get the whole dataset with every call.
+        self.session_id: Optional[str] = None
+        self.data: Optional[Dict[str, Any]] = None
+        if OPEN_SESSION_TOOL in self.mcp_session.list_tool_names():
+            # The dataset is registered once and every tool call only carries
+            # the returned session id as its state handle.
+            self.session_id = self.open_session()
+        else:
+            # Legacy servers receive the data by value and never write back,
+            # so the shared snapshot can be handed out without copying.
+            self.data = load_snapshot(data_load_func).data
         # self.tools_map: Dict[str, Type[Tool]] = {
         #     tool.get_info()["function"]["name"]: tool for tool in tools
         # }
         # self.tools_info = [tool.get_info() for tool in tools]
-        self.tools_info = extract_registered_tools(self.mcp_server)
+        self.tools_info, observation_specs = split_observation_specs(extract_registered_tools(self.mcp_server))
+        self.observation_encoder = ObservationEncoder(encoding_mode(), observation_specs)
+        # Bytes of tool observations before and after encoding, and the raw
+        # text of those that lost content, by the index of their action.
+        self.observation_bytes = {"raw": 0, "encoded": 0}
+        self.raw_observations: Dict[int, str] = {}
         self.new_tools_list = [tool['function']['name'] for tool in self.tools_info]
         self.terminate_tools = []
         self.tasks = tasks
@@ -144,67 +171,259 @@ class Env(object):
             user_strategy=user_strategy, model=user_model, provider=user_provider
         )
         self.actions: List[Action] = []
+        self.cancelled = False
+        # Set by the domain subclasses; used to key the ground-truth hash cache.
+        self.env_name: Optional[str] = None
+        self.task_split: Optional[str] = None
 
     def reset(self, task_index: Optional[int] = None) -> EnvResetResponse:
         if task_index is None:
             task_index = random.randint(0, len(self.tasks))
         self.task_index = task_index
-        self.data = self.data_load_func()
+        self.reset_data()
         self.task = self.tasks[task_index]
         self.actions = []
-        initial_observation = self.user.reset(instruction=self.task.instruction)
+        self.observation_bytes = {"raw": 0, "encoded": 0}
+        self.raw_observations = {}
+        with tracing.span("user", tracing.USER, turn="reset"):
+            initial_observation = self.user.reset(instruction=self.task.instruction)
         return EnvResetResponse(
             observation=initial_observation, info=EnvInfo(task=self.task, source="user")
         )
 
-    async def tool_call(self, function, function_args):
-        mcp_client = Client(self.mcp_server)
-        async with mcp_client:
-            func_response = await mcp_client.call_tool(function, function_args)
-            res = func_response.content[0].text
-        return res
+    async def reset_async(self, task_index: Optional[int] = None) -> EnvResetResponse:
+        if task_index is None:
+            task_index = random.randint(0, len(self.tasks))
+        self.task_index = task_index
+        if self.session_id is not None:
+            await self.mcp_session.call_tool_async(RESET_SESSION_TOOL, {SESSION_ARG: self.session_id})
+        else:
+            self.reset_data()
+        self.task = self.tasks[task_index]
+        self.actions = []
+        self.observation_bytes = {"raw": 0, "encoded": 0}
+        self.raw_observations = {}
+        with tracing.span("user", tracing.USER, turn="reset"):
+            initial_observation = await self.user.reset_async(instruction=self.task.instruction)
+        return EnvResetResponse(
+            observation=initial_observation, info=EnvInfo(task=self.task, source="user")
+        )
+
+    def _tool_span(self, function, function_args):
+        # Legacy servers get the whole dataset with every call; it is left
+        # out of the payload size.
+        request = {k: v for k, v in function_args.items() if k != "data"}
+        return tracing.span(function, tracing.TOOL, request_bytes=tracing.payload_size(request))
+
+    def tool_call(self, function, function_args):
+        start_time = time.perf_counter()
+        try:
+            with self._tool_span(function, function_args) as tool_span:
+                result = self.mcp_session.call_tool(function, function_args)
+                tool_span.set(response_bytes=tracing.payload_size(result))
+                return result
+        finally:
+            self.tool_call_latencies.append(time.perf_counter() - start_time)
+
+    async def tool_call_async(self, function, function_args):
+        start_time = time.perf_counter()
+        try:
+            with self._tool_span(function, function_args) as tool_span:
+                result = await self.mcp_session.call_tool_async(function, function_args)
+                tool_span.set(response_bytes=tracing.payload_size(result))
+                return result
+        finally:
+            self.tool_call_latencies.append(time.perf_counter() - start_time)
+
+    def open_session(self) -> str:
+        if is_importable_source(self.data_load_func):
+            open_args = {"source": data_source(self.data_load_func)}
+        else:
+            open_args = {"data": load_snapshot(self.data_load_func).data}
+        return self.mcp_session.call_tool(OPEN_SESSION_TOOL, open_args)
+
+    def reset_data(self) -> None:
+        if self.session_id is not None:
+            self.mcp_session.call_tool(RESET_SESSION_TOOL, {SESSION_ARG: self.session_id})
+        else:
+            self.data = load_snapshot(self.data_load_func).data
+
+    def close(self) -> None:
+        # The MCP session is shared through the process-wide pool and stays
+        # open for the next Env; the pool shuts it down at interpreter exit.
+        if self.mcp_session is None:
+            return
+        if self.session_id is not None:
+            self.mcp_session.call_tool(CLOSE_SESSION_TOOL, {SESSION_ARG: self.session_id})
+            self.session_id = None
+        self.mcp_session = None
+
+    def cancel(self) -> None:
+        """Makes the next step fail so an in-flight conversation stops early."""
+        self.cancelled = True
 
     def step(self, action: Action) -> EnvResponse:
-        self.actions.append(action)
-
-        info = EnvInfo(task=self.task)
-        reward = 0
-        done = False
-        if action.name == RESPOND_ACTION_NAME:
-            observation = self.user.step(action.kwargs["content"])
-            info.source = "user"
-            done = "###STOP###" in observation
-        # elif action.name in self.tools_map:
-        elif action.name in self.new_tools_list:
-            # args = action.kwargs.copy()
-            # observation = asyncio.run(self.tool_call(action.name, args))
-            # print(observation)
-            # dmb
-            try:
-                # observation = self.tools_map[action.name].invoke(
-                #     data=self.data, **action.kwargs
-                # )
-                args = action.kwargs.copy()
-                args["data"] = self.data
-                observation = asyncio.run(self.tool_call(action.name, args))
-            except Exception as e:
-                observation = f"Error: {e}"
-            info.source = action.name
-            if action.name in self.terminate_tools:
-                done = True
+        with tracing.span("step", tracing.STEP, action=action.name):
+            if self.cancelled:
+                raise RuntimeError("The run was cancelled")
+            self.actions.append(action)
+
+            info = EnvInfo(task=self.task)
+            reward = 0
+            done = False
+            if action.name == RESPOND_ACTION_NAME:
+                with tracing.span("user", tracing.USER):
+                    observation = self.user.step(action.kwargs["content"])
+                info.source = "user"
+                done = "###STOP###" in observation
+            # elif action.name in self.tools_map:
+            elif action.name in self.new_tools_list:
+                observation = self.execute_tool(action)
+                observation, info.raw_observation = self.encode_observation(action, observation)
+                info.source = action.name
+                if action.name in self.terminate_tools:
+                    done = True
+            else:
+                observation = f"Unknown action {action.name}"
+                info.source = action.name
+
+            if done:
+                with tracing.span("reward", tracing.REWARD):
+                    reward_res = self.calculate_reward()
+                reward = reward_res.reward
+                info.reward_info = reward_res
+                info.user_cost = self.user.get_total_cost()
+            return EnvResponse(observation=observation, reward=reward, done=done, info=info)
+
+    async def step_async(self, action: Action) -> EnvResponse:
+        """Same as `step`, but awaits the user simulator and the tool call
+        so that many conversations can share one event loop."""
+        with tracing.span("step", tracing.STEP, action=action.name):
+            if self.cancelled:
+                raise RuntimeError("The run was cancelled")
+            self.actions.append(action)
+
+            info = EnvInfo(task=self.task)
+            reward = 0
+            done = False
+            if action.name == RESPOND_ACTION_NAME:
+                with tracing.span("user", tracing.USER):
+                    observation = await self.user.step_async(action.kwargs["content"])
+                info.source = "user"
+                done = "###STOP###" in observation
+            elif action.name in self.new_tools_list:
+                observation = await self.execute_tool_async(action)
+                observation, info.raw_observation = self.encode_observation(action, observation)
+                info.source = action.name
+                if action.name in self.terminate_tools:
+                    done = True
+            else:
+                observation = f"Unknown action {action.name}"
+                info.source = action.name
+
+            if done:
+                # Scoring happens once per conversation and may replay the ground
+                # truth, so it runs off the event loop.
+                with tracing.span("reward", tracing.REWARD):
+                    reward_res = await asyncio.to_thread(self.calculate_reward)
+                reward = reward_res.reward
+                info.reward_info = reward_res
+                info.user_cost = self.user.get_total_cost()
+            return EnvResponse(observation=observation, reward=reward, done=done, info=info)
+
+    def _tool_args(self, action: Action, session_id: Optional[str]) -> Dict[str, Any]:
+        # observation = self.tools_map[action.name].invoke(
+        #     data=self.data, **action.kwargs
+        # )
+        args = action.kwargs.copy()
+        if session_id is not None:
+            args[SESSION_ARG] = session_id
         else:
-            observation = f"Unknown action {action.name}"
-            info.source = action.name
+            args["data"] = self.data
+        return args
+
+    def execute_tool(self, action: Action, session_id: Optional[str] = None) -> str:
+        try:
+            return self.tool_call(action.name, self._tool_args(action, session_id or self.session_id))
+        except Exception as e:
+            return f"Error: {e}"
+
+    async def execute_tool_async(self, action: Action, session_id: Optional[str] = None) -> str:
+        try:
+            return await self.tool_call_async(action.name, self._tool_args(action, session_id or self.session_id))
+        except Exception as e:
+            return f"Error: {e}"
+
+    def encode_observation(self, action: Action, observation: str) -> Tuple[str, Optional[str]]:
+        """Encodes the observation of an agent's tool call. Returns it with
+        the raw observation when the encoding dropped content, for logging."""
+        encoded, lossless = self.observation_encoder.encode(action.name, observation)
+        self.observation_bytes["raw"] += len(observation)
+        self.observation_bytes["encoded"] += len(encoded)
+        span = tracing.current_span()
+        if span is not None:
+            span.set(raw_bytes=len(observation), encoded_bytes=len(encoded))
+        if lossless:
+            return encoded, None
+        self.raw_observations[len(self.actions) - 1] = observation
+        return encoded, observation
+
+    def gt_cache_key(self) -> Optional[GroundTruthKey]:
+        if self.env_name is None or self.task_split is None:
+            return None
+        return (
+            self.env_name,
+            self.task_split,
+            self.task_index,
+            dataset_content_hash(self.data_load_func),
+            tools_content_hash(self.mcp_server),
+            task_content_hash(self.task),
+        )
+
+    def replay_ground_truth(self) -> Tuple[str, Dict[str, Dict[str, Optional[str]]]]:
+        """Replays the task's ground-truth tool calls on fresh data.
+
+        Returns the resulting data hash and the digests of the records the
+        replay changed. The replay runs in a separate session, so the agent's
+        own state is left intact.
+        """
+        if self.session_id is None:
+            # Servers without sessions never write back, so there is nothing
+            # to replay into and no record changes to report.
+            self.reset_data()
+            return self.get_data_hash(), {}
+        gt_session_id = self.open_session()
+        try:
+            for action in self.task.actions:
+                if action.name in self.new_tools_list and action.name not in self.terminate_tools:
+                    self.execute_tool(action, session_id=gt_session_id)
+            return self.get_data_hash(gt_session_id), self.get_changed_records(gt_session_id)
+        finally:
+            self.mcp_session.call_tool(CLOSE_SESSION_TOOL, {SESSION_ARG: gt_session_id})
+
+    def get_gt_state(self) -> Tuple[str, Dict[str, Dict[str, Optional[str]]]]:
+        cache = get_gt_hash_cache()
+        key = self.gt_cache_key() if cache is not None else None
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        gt_data_hash, gt_changes = self.replay_ground_truth()
+        if key is not None:
+            cache.put(key, gt_data_hash, gt_changes)
+        return gt_data_hash, gt_changes
 
-        if done:
-            reward_res = self.calculate_reward()
-            reward = reward_res.reward
-            info.reward_info = reward_res
-            info.user_cost = self.user.get_total_cost()
-        return EnvResponse(observation=observation, reward=reward, done=done, info=info)
+    def get_data_hash(self, session_id: Optional[str] = None) -> str:
+        session_id = session_id or self.session_id
+        if session_id is not None:
+            return self.mcp_session.call_tool(SESSION_HASH_TOOL, {SESSION_ARG: session_id})
+        return data_hash(self.data)
 
-    def get_data_hash(self) -> str:
-        return consistent_hash(to_hashable(self.data))
+    def get_changed_records(self, session_id: Optional[str] = None) -> Dict[str, Dict[str, Optional[str]]]:
+        session_id = session_id or self.session_id
+        if session_id is not None:
+            return json.loads(self.mcp_session.call_tool(SESSION_CHANGES_TOOL, {SESSION_ARG: session_id}))
+        return {}
 
     def calculate_reward(self) -> RewardResult:
         data_hash = self.get_data_hash()
@@ -214,17 +433,15 @@ class Env(object):
         ]
 
         # Check if the database changes are correct. If they are not correct, then we set the reward to 0.
-        # TODO: cache gt_data_hash in tasks.py (low priority)
-        self.data = self.data_load_func()
-        for action in self.task.actions:
-            if action.name not in self.terminate_tools:
-                self.step(action)
-        gt_data_hash = self.get_data_hash()
+        gt_data_hash, gt_changes = self.get_gt_state()
         info = RewardActionInfo(
             r_actions=data_hash == gt_data_hash, gt_data_hash=gt_data_hash
         )
         if not info.r_actions:
             reward = 0.0
+            # Both states are forks of the same base, so comparing the records
+            # each one changed is enough to find where they differ.
+            info.data_diff = diff_changed_records(self.get_changed_records(), gt_changes)
 
         if len(self.task.outputs) > 0:
             # check outputs
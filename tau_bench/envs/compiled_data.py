@@ -0,0 +1,142 @@
+import gc
+import hashlib
+import importlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Written next to a domain's JSON files by `python -m tau_bench.envs.compiled_data`.
+SNAPSHOT_FILE = "snapshot.pickle"
+# The file starts with MAGIC, then the length of the pickled header as an
+# unsigned 64-bit integer, the header and the pickled dataset.
+MAGIC = b"TAUSNAP1"
+HEADER_LENGTH = struct.Struct("<Q")
+DOMAIN_DATA_MODULES = ["tau_bench.envs.retail.data", "tau_bench.envs.airline.data"]
+
+# How the last load of each data folder went: "snapshot" or "json", and seconds.
+load_times: Dict[str, Tuple[str, float]] = {}
+
+Stamp = List[Tuple[str, int, int]]
+
+
+def _paths(folder: str, files: Dict[str, str]) -> List[str]:
+    return [os.path.join(folder, file) for file in files.values()]
+
+
+def _stamp(paths: List[str]) -> Stamp:
+    stamp = []
+    for path in paths:
+        st = os.stat(path)
+        stamp.append((os.path.basename(path), st.st_size, st.st_mtime_ns))
+    return stamp
+
+
+def content_hash(paths: List[str]) -> str:
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            h.update(os.path.basename(path).encode("utf-8"))
+            h.update(hashlib.sha256(f.read()).hexdigest().encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_json(folder: str, files: Dict[str, str]) -> Dict[str, Any]:
+    data = {}
+    for name, file in files.items():
+        with open(os.path.join(folder, file)) as f:
+            data[name] = json.load(f)
+    return data
+
+
+def compile_dataset(folder: str, files: Dict[str, str]) -> str:
+    """Compiles the JSON files of a dataset into a snapshot file in `folder`,
+    stamped with their sizes, mtimes and content hash."""
+    paths = _paths(folder, files)
+    header = {"files": files, "stamp": _stamp(paths), "content_hash": content_hash(paths)}
+    header_bytes = pickle.dumps(header, protocol=5)
+    path = os.path.join(folder, SNAPSHOT_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header_bytes)))
+        f.write(header_bytes)
+        pickle.dump(load_json(folder, files), f, protocol=5)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _is_current(header: Dict[str, Any], files: Dict[str, str], paths: List[str]) -> bool:
+    if header.get("files") != files:
+        return False
+    if [tuple(s) for s in header["stamp"]] == _stamp(paths):
+        return True
+    # A checkout touches mtimes without changing the files.
+    return header["content_hash"] == content_hash(paths)
+
+
+def load_compiled(folder: str, files: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Returns the dataset from its snapshot file, or None when there is
+    none or it is older than the JSON files."""
+    path = os.path.join(folder, SNAPSHOT_FILE)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    try:
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[: len(MAGIC)] != MAGIC:
+                return None
+            offset = len(MAGIC) + HEADER_LENGTH.size
+            (header_length,) = HEADER_LENGTH.unpack(mm[len(MAGIC) : offset])
+            header = pickle.loads(mm[offset : offset + header_length])
+            if not _is_current(header, files, _paths(folder, files)):
+                logger.info(f"Ignoring stale dataset snapshot {path}")
+                return None
+            # Unpickled straight from the mapped pages, without reading the
+            # file into a buffer first. The dataset is only containers, so
+            # collecting while they are created just wastes time.
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                with memoryview(mm) as view:
+                    return pickle.loads(view[offset + header_length :])
+            finally:
+                if gc_enabled:
+                    gc.enable()
+    except (OSError, ValueError, pickle.UnpicklingError, struct.error) as e:
+        logger.warning(f"Could not load dataset snapshot {path}: {e}")
+        return None
+
+
+def load_dataset(folder: str, files: Dict[str, str]) -> Dict[str, Any]:
+    """Loads a dataset made of one JSON file per top-level collection, from
+    its compiled snapshot when it is current and from the JSON otherwise."""
+    start = time.perf_counter()
+    data = load_compiled(folder, files)
+    source = "snapshot"
+    if data is None:
+        data = load_json(folder, files)
+        source = "json"
+    seconds = time.perf_counter() - start
+    load_times[folder] = (source, seconds)
+    logger.info(f"Loaded {folder} from {source} in {1000 * seconds:.1f} ms")
+    return data
+
+
+def main(argv: List[str]) -> None:
+    for module_name in argv or DOMAIN_DATA_MODULES:
+        module = importlib.import_module(module_name)
+        path = compile_dataset(module.FOLDER_PATH, module.FILES)
+        print(f"Compiled {module_name} into {path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
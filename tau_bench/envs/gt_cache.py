@@ -0,0 +1,278 @@
+import argparse
+import glob
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Bump whenever the way Env.get_data_hash digests the state changes, so that
+# hashes computed by an older scheme are never compared with newer ones.
+HASH_SCHEME_VERSION = 2
+
+# The tool code the MCP servers import lives in this package, so its sources
+# are part of every key along with the server file itself.
+ENVS_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# One cache per checkout: two checkouts of the same code could still differ in
+# files the key does not cover, such as installed dependencies.
+CHECKOUT_DIR = os.path.dirname(os.path.dirname(ENVS_PACKAGE_DIR))
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"),
+    ".cache",
+    "tau_bench",
+    hashlib.sha256(CHECKOUT_DIR.encode("utf-8")).hexdigest()[:16],
+    "gt_hashes.sqlite",
+)
+DEFAULT_MCP_SERVERS = {
+    "retail": "mcp/retail_server.py",
+    "airline": "mcp/airline_server.py",
+}
+TASK_SPLITS = {
+    "retail": ["test", "train", "dev"],
+    "airline": ["test"],
+}
+
+# (env, task split, task index, dataset hash, tools hash, task hash)
+GroundTruthKey = Tuple[str, str, int, str, str, str]
+
+_content_hashes: Dict[Any, str] = {}
+_content_hashes_lock = threading.Lock()
+
+
+def file_content_hash(path: str) -> str:
+    """Hashes a file, memoized by its path, size and mtime so that a file
+    rewritten in place is hashed again."""
+    st = os.stat(path)
+    key = ("file", os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _content_hashes_lock:
+        if key in _content_hashes:
+            return _content_hashes[key]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    with _content_hashes_lock:
+        _content_hashes[key] = digest
+    return digest
+
+
+def tools_content_hash(server: str) -> str:
+    """Hashes an MCP server file together with the sources of tau_bench.envs,
+    which holds the tool logic the servers import."""
+    h = hashlib.sha256()
+    h.update(file_content_hash(server).encode("utf-8"))
+    paths = sorted(glob.glob(os.path.join(ENVS_PACKAGE_DIR, "**", "*.py"), recursive=True))
+    for path in paths:
+        h.update(os.path.relpath(path, ENVS_PACKAGE_DIR).encode("utf-8"))
+        h.update(file_content_hash(path).encode("utf-8"))
+    return h.hexdigest()
+
+
+def task_content_hash(task: Any) -> str:
+    """Hashes a task's ground truth: its actions and expected outputs."""
+    return hashlib.sha256(task.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def dataset_content_hash(data_load_func: Callable[[], Dict[str, Any]]) -> str:
+    """Hashes the JSON files next to the module that defines a data loader."""
+    try:
+        folder = os.path.dirname(inspect.getfile(data_load_func))
+        paths = sorted(glob.glob(os.path.join(folder, "*.json")))
+    except TypeError:
+        paths = []
+    h = hashlib.sha256()
+    if len(paths) > 0:
+        for path in paths:
+            h.update(os.path.basename(path).encode("utf-8"))
+            h.update(file_content_hash(path).encode("utf-8"))
+        return h.hexdigest()
+    # Datasets that do not come from files are hashed once per process, like
+    # the snapshot they are loaded into.
+    with _content_hashes_lock:
+        if data_load_func in _content_hashes:
+            return _content_hashes[data_load_func]
+    from tau_bench.envs.hashing import data_hash
+    from tau_bench.envs.snapshot import load_snapshot
+
+    h.update(data_hash(load_snapshot(data_load_func).data).encode("utf-8"))
+    digest = h.hexdigest()
+    with _content_hashes_lock:
+        _content_hashes[data_load_func] = digest
+    return digest
+
+
+class GroundTruthHashCache(object):
+    """Persistent cache of ground-truth data hashes.
+
+    Alongside each hash it keeps the digests of the records the ground truth
+    changed, so a failed task can be diffed without replaying it.
+
+    Entries are keyed by env, task split and task index together with content
+    hashes of the dataset, of the tool code (the MCP server file and the
+    tau_bench.envs sources) and of the task itself, so editing any of them
+    simply misses the cache instead of returning a stale hash.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # sqlite connections must not be used across a fork.
+        self.pid = os.getpid()
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(gt_hashes)")]
+        if len(columns) > 0 and "task_hash" not in columns:
+            # Entries from before tasks were part of the key may be stale.
+            self._conn.execute("DROP TABLE gt_hashes")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS gt_hashes (
+                env TEXT NOT NULL,
+                task_split TEXT NOT NULL,
+                task_index INTEGER NOT NULL,
+                data_hash TEXT NOT NULL,
+                tools_hash TEXT NOT NULL,
+                task_hash TEXT NOT NULL,
+                scheme INTEGER NOT NULL,
+                gt_data_hash TEXT NOT NULL,
+                gt_changes TEXT NOT NULL DEFAULT '{}',
+                created_at REAL NOT NULL,
+                PRIMARY KEY (env, task_split, task_index, data_hash, tools_hash, task_hash, scheme)
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key: GroundTruthKey) -> Optional[Tuple[str, Dict[str, Dict[str, Optional[str]]]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT gt_data_hash, gt_changes FROM gt_hashes WHERE env = ? AND task_split = ? AND task_index = ?"
+                " AND data_hash = ? AND tools_hash = ? AND task_hash = ? AND scheme = ?",
+                (*key, HASH_SCHEME_VERSION),
+            ).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def put(
+        self,
+        key: GroundTruthKey,
+        gt_data_hash: str,
+        gt_changes: Optional[Dict[str, Dict[str, Optional[str]]]] = None,
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gt_hashes"
+                " (env, task_split, task_index, data_hash, tools_hash, task_hash, scheme, gt_data_hash, gt_changes, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, HASH_SCHEME_VERSION, gt_data_hash, json.dumps(gt_changes or {}), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[GroundTruthHashCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_gt_hash_cache() -> Optional[GroundTruthHashCache]:
+    """Returns the process-wide cache, or None when TAU_BENCH_GT_CACHE=off."""
+    global _cache
+    path = os.environ.get("TAU_BENCH_GT_CACHE", DEFAULT_CACHE_PATH)
+    if path.lower() in ("", "off", "0", "none"):
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.path != path or _cache.pid != os.getpid():
+            _cache = GroundTruthHashCache(path)
+        return _cache
+
+
+def _precompute(env_name: str, task_split: str, mcp_server: str, task_indices: List[int]) -> int:
+    from tau_bench.envs import get_env
+
+    cache = get_gt_hash_cache()
+    env = get_env(
+        env_name,
+        user_strategy="human",
+        user_model="none",
+        task_split=task_split,
+        task_index=task_indices[0],
+        mcp_server=mcp_server,
+    )
+    try:
+        for idx in task_indices:
+            env.task_index = idx
+            env.task = env.tasks[idx]
+            cache.put(env.gt_cache_key(), *env.replay_ground_truth())
+    finally:
+        env.close()
+    return len(task_indices)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute ground-truth data hashes for reward computation")
+    parser.add_argument("--env", type=str, choices=["retail", "airline", "all"], default="all")
+    parser.add_argument("--task-split", type=str, choices=["train", "test", "dev", "all"], default="all")
+    parser.add_argument("--mcp-server", type=str, default=None, help="Defaults to mcp/<env>_server.py")
+    parser.add_argument("--max-concurrency", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=20)
+    parser.add_argument("--cache-path", type=str, default=None)
+    parser.add_argument(
+        "--mcp-transport",
+        type=str,
+        choices=["stdio", "inprocess"],
+        default="stdio",
+        help="inprocess runs the servers in the workers, which then share the datasets loaded here",
+    )
+    args = parser.parse_args()
+    if args.cache_path is not None:
+        os.environ["TAU_BENCH_GT_CACHE"] = args.cache_path
+    if get_gt_hash_cache() is None:
+        raise ValueError("The ground-truth hash cache is disabled (TAU_BENCH_GT_CACHE=off)")
+    from tau_bench.envs import mcp_session, state_store
+
+    mcp_session.configure(args.mcp_transport)
+
+    jobs: List[Tuple[str, str, str, List[int]]] = []
+    env_names = ["retail", "airline"] if args.env == "all" else [args.env]
+    for env_name in env_names:
+        mcp_server = args.mcp_server or DEFAULT_MCP_SERVERS[env_name]
+        splits = TASK_SPLITS[env_name] if args.task_split == "all" else [args.task_split]
+        for task_split in splits:
+            if task_split not in TASK_SPLITS[env_name]:
+                continue
+            from tau_bench.envs import get_env
+
+            env = get_env(env_name, user_strategy="human", user_model="none", task_split=task_split, task_index=0, mcp_server=mcp_server)
+            num_tasks = len(env.tasks)
+            env.close()
+            for start in range(0, num_tasks, args.chunk_size):
+                jobs.append((env_name, task_split, mcp_server, list(range(start, min(start + args.chunk_size, num_tasks)))))
+
+    mp_context = None
+    if args.mcp_transport == "inprocess" and "fork" in multiprocessing.get_all_start_methods():
+        # Workers forked from here inherit the loaded datasets.
+        from tau_bench.envs import get_data_loader
+
+        # The sessions opened above to count the tasks run threads that must
+        # not be forked.
+        mcp_session.mcp_session_pool.close_all()
+        state_store.share_snapshots([get_data_loader(env_name) for env_name in env_names])
+        mp_context = multiprocessing.get_context("fork")
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=args.max_concurrency, mp_context=mp_context) as executor:
+        futures = [executor.submit(_precompute, *job) for job in jobs]
+        for future in as_completed(futures):
+            done += future.result()
+            print(f"Cached {done} ground-truth hashes")
+    print(f"Ground-truth hashes stored in {get_gt_hash_cache().path}")
+
+
+if __name__ == "__main__":
+    main()
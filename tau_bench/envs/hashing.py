@@ -0,0 +1,138 @@
+# Copyright Sierra
+
+from collections.abc import Mapping
+from hashlib import sha256
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+ToHashable = Union[
+    str, int, float, Dict[str, "ToHashable"], List["ToHashable"], Set["ToHashable"]
+]
+Hashable = Union[str, int, float, Tuple["Hashable"], Tuple[Tuple[str, "Hashable"]]]
+
+
+def to_hashable(item: ToHashable) -> Hashable:
+    if isinstance(item, Mapping):
+        return tuple((key, to_hashable(value)) for key, value in sorted(item.items()))
+    elif isinstance(item, list):
+        return tuple(to_hashable(element) for element in item)
+    elif isinstance(item, set):
+        return tuple(sorted(to_hashable(element) for element in item))
+    else:
+        return item
+
+
+def consistent_hash(
+    value: Hashable,
+) -> str:
+    return sha256(str(value).encode("utf-8")).hexdigest()
+
+
+# Each top-level collection of the state is digested as the sum, modulo 2**256,
+# of one leaf hash per record. Two collections get the same digest exactly when
+# they hold the same keys with equal records (as compared by to_hashable), and
+# replacing one record only changes its own leaf, so a copy-on-write fork can
+# update its base's digest in time proportional to the records it touched.
+LEAF_MODULUS = 1 << 256
+
+
+def record_digest(value: ToHashable) -> str:
+    return consistent_hash(to_hashable(value))
+
+
+def leaf_hash(key: str, digest: str) -> int:
+    return int.from_bytes(sha256(f"{key}\0{digest}".encode("utf-8")).digest(), "big")
+
+
+class CollectionDigests(object):
+    """Per-record digests of one collection, computed on first use."""
+
+    def __init__(self, records: Mapping) -> None:
+        self.records = records
+        self._digests: Optional[Dict[str, str]] = None
+        self._total = 0
+
+    def compute(self) -> None:
+        """Computes the digests now instead of on first use."""
+        if self._digests is None:
+            self._compute()
+
+    def _compute(self) -> None:
+        digests = {}
+        total = 0
+        for key, value in self.records.items():
+            digest = record_digest(value)
+            digests[key] = digest
+            total += leaf_hash(key, digest)
+        self._total = total % LEAF_MODULUS
+        self._digests = digests
+
+    @property
+    def digests(self) -> Dict[str, str]:
+        if self._digests is None:
+            self._compute()
+        return self._digests
+
+    @property
+    def total(self) -> int:
+        if self._digests is None:
+            self._compute()
+        return self._total
+
+
+def collection_total(records: Mapping) -> int:
+    if hasattr(records, "merkle_total"):
+        return records.merkle_total()
+    return CollectionDigests(records).total
+
+
+def data_hash(data: Mapping) -> str:
+    """Root hash of an environment state.
+
+    Equal to the root hash of another state exactly when
+    `consistent_hash(to_hashable(...))` of the two states would be equal.
+    """
+    parts = []
+    for name in sorted(data):
+        value = data[name]
+        if isinstance(value, Mapping):
+            parts.append(f"{name}\0c\0{collection_total(value):064x}")
+        else:
+            parts.append(f"{name}\0v\0{record_digest(value)}")
+    return sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def changed_records(data: Mapping) -> Dict[str, Dict[str, Optional[str]]]:
+    """Digests of the records a fork changed relative to its base.
+
+    Deleted records map to None. Plain dicts have no base, so every record is
+    reported. Top-level values that are not collections are left out.
+    """
+    changed = {}
+    for name, value in data.items():
+        if hasattr(value, "changed_records"):
+            records = value.changed_records()
+        elif isinstance(value, Mapping):
+            records = dict(CollectionDigests(value).digests)
+        else:
+            continue
+        if len(records) > 0:
+            changed[name] = records
+    return changed
+
+
+def diff_changed_records(
+    a: Dict[str, Dict[str, Optional[str]]], b: Dict[str, Dict[str, Optional[str]]]
+) -> Dict[str, List[str]]:
+    """Keys of the records that differ between two forks of the same base."""
+    diff = {}
+    for name in sorted(set(a) | set(b)):
+        records_a = a.get(name, {})
+        records_b = b.get(name, {})
+        keys = sorted(
+            key
+            for key in set(records_a) | set(records_b)
+            if records_a.get(key, "base") != records_b.get(key, "base")
+        )
+        if len(keys) > 0:
+            diff[name] = keys
+    return diff
@@ -0,0 +1,267 @@
+import asyncio
+import atexit
+import importlib.util
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import tabulate
+from fastmcp import Client
+
+# "stdio" runs each server file in its own subprocess. "inprocess" imports it
+# and talks to its FastMCP instance in memory, so the state lives in this
+# process and worker processes forked from it share the dataset snapshots.
+TRANSPORTS = ["stdio", "inprocess"]
+
+
+def configure(transport: Optional[str] = None) -> None:
+    """Sets the MCP transport for this process and its children."""
+    if transport is not None:
+        os.environ["TAU_BENCH_MCP_TRANSPORT"] = transport
+
+
+def default_transport() -> str:
+    return os.environ.get("TAU_BENCH_MCP_TRANSPORT", "stdio")
+
+
+def load_server(server: str) -> Any:
+    """Imports a server file and returns its `mcp` instance."""
+    module_name = os.path.splitext(os.path.basename(server))[0]
+    spec = importlib.util.spec_from_file_location(module_name, server)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if getattr(module, "mcp", None) is None:
+        raise RuntimeError(f"No FastMCP instance found in {server}")
+    return module.mcp
+
+
+class ToolCallStats(object):
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if len(latencies) == 0:
+            return {"calls": 0, "total": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "calls": len(latencies),
+            "total": sum(latencies),
+            "mean": sum(latencies) / len(latencies),
+            "p50": latencies[len(latencies) // 2],
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "max": latencies[-1],
+        }
+
+
+class MCPSession(object):
+    """A long-lived MCP client connection to one server.
+
+    The fastmcp client is opened once on a private event loop running in a
+    background thread, so the server process and the MCP handshake are paid for
+    once instead of on every tool call. Calls can be made from any thread.
+    """
+
+    def __init__(self, server: str, connect_timeout: float = 60.0, transport: Optional[str] = None) -> None:
+        if transport is None:
+            transport = default_transport()
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Invalid MCP transport: {transport}")
+        self.server = server
+        self.transport = transport
+        self.connect_timeout = connect_timeout
+        self.stats = ToolCallStats()
+        self._client: Optional[Client] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._serve_future: Optional[Future] = None
+        self._tool_names: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._serve_future is not None and not self._serve_future.done()
+
+    def open(self) -> "MCPSession":
+        with self._lock:
+            if self.is_open:
+                return self
+            self._shutdown_loop()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever,
+                name=f"mcp-session-{os.path.basename(self.server)}",
+                daemon=True,
+            )
+            self._thread.start()
+            ready: Future = Future()
+            self._serve_future = asyncio.run_coroutine_threadsafe(self._serve(ready), self._loop)
+            try:
+                ready.result(timeout=self.connect_timeout)
+            except BaseException:
+                self._shutdown_loop()
+                raise
+        return self
+
+    async def _serve(self, ready: Future) -> None:
+        # The client is entered and exited by this one task; tool calls run as
+        # separate tasks on the same loop and share the open session.
+        try:
+            target = load_server(self.server) if self.transport == "inprocess" else self.server
+            async with Client(target) as client:
+                self._client = client
+                self._stop = asyncio.Event()
+                ready.set_result(None)
+                await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            raise
+        finally:
+            self._client = None
+
+    def _submit(self, coro) -> Future:
+        if not self.is_open:
+            self.open()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _call_tool(self, name: str, arguments: Dict[str, Any]) -> str:
+        res = await self._client.call_tool(name, arguments)
+        return res.content[0].text
+
+    def call_tool(self, name: str, arguments: Dict[str, Any]) -> str:
+        start_time = time.perf_counter()
+        try:
+            return self._submit(self._call_tool(name, arguments)).result()
+        finally:
+            self.stats.record(time.perf_counter() - start_time)
+
+    async def call_tool_async(self, name: str, arguments: Dict[str, Any]) -> str:
+        """Awaitable `call_tool` for callers running on their own event loop."""
+        start_time = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(self._submit(self._call_tool(name, arguments)))
+        finally:
+            self.stats.record(time.perf_counter() - start_time)
+
+    async def _list_tool_names(self) -> List[str]:
+        tools = await self._client.list_tools()
+        return [tool.name for tool in tools]
+
+    def list_tool_names(self) -> List[str]:
+        if self._tool_names is None:
+            self._tool_names = self._submit(self._list_tool_names()).result()
+        return self._tool_names
+
+    def close(self) -> None:
+        with self._lock:
+            if self.is_open and self._stop is not None:
+                self._loop.call_soon_threadsafe(self._stop.set)
+                try:
+                    self._serve_future.result(timeout=self.connect_timeout)
+                except Exception:
+                    pass
+            self._shutdown_loop()
+
+    def _shutdown_loop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=self.connect_timeout)
+            self._loop.close()
+        self._loop = None
+        self._thread = None
+        self._stop = None
+        self._serve_future = None
+        self._tool_names = None
+
+
+def _server_key(server: str) -> Tuple[str, int, int]:
+    # Libgen rewrites server files in place, so a session is only reused while
+    # the file on disk is unchanged.
+    path = os.path.abspath(server)
+    try:
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return (path, 0, 0)
+
+
+class MCPSessionPool(object):
+    """Process-wide registry of open MCP sessions, one per server file."""
+
+    def __init__(self) -> None:
+        self._sessions: Dict[str, Tuple[Tuple[str, int, int], MCPSession]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, server: str) -> MCPSession:
+        key = _server_key(server)
+        stale = None
+        with self._lock:
+            entry = self._sessions.get(key[0])
+            if entry is not None and entry[0] == key:
+                return entry[1]
+            if entry is not None:
+                stale = entry[1]
+            session = MCPSession(server)
+            self._sessions[key[0]] = (key, session)
+        if stale is not None:
+            stale.close()
+        return session
+
+    def sessions(self) -> List[MCPSession]:
+        with self._lock:
+            return [session for _, session in self._sessions.values()]
+
+    def forget_all(self) -> None:
+        """Drops the sessions without closing them, in a forked child: their
+        event loop threads and server subprocesses belong to the parent."""
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def close_all(self) -> None:
+        with self._lock:
+            sessions = [session for _, session in self._sessions.values()]
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+
+def print_tool_call_stats(pool: Optional[MCPSessionPool] = None) -> None:
+    pool = pool or mcp_session_pool
+    rows = []
+    for session in pool.sessions():
+        s = session.stats.summary()
+        if s["calls"] == 0:
+            continue
+        rows.append(
+            (
+                os.path.basename(session.server),
+                s["calls"],
+                f"{s['total']:.3f}",
+                f"{s['mean'] * 1000:.2f}",
+                f"{s['p50'] * 1000:.2f}",
+                f"{s['p95'] * 1000:.2f}",
+                f"{s['max'] * 1000:.2f}",
+            )
+        )
+    if len(rows) > 0:
+        print(
+            tabulate.tabulate(
+                rows,
+                headers=["MCP server", "Calls", "Total (s)", "Mean (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)"],
+            )
+        )
+
+
+mcp_session_pool = MCPSessionPool()
+atexit.register(mcp_session_pool.close_all)
+os.register_at_fork(after_in_child=mcp_session_pool.forget_all)
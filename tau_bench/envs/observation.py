@@ -0,0 +1,110 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+ENCODING_MODES = ["raw", "compact", "project"]
+# Optional key of a tool description, next to "type" and "function", that
+# declares how the tool's observations are projected. It is stripped before
+# the tools are shown to the model. For example:
+#     "observation": {"exclude": ["items.*.options"], "page_size": 20}
+# "include" keeps only the listed top-level fields, "exclude" drops dotted
+# paths ("*" matches every list item or dict value), and "page_size" shows
+# only the first results of a list.
+SPEC_KEY = "observation"
+
+ObservationSpec = Dict[str, Any]
+
+
+def split_observation_specs(
+    tools_info: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], Dict[str, ObservationSpec]]:
+    tools = []
+    specs: Dict[str, ObservationSpec] = {}
+    for tool in tools_info:
+        if SPEC_KEY in tool:
+            specs[tool["function"]["name"]] = tool[SPEC_KEY]
+            tool = {k: v for k, v in tool.items() if k != SPEC_KEY}
+        tools.append(tool)
+    return tools, specs
+
+
+def _exclude(value: Any, path: List[str]) -> Any:
+    if len(path) == 0:
+        return value
+    key, rest = path[0], path[1:]
+    if key == "*":
+        if isinstance(value, list):
+            return [_exclude(v, rest) for v in value]
+        if isinstance(value, dict):
+            return {k: _exclude(v, rest) for k, v in value.items()}
+        return value
+    if isinstance(value, dict) and key in value:
+        if len(rest) == 0:
+            return {k: v for k, v in value.items() if k != key}
+        return {**value, key: _exclude(value[key], rest)}
+    return value
+
+
+def project(value: Any, spec: ObservationSpec) -> Any:
+    if "include" in spec and isinstance(value, dict):
+        value = {k: v for k, v in value.items() if k in spec["include"]}
+    for path in spec.get("exclude", []):
+        value = _exclude(value, path.split("."))
+    page_size = spec.get("page_size")
+    if page_size is not None and isinstance(value, list) and len(value) > page_size:
+        value = {
+            "results": value[:page_size],
+            "total": len(value),
+            "note": f"Only the first {page_size} of {len(value)} results are shown",
+        }
+    return value
+
+
+class ObservationEncoder(object):
+    """Re-encodes JSON tool observations before the agent sees them.
+
+    "raw" leaves them alone, "compact" drops the whitespace of the default
+    separators (lossless), and "project" also applies the tool's declared
+    field projection and paging. Non-JSON observations, such as errors, are
+    never changed. Rewards are computed from the database state, so the
+    encoding does not affect them.
+    """
+
+    def __init__(self, mode: str = "raw", specs: Optional[Dict[str, ObservationSpec]] = None) -> None:
+        if mode not in ENCODING_MODES:
+            raise ValueError(f"Invalid observation encoding: {mode}")
+        self.mode = mode
+        self.specs = specs or {}
+
+    def encode(self, tool_name: str, observation: str) -> Tuple[str, bool]:
+        """Returns the encoded observation and whether it still holds
+        everything the raw one did."""
+        if self.mode == "raw" or not isinstance(observation, str):
+            return observation, True
+        stripped = observation.lstrip()
+        if not stripped.startswith(("{", "[")):
+            return observation, True
+        try:
+            value = json.loads(observation)
+        except ValueError:
+            return observation, True
+        lossless = True
+        spec = self.specs.get(tool_name)
+        if self.mode == "project" and spec is not None:
+            projected = project(value, spec)
+            lossless = projected == value
+            value = projected
+        encoded = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        if len(encoded) >= len(observation) and lossless:
+            return observation, True
+        return encoded, lossless
+
+
+def configure(mode: Optional[str] = None) -> None:
+    """Sets the observation encoding for this process and its children."""
+    if mode is not None:
+        os.environ["TAU_BENCH_OBSERVATION_ENCODING"] = mode
+
+
+def encoding_mode() -> str:
+    return os.environ.get("TAU_BENCH_OBSERVATION_ENCODING", "raw")
@@ -42,3 +42,5 @@ class MockRetailDomainEnv(Env):
             mcp_server=mcp_server,
         )
         self.terminate_tools = ["transfer_to_human_agents"]
+        self.env_name = "retail"
+        self.task_split = task_split
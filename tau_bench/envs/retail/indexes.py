@@ -0,0 +1,22 @@
+from typing import Any, Dict, Optional, Tuple
+
+from tau_bench.envs.snapshot import find_items
+
+
+def user_email(profile: Dict[str, Any]) -> str:
+    return profile["email"].lower()
+
+
+def user_name_zip(profile: Dict[str, Any]) -> Tuple[str, str, str]:
+    name = profile["name"]
+    return (name["first_name"].lower(), name["last_name"].lower(), profile["address"]["zip"])
+
+
+def find_user_id_by_email(users: Dict[str, Any], email: str) -> Optional[str]:
+    matches = find_items(users, user_email, email.lower())
+    return matches[0][0] if len(matches) > 0 else None
+
+
+def find_user_id_by_name_zip(users: Dict[str, Any], first_name: str, last_name: str, zip: str) -> Optional[str]:
+    matches = find_items(users, user_name_zip, (first_name.lower(), last_name.lower(), zip))
+    return matches[0][0] if len(matches) > 0 else None
@@ -0,0 +1,307 @@
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+from tau_bench.envs.hashing import LEAF_MODULUS, CollectionDigests, leaf_hash, record_digest
+
+
+def copy_record(value: Any) -> Any:
+    """Copies JSON-shaped data; much cheaper than `copy.deepcopy` for it."""
+    if isinstance(value, dict):
+        return {k: copy_record(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_record(v) for v in value]
+    return value
+
+
+def _read_only(self, *args: Any, **kwargs: Any) -> None:
+    raise TypeError(
+        "Snapshot records are read-only; look the record up by key in its collection to modify a copy"
+    )
+
+
+class FrozenDict(dict):
+    """A dict of a snapshot's base that refuses writes. Reads, `json.dumps`
+    and hashing see a plain dict; copies are plain dicts."""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[str, Any]:
+        return copy_record(self)
+
+
+class FrozenList(list):
+    """A list of a snapshot's base that refuses writes, like `FrozenDict`."""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = remove = pop = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+    def __copy__(self) -> List[Any]:
+        return list(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> List[Any]:
+        return copy_record(self)
+
+
+def freeze_record(value: Any) -> Any:
+    """Returns a read-only copy of JSON-shaped data."""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze_record(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze_record(v) for v in value)
+    return value
+
+
+# Maps a record to its key in a secondary index, or None to leave it out.
+IndexKey = Callable[[Any], Optional[Hashable]]
+
+
+class CollectionIndex(object):
+    """A secondary index of one collection: index key to record ids, built
+    on first use."""
+
+    def __init__(self, records: Dict[str, Any], key: IndexKey) -> None:
+        self.records = records
+        self.key = key
+        self._ids: Optional[Dict[Hashable, List[str]]] = None
+        self._positions: Optional[Dict[str, int]] = None
+
+    def lookup(self, value: Hashable) -> List[str]:
+        if self._ids is None:
+            ids: Dict[Hashable, List[str]] = {}
+            for record_id, record in self.records.items():
+                record_key = self.key(record)
+                if record_key is not None:
+                    ids.setdefault(record_key, []).append(record_id)
+            self._ids = ids
+        return self._ids.get(value, [])
+
+    def position(self, record_id: str) -> int:
+        """Where a record comes when iterating over the collection; records
+        not in it come after all of its own."""
+        if self._positions is None:
+            self._positions = {record_id: i for i, record_id in enumerate(self.records)}
+        return self._positions.get(record_id, len(self._positions))
+
+
+class ForkedCollection(MutableMapping):
+    """A private, writable view of one top-level collection of a snapshot.
+
+    Records are copied out of the shared base the first time they are looked
+    up by key, so untouched records are never copied. Iterating over values
+    or items, or `find_items`, yields the base records themselves, which the
+    snapshot froze: writing to them raises TypeError instead of changing the
+    base under every other fork. Look a record up by key to modify it.
+    """
+
+    __slots__ = ("base", "base_digests", "base_views", "overlay", "deleted")
+
+    def __init__(
+        self,
+        base: Dict[str, Any],
+        base_digests: Optional[CollectionDigests] = None,
+        base_views: Optional[Dict[Hashable, Any]] = None,
+    ) -> None:
+        self.base = base
+        self.base_digests = base_digests if base_digests is not None else CollectionDigests(base)
+        self.base_views = base_views if base_views is not None else {}
+        self.overlay: Dict[str, Any] = {}
+        self.deleted: Set[str] = set()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.overlay:
+            return self.overlay[key]
+        if key in self.deleted or key not in self.base:
+            raise KeyError(key)
+        value = copy_record(self.base[key])
+        self.overlay[key] = value
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.overlay[key] = value
+        self.deleted.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key in self.overlay:
+            del self.overlay[key]
+            if key in self.base:
+                self.deleted.add(key)
+        elif key in self.base and key not in self.deleted:
+            self.deleted.add(key)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self.overlay:
+            return True
+        return key in self.base and key not in self.deleted
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.base:
+            if key not in self.deleted:
+                yield key
+        for key in self.overlay:
+            if key not in self.base:
+                yield key
+
+    def __len__(self) -> int:
+        extra = sum(1 for key in self.overlay if key not in self.base)
+        return len(self.base) - len(self.deleted) + extra
+
+    def _peek(self, key: str) -> Any:
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.base[key]
+
+    def values(self):
+        return [self._peek(key) for key in self]
+
+    def items(self):
+        return [(key, self._peek(key)) for key in self]
+
+    def base_view(self, name: Hashable, build: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Returns `build(base)`, built on first use and shared by every fork
+        of the snapshot. It sees the base records only; the records in
+        `overlay` and `deleted` replace it for this fork."""
+        view = self.base_views.get(name)
+        if view is None:
+            view = self.base_views.setdefault(name, build(self.base))
+        return view
+
+    def find(self, key: IndexKey, value: Hashable) -> List[str]:
+        """Ids of the records whose `key(record)` is `value`, in the order
+        iterating over the collection yields them.
+
+        The index of the base is shared by every fork. Records this fork
+        touched are checked directly instead, so writes made through the
+        fork are always reflected.
+        """
+        index = self.base_view(key, lambda base: CollectionIndex(base, key))
+        ids = [
+            i
+            for i in index.lookup(value)
+            if i not in self.deleted and (i not in self.overlay or key(self.overlay[i]) == value)
+        ]
+        # Touched records whose key changed to `value`, or that are new.
+        moved = [
+            i
+            for i, record in self.overlay.items()
+            if key(record) == value and (i not in self.base or key(self.base[i]) != value)
+        ]
+        if len(moved) > 0:
+            ids = sorted(ids + moved, key=index.position)
+        return ids
+
+    def touched_keys(self) -> Set[str]:
+        return set(self.overlay) | self.deleted
+
+    def merkle_total(self) -> int:
+        # Start from the base digest and swap in the leaves of the touched
+        # records only.
+        base_digests = self.base_digests.digests
+        total = self.base_digests.total
+        for key in self.deleted:
+            total -= leaf_hash(key, base_digests[key])
+        for key, value in self.overlay.items():
+            if key in base_digests:
+                total -= leaf_hash(key, base_digests[key])
+            total += leaf_hash(key, record_digest(value))
+        return total % LEAF_MODULUS
+
+    def changed_records(self) -> Dict[str, Optional[str]]:
+        base_digests = self.base_digests.digests
+        changed: Dict[str, Optional[str]] = {key: None for key in self.deleted}
+        for key, value in self.overlay.items():
+            digest = record_digest(value)
+            if digest != base_digests.get(key):
+                changed[key] = digest
+        return changed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: copy_record(self._peek(key)) for key in self}
+
+    def reset(self) -> None:
+        self.overlay.clear()
+        self.deleted.clear()
+
+
+class Snapshot(object):
+    """An immutable base dataset that Envs fork instead of reloading."""
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        # Records of collections are frozen so that reading them without a
+        # copy can never write to the base.
+        self.data = {
+            name: {key: freeze_record(record) for key, record in value.items()} if isinstance(value, dict) else value
+            for name, value in data.items()
+        }
+        # Record digests of the base are computed once per snapshot and shared
+        # by all of its forks.
+        self.digests: Dict[str, CollectionDigests] = {
+            name: CollectionDigests(value) for name, value in data.items() if isinstance(value, dict)
+        }
+        # So are the secondary indexes and other views derived from them.
+        self.views: Dict[str, Dict[Hashable, Any]] = {
+            name: {} for name, value in data.items() if isinstance(value, dict)
+        }
+
+    def compute_digests(self) -> None:
+        """Computes the record digests of every collection now, e.g. before
+        forking processes that should share them."""
+        for digests in self.digests.values():
+            digests.compute()
+
+    def _fork_collection(self, name: str) -> ForkedCollection:
+        return ForkedCollection(self.data[name], self.digests[name], self.views[name])
+
+    def fork(self) -> Dict[str, Any]:
+        return {
+            name: self._fork_collection(name) if isinstance(value, dict) else copy_record(value)
+            for name, value in self.data.items()
+        }
+
+    def reset_fork(self, forked: Dict[str, Any]) -> None:
+        for name, value in self.data.items():
+            if isinstance(forked.get(name), ForkedCollection):
+                forked[name].reset()
+            elif isinstance(value, dict):
+                forked[name] = self._fork_collection(name)
+            else:
+                forked[name] = copy_record(value)
+
+
+def find_items(records: Dict[str, Any], key: IndexKey, value: Hashable) -> List[Tuple[str, Any]]:
+    """(id, record) pairs of the records whose `key(record)` is `value`, in
+    iteration order, through the shared index when `records` is a fork and by
+    scanning them otherwise. Like `items()` on a fork, the records may be
+    the snapshot's own, frozen ones; look a record up by id to modify it."""
+    if isinstance(records, ForkedCollection):
+        return [(record_id, records._peek(record_id)) for record_id in records.find(key, value)]
+    return [(record_id, record) for record_id, record in records.items() if key(record) == value]
+
+
+_snapshots: Dict[Any, Snapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def load_snapshot(data_load_func: Callable[[], Dict[str, Any]], key: Optional[Any] = None) -> Snapshot:
+    """Returns the process-wide snapshot for a loader, loading it on first use."""
+    key = key if key is not None else data_load_func
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            snapshot = Snapshot(data_load_func())
+            _snapshots[key] = snapshot
+        return snapshot
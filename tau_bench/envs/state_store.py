@@ -0,0 +1,261 @@
+import functools
+import gc
+import importlib
+import inspect
+import json
+import threading
+import uuid
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from tau_bench.envs.hashing import changed_records, data_hash
+from tau_bench.envs.snapshot import Snapshot, load_snapshot
+
+SESSION_ARG = "session_id"
+DEFAULT_SESSION_ID = "default"
+
+OPEN_SESSION_TOOL = "_open_session"
+RESET_SESSION_TOOL = "_reset_session"
+CLOSE_SESSION_TOOL = "_close_session"
+SESSION_HASH_TOOL = "_get_session_hash"
+SESSION_CHANGES_TOOL = "_get_session_changes"
+
+
+def data_source(data_load_func: Callable[[], Dict[str, Any]]) -> str:
+    """Returns the "module:function" reference a server uses to load a dataset."""
+    return f"{data_load_func.__module__}:{data_load_func.__qualname__}"
+
+
+def is_importable_source(data_load_func: Callable[[], Dict[str, Any]]) -> bool:
+    return "<" not in data_load_func.__qualname__ and data_load_func.__module__ != "__main__"
+
+
+def resolve_data_source(source: str) -> Callable[[], Dict[str, Any]]:
+    module_name, _, func_name = source.partition(":")
+    func: Any = importlib.import_module(module_name)
+    for attr in func_name.split("."):
+        func = getattr(func, attr)
+    return func
+
+
+class StateStore(object):
+    """In-memory environment state, keyed by session id.
+
+    Lives in the MCP server process. Every session is a copy-on-write fork of
+    its source snapshot, which is loaded once per source, and tools mutate the
+    session's data in place instead of round-tripping it through a file. The
+    session id is the only state handle that travels with a tool call.
+    """
+
+    def __init__(self) -> None:
+        self._inline: Dict[str, Snapshot] = {}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._session_sources: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _snapshot(self, source: str) -> Snapshot:
+        if source in self._inline:
+            return self._inline[source]
+        return load_snapshot(resolve_data_source(source), key=source)
+
+    def open(
+        self,
+        source: str,
+        session_id: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        if data is not None:
+            # Datasets registered inline are kept as the session's own base so
+            # that resetting the session does not need them to be sent again.
+            source = f"inline:{session_id}"
+            with self._lock:
+                self._inline[source] = Snapshot(data)
+        forked = self._snapshot(source).fork()
+        with self._lock:
+            self._sessions[session_id] = forked
+            self._session_sources[session_id] = source
+        return session_id
+
+    def reset(self, session_id: str) -> None:
+        # Dropping the overlays costs time proportional to the records the
+        # session touched, not to the size of the dataset.
+        self._snapshot(self._session_sources[session_id]).reset_fork(self.get(session_id))
+
+    def close(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            source = self._session_sources.pop(session_id, None)
+            if source is not None:
+                self._inline.pop(source, None)
+
+    def has(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        try:
+            return self._sessions[session_id]
+        except KeyError:
+            raise KeyError(f"Unknown state session: {session_id}")
+
+    def data_hash(self, session_id: str) -> str:
+        return data_hash(self.get(session_id))
+
+    def changed_records(self, session_id: str) -> Dict[str, Dict[str, Optional[str]]]:
+        return changed_records(self.get(session_id))
+
+
+state_store = StateStore()
+
+
+def share_snapshots(data_load_funcs: List[Callable[[], Dict[str, Any]]]) -> None:
+    """Prepares the datasets to be shared with worker processes forked next.
+
+    Loads their snapshots and record digests into this process's state store
+    and freezes every object allocated so far. With the "inprocess" MCP
+    transport, the sessions of forked workers then fork these snapshots
+    instead of loading their own, so a worker only allocates the overlays of
+    the records its Envs touch. Freezing keeps the workers' garbage
+    collections from visiting, and so copying, the inherited pages.
+    """
+    for data_load_func in data_load_funcs:
+        state_store._snapshot(data_source(data_load_func)).compute_digests()
+    gc.freeze()
+
+_current_session: ContextVar[Optional[str]] = ContextVar("tau_bench_state_session", default=None)
+
+
+def get_data() -> Dict[str, Any]:
+    """Returns the state of the session the running tool call is bound to."""
+    session_id = _current_session.get()
+    if session_id is None:
+        raise RuntimeError("No state session is bound to this tool call")
+    return state_store.get(session_id)
+
+
+def bind_session(fn: Callable, default_session: Optional[Callable[[], Optional[str]]] = None) -> Callable:
+    """Adds a `session_id` argument to a tool and binds it for `get_data`.
+
+    Only an explicitly passed session id rebinds the state, so tools that call
+    other tools directly keep operating on the caller's session. A call that
+    passes none and runs outside any session is bound to `default_session()`,
+    when given and it returns one.
+    """
+    sig = inspect.signature(fn)
+    if SESSION_ARG in sig.parameters:
+        return fn
+    params = list(sig.parameters.values())
+    session_param = inspect.Parameter(
+        SESSION_ARG, inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Optional[str]
+    )
+    if len(params) > 0 and params[-1].kind == inspect.Parameter.VAR_KEYWORD:
+        params.insert(len(params) - 1, session_param)
+    else:
+        params.append(session_param)
+
+    def resolve(session_id: Optional[str]) -> Optional[str]:
+        if session_id is None and _current_session.get() is None and default_session is not None:
+            return default_session()
+        return session_id
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, session_id: Optional[str] = None, **kwargs):
+            session_id = resolve(session_id)
+            if session_id is None:
+                return await fn(*args, **kwargs)
+            token = _current_session.set(session_id)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _current_session.reset(token)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, session_id: Optional[str] = None, **kwargs):
+            session_id = resolve(session_id)
+            if session_id is None:
+                return fn(*args, **kwargs)
+            token = _current_session.set(session_id)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current_session.reset(token)
+
+    wrapper.__signature__ = sig.replace(parameters=params)
+    return wrapper
+
+
+class SessionFastMCP(FastMCP):
+    """FastMCP server whose tools read and write session-scoped state.
+
+    Every tool registered with `@mcp.tool()` accepts a hidden `session_id`
+    argument, and the server exposes underscore-prefixed tools that an Env uses
+    to open, reset, hash and close its session. The decorated function itself
+    is returned unchanged so tools can keep calling each other directly.
+
+    Tool calls that pass no session id run on a default session of this
+    server, opened from `default_source` on first use. Each server has its
+    own, so servers of different domains sharing a process never see each
+    other's data.
+    """
+
+    def __init__(self, name: Optional[str] = None, default_source: Optional[str] = None, **settings: Any) -> None:
+        super().__init__(name, **settings)
+        self.default_source = default_source
+        self.default_session_id = f"{DEFAULT_SESSION_ID}:{uuid.uuid4().hex}"
+        self._default_session_lock = threading.Lock()
+        self.add_tool(self._open_session, name=OPEN_SESSION_TOOL)
+        self.add_tool(self._reset_session, name=RESET_SESSION_TOOL)
+        self.add_tool(self._close_session, name=CLOSE_SESSION_TOOL)
+        self.add_tool(self._get_session_hash, name=SESSION_HASH_TOOL)
+        self.add_tool(self._get_session_changes, name=SESSION_CHANGES_TOOL)
+
+    def tool(self, *args: Any, **kwargs: Any) -> Callable:
+        register = super().tool(*args, **kwargs)
+
+        def decorator(fn: Callable) -> Callable:
+            register(bind_session(fn, self._default_session))
+            return fn
+
+        return decorator
+
+    def _default_session(self) -> Optional[str]:
+        if self.default_source is None:
+            return None
+        with self._default_session_lock:
+            if not state_store.has(self.default_session_id):
+                state_store.open(self.default_source, session_id=self.default_session_id)
+        return self.default_session_id
+
+    def _open_session(self, source: str = "", data: Optional[Dict[str, Any]] = None) -> str:
+        """Opens a new state session and returns its id.
+
+        The dataset is loaded server-side from `source`, a "module:function"
+        reference, or taken from `data` when the caller's loader cannot be
+        imported by the server.
+        """
+        source = source or self.default_source
+        if not source and data is None:
+            raise ValueError("No data source given and the server has no default")
+        return state_store.open(source, data=data)
+
+    def _reset_session(self, session_id: str) -> str:
+        """Resets a state session to its source dataset."""
+        state_store.reset(session_id)
+        return session_id
+
+    def _close_session(self, session_id: str) -> str:
+        """Drops a state session."""
+        state_store.close(session_id)
+        return session_id
+
+    def _get_session_hash(self, session_id: str) -> str:
+        """Returns the hash of a state session's data."""
+        return state_store.data_hash(session_id)
+
+    def _get_session_changes(self, session_id: str) -> str:
+        """Returns, as JSON, the digests of the records a session changed."""
+        return json.dumps(state_store.changed_records(session_id))
@@ -1,11 +1,12 @@
 # Copyright Sierra
 from termcolor import colored
 import abc
+import asyncio
 import enum
 # from litellm import completion
 
 from typing import Optional, List, Dict, Any, Union
-from tau_bench.trapi_infer import completion, model_dump
+from tau_bench.trapi_infer import acompletion, completion, model_dump
 
 
 class BaseUserSimulationEnv(abc.ABC):
@@ -23,6 +24,14 @@ class BaseUserSimulationEnv(abc.ABC):
     def get_total_cost(self) -> float:
         raise NotImplementedError
 
+    # Simulators without a native async implementation run their blocking
+    # methods on a worker thread.
+    async def reset_async(self, instruction: Optional[str] = None) -> str:
+        return await asyncio.to_thread(self.reset, instruction)
+
+    async def step_async(self, content: str) -> str:
+        return await asyncio.to_thread(self.step, content)
+
 
 class HumanUserSimulationEnv(BaseUserSimulationEnv):
     def reset(self, instruction: str) -> str:
@@ -55,6 +64,15 @@ class LLMUserSimulationEnv(BaseUserSimulationEnv):
         self.total_cost = res.usage.total_tokens
         return message.content
 
+    async def generate_next_message_async(self, messages: List[Dict[str, Any]]) -> str:
+        res = await acompletion(
+            model=self.model, custom_llm_provider=self.provider, messages=messages
+        )
+        message = res.choices[0].message
+        self.messages.append(model_dump(message))
+        self.total_cost = res.usage.total_tokens
+        return message.content
+
     def build_system_prompt(self, instruction: Optional[str]) -> str:
         instruction_display = (
             ("\n\nInstruction: " + instruction + "\n")
@@ -85,6 +103,20 @@ Rules:
         res = self.generate_next_message(self.messages)
         return res
 
+    async def reset_async(self, instruction: Optional[str] = None) -> str:
+        self.messages = [
+            {
+                "role": "system",
+                "content": self.build_system_prompt(instruction=instruction),
+            },
+            {"role": "user", "content": "Hi! How can I help you today?"},
+        ]
+        return await self.generate_next_message_async(self.messages)
+
+    async def step_async(self, content: str) -> str:
+        self.messages.append({"role": "user", "content": content})
+        return await self.generate_next_message_async(self.messages)
+
     def get_total_cost(self) -> float:
         return self.total_cost
     
@@ -136,6 +168,29 @@ Rules:
         res = self.generate_next_message(self.messages)
         return res
 
+    async def generate_next_message_async(self, messages: List[Dict[str, Any]]) -> str:
+        res = await acompletion(
+            model=self.model, custom_llm_provider=self.provider, messages=messages
+        )
+        message = res.choices[0].message
+        self.messages.append(model_dump(message))
+        self.total_cost = res.usage.total_tokens
+        return message.content
+
+    async def reset_async(self, instruction: Optional[str] = None) -> str:
+        self.messages = [
+            {
+                "role": "system",
+                "content": self.build_system_prompt(instruction=instruction),
+            },
+            {"role": "user", "content": "Hi! How can I help you today?"},
+        ]
+        return await self.generate_next_message_async(self.messages)
+
+    async def step_async(self, content: str) -> str:
+        self.messages.append({"role": "user", "content": content})
+        return await self.generate_next_message_async(self.messages)
+
     def get_total_cost(self) -> float:
         return self.total_cost
 
@@ -179,6 +234,15 @@ User Response:
         self.total_cost = res.usage.total_tokens
         return self.parse_response(message.content)
 
+    async def generate_next_message_async(self, messages: List[Dict[str, Any]]) -> str:
+        res = await acompletion(
+            model=self.model, custom_llm_provider=self.provider, messages=messages
+        )
+        message = res.choices[0].message
+        self.messages.append(model_dump(message))
+        self.total_cost = res.usage.total_tokens
+        return self.parse_response(message.content)
+
     def reset(self, instruction: Optional[str] = None) -> str:
         self.messages = [
             {
@@ -247,6 +311,10 @@ class VerifyUserSimulationEnv(LLMUserSimulationEnv):
         self.messages.append({"role": "user", "content": content})
         return self.generate_next_message(self.messages)
 
+    # Verification rounds are synchronous; run them on a worker thread.
+    reset_async = BaseUserSimulationEnv.reset_async
+    step_async = BaseUserSimulationEnv.step_async
+
     def get_total_cost(self) -> float:
         return self.total_cost
 
@@ -362,6 +430,10 @@ class ReflectionUserSimulationEnv(LLMUserSimulationEnv):
         self.messages.append({"role": "user", "content": content})
         return self.generate_next_message(self.messages)
 
+    # Verification rounds are synchronous; run them on a worker thread.
+    reset_async = BaseUserSimulationEnv.reset_async
+    step_async = BaseUserSimulationEnv.step_async
+
     def get_total_cost(self) -> float:
         return self.total_cost
 
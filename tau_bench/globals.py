@@ -1,6 +1,9 @@
 import time 
+import threading
 import tabulate
 
+from tau_bench import tracing
+
 class DebugFlag():
     def __init__(self):
         self.debug = False
@@ -16,38 +19,89 @@ class DebugFlag():
     
 
 class ContextLength():
+    # Keeps running totals rather than every length, and attaches the context
+    # size to the current span so it shows up per call in the trace.
     def __init__(self):
-        self.length = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._lock = threading.Lock()
 
     def add(self, length):
-        self.length.append(length)
+        with self._lock:
+            self.count += 1
+            self.total += length
+            self.max = max(self.max, length)
+        span = tracing.current_span()
+        if span is not None:
+            span.set(context_chars=length)
 
     def get_lengths_from_messages(self, messages):
-        lengths = []
-        for message in messages:
-            lengths.append(len(message['content']))
-        self.add(lengths)
+        self.add(sum(len(message['content'] or '') for message in messages))
+
+    def summary(self):
+        with self._lock:
+            mean = self.total / self.count if self.count > 0 else 0
+            return {"count": self.count, "mean": mean, "max": self.max}
 
 
 class Time():
-    def __init__(self):
-        self.total_time = 0
+    # A view over the spans of one category: time recorded here becomes a
+    # span of the current task, and the total is read back from the tracer.
+    def __init__(self, category):
+        self.category = category
 
     def record_time(self, t):
-        self.total_time += t
+        tracing.record(self.category, self.category, t)
 
     def get_time(self):
-        return self.total_time
+        return tracing.tracer.total(self.category)
     
+class PromptCacheUsage():
+    # Per-call prompt and cached prompt token counts, as reported by the
+    # provider, with the latency of the call.
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def record(self, model, prompt_tokens, cached_tokens, latency):
+        with self._lock:
+            self.calls.append((model, prompt_tokens, cached_tokens, latency))
+
+    def summary(self):
+        with self._lock:
+            calls = list(self.calls)
+        rows = {}
+        for model, prompt_tokens, cached_tokens, latency in calls:
+            row = rows.setdefault(model, [0, 0, 0, 0.0])
+            row[0] += 1
+            row[1] += prompt_tokens or 0
+            row[2] += cached_tokens or 0
+            row[3] += latency
+        return rows
+
+
+def print_prompt_cache_usage():
+    rows = prompt_cache_usage.summary()
+    if len(rows) == 0:
+        return
+    table = [
+        (model, calls, prompt, cached, f"{100.0 * cached / prompt:.1f}%" if prompt > 0 else "-", f"{latency / calls:.2f}")
+        for model, (calls, prompt, cached, latency) in sorted(rows.items(), key=lambda item: str(item[0]))
+    ]
+    print(tabulate.tabulate(table, headers=["Model", "Calls", "Prompt tokens", "Cached tokens", "Cached", "Mean latency (s)"]))
+
+
 def print_times():
     times = [("LLM", llm_time.get_time()), ("Env Step", env_time.get_time()), ("Action Agent", action_agent_time.get_time()), ("Precondition Agent", precondition_agent_time.get_time()), ("Postcondition Agent", postcondition_agent_time.get_time())]
     print(tabulate.tabulate(times, headers=["Source", "Time"]))
-    print('Context lengths', contextLength.length)
+    print('Context lengths', contextLength.summary())
 
 
-llm_time = Time()
-env_time = Time()
-action_agent_time = Time()
-precondition_agent_time = Time()
-postcondition_agent_time = Time()
-contextLength = ContextLength()
\ No newline at end of file
+llm_time = Time(tracing.LLM)
+env_time = Time("env")
+action_agent_time = Time("action_agent")
+precondition_agent_time = Time("precondition_agent")
+postcondition_agent_time = Time("postcondition_agent")
+contextLength = ContextLength()
+prompt_cache_usage = PromptCacheUsage()
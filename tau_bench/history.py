@@ -0,0 +1,244 @@
+import importlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from tau_bench import tracing
+
+COMPACTION_MODES = ["off", "elide", "budget"]
+# Model modules of model_utils with a MAX_CONTEXT_LENGTH_MAP, looked up in order.
+CONTEXT_LENGTH_MODULES = ["openai", "vllm_chat", "claude", "mistral", "anyscale"]
+CONTEXT_LENGTH_FALLBACK = 128000
+# Tokens left free for the completion when the budget comes from the model.
+COMPLETION_RESERVE = 4096
+# Tool outputs this recent are never truncated for the budget.
+KEEP_RECENT = 2
+# What is left of an old tool output truncated for the budget.
+TRUNCATED_CHARS = 200
+# Tools that return the whole record named by one of their arguments, by that
+# argument. A later call to any of them returns a fresher copy of the record
+# an earlier one returned, when they name the same record.
+RECORD_TOOLS = {
+    "get_user_details": "user_id",
+    "modify_user_address": "user_id",
+    "get_order_details": "order_id",
+    "cancel_pending_order": "order_id",
+    "modify_pending_order_address": "order_id",
+    "modify_pending_order_items": "order_id",
+    "modify_pending_order_payment": "order_id",
+    "return_delivered_order_items": "order_id",
+    "exchange_delivered_order_items": "order_id",
+    "get_reservation_details": "reservation_id",
+    "cancel_reservation": "reservation_id",
+    "update_reservation_flights": "reservation_id",
+    "update_reservation_passengers": "reservation_id",
+    "update_reservation_baggages": "reservation_id",
+}
+
+_context_lengths: Dict[str, int] = {}
+
+
+def max_context_length(model: Optional[str]) -> int:
+    if model is None:
+        return CONTEXT_LENGTH_FALLBACK
+    if model not in _context_lengths:
+        length = CONTEXT_LENGTH_FALLBACK
+        for name in CONTEXT_LENGTH_MODULES:
+            try:
+                module = importlib.import_module(f"tau_bench.model_utils.model.{name}")
+            except ImportError:
+                continue
+            if model in module.MAX_CONTEXT_LENGTH_MAP:
+                length = module.MAX_CONTEXT_LENGTH_MAP[model]
+                break
+        _context_lengths[model] = length
+    return _context_lengths[model]
+
+
+def num_tokens(messages: List[Dict[str, Any]]) -> int:
+    # Same estimate as model_utils: about four characters per token.
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4
+
+
+def _arguments(arguments: Any) -> Dict[str, Any]:
+    if isinstance(arguments, dict):
+        return arguments
+    try:
+        parsed = json.loads(arguments)
+    except (TypeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _is_record(content: Any) -> bool:
+    return isinstance(content, str) and content.lstrip().startswith("{")
+
+
+class ToolResult(object):
+    __slots__ = ("index", "name", "arguments", "content")
+
+    def __init__(self, index: int, name: str, arguments: Dict[str, Any], content: Any) -> None:
+        self.index = index
+        self.name = name
+        self.arguments = arguments
+        self.content = content
+
+    def superseded_by(self, later: "ToolResult") -> bool:
+        """Whether `later` makes this output stale.
+
+        That is the case when the same call was made again, or when both
+        calls return the same record (see `RECORD_TOOLS`), e.g.
+        `get_order_details` followed by `cancel_pending_order` on that
+        order. Calls that merely share an argument, such as
+        `get_user_details` and `book_reservation` for one user, return
+        different records and never supersede each other.
+        """
+        if isinstance(later.content, str) and later.content.startswith("Error"):
+            return False
+        if later.name == self.name and later.arguments == self.arguments:
+            return True
+        id_arg = RECORD_TOOLS.get(self.name)
+        return (
+            id_arg is not None
+            and RECORD_TOOLS.get(later.name) == id_arg
+            and self.arguments.get(id_arg) is not None
+            and later.arguments.get(id_arg) == self.arguments[id_arg]
+            and _is_record(self.content)
+            and _is_record(later.content)
+        )
+
+
+def tool_results(messages: List[Dict[str, Any]]) -> List[ToolResult]:
+    calls: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    results = []
+    for i, message in enumerate(messages):
+        if message.get("role") == "assistant":
+            for tool_call in message.get("tool_calls") or []:
+                if not isinstance(tool_call, dict):
+                    continue
+                function = tool_call.get("function") or {}
+                calls[tool_call.get("id")] = (function.get("name"), _arguments(function.get("arguments")))
+        elif message.get("role") == "tool":
+            name, arguments = calls.get(message.get("tool_call_id"), (message.get("name"), {}))
+            results.append(ToolResult(i, name, arguments, message.get("content")))
+    return results
+
+
+class HistoryCompactor(object):
+    """Shrinks an agent conversation before it is sent to the model.
+
+    "elide" replaces tool outputs that a later call made stale with a short
+    note. "budget" also truncates the oldest tool outputs, except the most
+    recent ones, until the conversation fits in `token_budget` (by default
+    the model's context length less room for the completion).
+
+    The agent's own message list is never modified, so trajectories are
+    still logged verbatim. Tokens saved are counted per task.
+    """
+
+    def __init__(self, mode: str = "elide", token_budget: Optional[int] = None) -> None:
+        if mode not in COMPACTION_MODES:
+            raise ValueError(f"Invalid history compaction mode: {mode}")
+        self.mode = mode
+        self.token_budget = token_budget
+        self.saved: Dict[Tuple[Any, Any], int] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, model: Optional[str]) -> int:
+        if self.token_budget is not None:
+            return self.token_budget
+        return max_context_length(model) - COMPLETION_RESERVE
+
+    def compact(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> List[Dict[str, Any]]:
+        if self.mode == "off" or not all(isinstance(message, dict) for message in messages):
+            return messages
+        if not any(message.get("role") == "tool" for message in messages):
+            return messages
+        results = tool_results(messages)
+        compacted = list(messages)
+        for i, result in enumerate(results):
+            later = next((r for r in results[i + 1 :] if result.superseded_by(r)), None)
+            if later is not None:
+                compacted[result.index] = {
+                    **messages[result.index],
+                    "content": f"[Output elided: superseded by the later {later.name} call]",
+                }
+        if self.mode == "budget":
+            budget = self.budget(model)
+            tokens = num_tokens(compacted)
+            for result in results[: max(0, len(results) - KEEP_RECENT)]:
+                if tokens <= budget:
+                    break
+                content = str(compacted[result.index].get("content") or "")
+                if len(content) <= TRUNCATED_CHARS:
+                    continue
+                compacted[result.index] = {
+                    **messages[result.index],
+                    "content": f"{content[:TRUNCATED_CHARS]}... [truncated {len(content) - TRUNCATED_CHARS} characters]",
+                }
+                tokens = num_tokens(compacted)
+        saved = num_tokens(messages) - num_tokens(compacted)
+        if saved > 0:
+            self._count(saved)
+        return compacted
+
+    def _count(self, saved: int) -> None:
+        span = tracing.current_span()
+        if span is not None:
+            span.set(history_tokens_saved=saved)
+        task = span.task if span is not None else None
+        key = (task.attrs.get("trial"), task.attrs.get("task_id")) if task is not None else (None, None)
+        with self._lock:
+            self.saved[key] = self.saved.get(key, 0) + saved
+
+    def saved_tokens(self, trial: Any, task_id: Any) -> int:
+        with self._lock:
+            return self.saved.get((trial, task_id), 0)
+
+    def total_saved_tokens(self) -> int:
+        with self._lock:
+            return sum(self.saved.values())
+
+
+_compactor: Optional[HistoryCompactor] = None
+_compactor_lock = threading.Lock()
+
+
+def configure(mode: Optional[str] = None, token_budget: Optional[int] = None) -> None:
+    """Sets the compaction mode and budget for this process and its children."""
+    if mode is not None:
+        os.environ["TAU_BENCH_HISTORY_COMPACTION"] = mode
+    if token_budget is not None:
+        os.environ["TAU_BENCH_HISTORY_TOKEN_BUDGET"] = str(token_budget)
+
+
+def set_compactor(compactor: Optional[Any]) -> None:
+    """Installs a custom compactor: any object with a `compact(messages,
+    model)` method that returns the messages to send."""
+    global _compactor
+    with _compactor_lock:
+        _compactor = compactor
+
+
+def get_compactor() -> Optional[Any]:
+    """Returns the process-wide compactor, or None when compaction is off."""
+    global _compactor
+    mode = os.environ.get("TAU_BENCH_HISTORY_COMPACTION", "off")
+    with _compactor_lock:
+        if _compactor is not None and not isinstance(_compactor, HistoryCompactor):
+            return _compactor
+        if mode == "off":
+            return None
+        budget = os.environ.get("TAU_BENCH_HISTORY_TOKEN_BUDGET")
+        token_budget = int(budget) if budget else None
+        if _compactor is None or _compactor.mode != mode or _compactor.token_budget != token_budget:
+            _compactor = HistoryCompactor(mode, token_budget=token_budget)
+        return _compactor
+
+
+def compact_history(messages: List[Dict[str, Any]], model: Optional[str] = None) -> List[Dict[str, Any]]:
+    compactor = get_compactor()
+    if compactor is None:
+        return messages
+    return compactor.compact(messages, model)
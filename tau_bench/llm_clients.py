@@ -0,0 +1,192 @@
+import asyncio
+import inspect
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+TRAPI_SCOPES = ["api://trapi/.default"]
+TRAPI_INSTANCE = "redmond/interactive/openai"  # 'gcr/shared/openai' # See https://aka.ms/trapi/models for the instance name
+DEFAULT_API_VERSION = "2025-03-01-preview"
+
+# Tokens are refreshed this many seconds before they expire.
+TOKEN_REFRESH_MARGIN = 300
+# Connections kept open per host in the shared pool.
+POOL_MAXSIZE = 64
+
+
+def trapi_endpoint(deployment_name: str, instance: str = TRAPI_INSTANCE) -> str:
+    return f"https://trapi.research.microsoft.com/{instance}/deployments/{deployment_name}"
+
+
+class CachedTokenCredential(object):
+    """Wraps a credential so each scope's token is fetched once and reused
+    until shortly before it expires, across every client that shares it."""
+
+    def __init__(self, credential: Any) -> None:
+        self.credential = credential
+        self._tokens: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def peek(self, *scopes: str) -> Optional[Any]:
+        token = self._tokens.get(scopes)
+        if token is not None and token.expires_on - TOKEN_REFRESH_MARGIN > time.time():
+            return token
+        return None
+
+    def get_token(self, *scopes: str, **kwargs: Any) -> Any:
+        token = self.peek(*scopes)
+        if token is not None and len(kwargs) == 0:
+            return token
+        with self._lock:
+            token = self.peek(*scopes)
+            if token is None or len(kwargs) > 0:
+                token = self.credential.get_token(*scopes, **kwargs)
+                self._tokens[scopes] = token
+            return token
+
+
+class AsyncCachedTokenCredential(object):
+    """Async view of a CachedTokenCredential for the aio clients."""
+
+    def __init__(self, cached: CachedTokenCredential) -> None:
+        self.cached = cached
+
+    async def get_token(self, *scopes: str, **kwargs: Any) -> Any:
+        token = self.cached.peek(*scopes)
+        if token is not None and len(kwargs) == 0:
+            return token
+        return await asyncio.to_thread(self.cached.get_token, *scopes, **kwargs)
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "AsyncCachedTokenCredential":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        pass
+
+
+_lock = threading.Lock()
+_credential: Optional[CachedTokenCredential] = None
+_session: Any = None
+_clients: Dict[Tuple[str, str], Any] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+_allowed_kwargs: Dict[type, FrozenSet[str]] = {}
+
+
+def get_credential() -> CachedTokenCredential:
+    """Returns the process-wide TRAPI credential."""
+    global _credential
+    with _lock:
+        if _credential is None:
+            from azure.identity import AzureCliCredential, ChainedTokenCredential, DefaultAzureCredential
+
+            _credential = CachedTokenCredential(
+                ChainedTokenCredential(
+                    AzureCliCredential(),
+                    DefaultAzureCredential(
+                        exclude_cli_credential=True,
+                        # Exclude other credentials we are not interested in.
+                        exclude_environment_credential=True,
+                        exclude_shared_token_cache_credential=True,
+                        exclude_developer_cli_credential=True,
+                        exclude_powershell_credential=True,
+                        exclude_interactive_browser_credential=True,
+                        exclude_visual_studio_code_credentials=True,
+                        # DEFAULT_IDENTITY_CLIENT_ID is a variable exposed in
+                        # Azure ML Compute jobs that has the client id of the
+                        # user-assigned managed identity in it.
+                        # See https://learn.microsoft.com/en-us/azure/machine-learning/how-to-identity-based-service-authentication#compute-cluster
+                        # In case it is not set the ManagedIdentityCredential will
+                        # default to using the system-assigned managed identity, if any.
+                        managed_identity_client_id=os.environ.get("DEFAULT_IDENTITY_CLIENT_ID"),
+                    ),
+                )
+            )
+        return _credential
+
+
+def _shared_transport() -> Any:
+    # One requests session for every sync client, so connections to the TRAPI
+    # host are pooled across deployments instead of per client.
+    global _session
+    import requests
+    from azure.core.pipeline.transport import RequestsTransport
+
+    if _session is None:
+        _session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE)
+        _session.mount("https://", adapter)
+    return RequestsTransport(session=_session, session_owner=False)
+
+
+def get_client(endpoint: str, api_version: str = DEFAULT_API_VERSION) -> Any:
+    """Returns the shared ChatCompletionsClient for an endpoint and API version.
+
+    The deployment is part of the endpoint, so this is keyed by
+    (endpoint, deployment, api_version).
+    """
+    key = (endpoint, api_version)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    credential = get_credential()
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            from azure.ai.inference import ChatCompletionsClient
+
+            client = ChatCompletionsClient(
+                endpoint=endpoint,
+                credential=credential,
+                credential_scopes=TRAPI_SCOPES,
+                api_version=api_version,
+                transport=_shared_transport(),
+            )
+            _clients[key] = client
+        return client
+
+
+def get_trapi_client(deployment_name: str, api_version: str = DEFAULT_API_VERSION, instance: str = TRAPI_INSTANCE) -> Any:
+    return get_client(trapi_endpoint(deployment_name, instance), api_version)
+
+
+def get_async_client(endpoint: str, api_version: str = DEFAULT_API_VERSION) -> Any:
+    """Returns the aio ChatCompletionsClient for the running event loop.
+
+    aio clients hold an aiohttp session bound to the loop that created it, so
+    they are shared per loop. They still share the process-wide token cache.
+    """
+    from azure.ai.inference.aio import ChatCompletionsClient as AsyncChatCompletionsClient
+
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    key = (endpoint, api_version)
+    if key not in clients:
+        clients[key] = AsyncChatCompletionsClient(
+            endpoint=endpoint,
+            credential=AsyncCachedTokenCredential(get_credential()),
+            credential_scopes=TRAPI_SCOPES,
+            api_version=api_version,
+        )
+    return clients[key]
+
+
+def allowed_kwargs(client: Any) -> FrozenSet[str]:
+    """Parameter names `client.complete` accepts, computed once per client type."""
+    client_type = type(client)
+    allowed = _allowed_kwargs.get(client_type)
+    if allowed is None:
+        allowed = frozenset(inspect.signature(client.complete).parameters)
+        _allowed_kwargs[client_type] = allowed
+    return allowed
+
+
+def filter_kwargs(client: Any, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    allowed = allowed_kwargs(client)
+    return {k: v for k, v in kwargs.items() if k in allowed}
@@ -7,7 +7,8 @@ from tau_bench.model_utils.model.chat import ChatModel, Message
 from tau_bench.model_utils.model.completion import approx_cost_for_datapoint, approx_prompt_str
 from tau_bench.model_utils.model.general_model import wrap_temperature
 from tau_bench.model_utils.model.utils import approx_num_tokens
-from azure.ai.inference import ChatCompletionsClient
+from tau_bench.llm_clients import get_client, get_credential
+from tau_bench.rate_limit import RateLimitedClient
 from azure.identity import DefaultAzureCredential, ChainedTokenCredential, AzureCliCredential, get_bearer_token_provider
 
 DEFAULT_OPENAI_MODEL = "gpt-4o-2024-08-06"
@@ -84,25 +85,7 @@ class OpenAIModel(ChatModel):
         #    if api_key is None:
         #        raise ValueError(f"{API_KEY_ENV_VAR} environment variable is not set")
         #self.client = OpenAI(api_key=api_key)
-        credential = ChainedTokenCredential(
-    AzureCliCredential(),
-    DefaultAzureCredential(
-        exclude_cli_credential=True,
-        # Exclude other credentials we are not interested in.
-        exclude_environment_credential=True,
-        exclude_shared_token_cache_credential=True,
-        exclude_developer_cli_credential=True,
-        exclude_powershell_credential=True,
-        exclude_interactive_browser_credential=True,
-        exclude_visual_studio_code_credentials=True,
-        # DEFAULT_IDENTITY_CLIENT_ID is a variable exposed in
-        # Azure ML Compute jobs that has the client id of the
-        # user-assigned managed identity in it.
-        # See https://learn.microsoft.com/en-us/azure/machine-learning/how-to-identity-based-service-authentication#compute-cluster
-        # In case it is not set the ManagedIdentityCredential will
-        # default to using the system-assigned managed identity, if any.
-        managed_identity_client_id=os.environ.get("DEFAULT_IDENTITY_CLIENT_ID"),
-    ))
+        credential = get_credential()
         api_version = '2024-10-21'  # Ensure this is a valid API version see: https://learn.microsoft.com/en-us/azure/ai-services/openai/api-version-deprecation#latest-ga-api-release
     # Note: Check out the other model deployments here - https://dev.azure.com/msresearch/TRAPI/_wiki/wikis/TRAPI.wiki/15124/Deployment-Model-Information
         api_version = '2025-03-01-preview'  # Ensure this is a valid API version see: https://learn.microsoft.com/en-us/azure/ai-services/openai/api-version-deprecation#latest-ga-api-release
@@ -123,12 +106,7 @@ class OpenAIModel(ChatModel):
         endpoint = f'https://trapi.research.microsoft.com/{instance}/deployments/'+deployment_name
         scopes = ["api://trapi/.default"]
 
-        self.client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=credential,
-    credential_scopes=scopes,
-    api_version=api_version
-        )
+        self.client = RateLimitedClient(get_client(endpoint, api_version), endpoint)
 
     def generate_message(
         self,
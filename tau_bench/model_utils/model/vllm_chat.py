@@ -1,8 +1,16 @@
+from typing import Any
+
 from tau_bench.model_utils.api.datapoint import Datapoint
 from tau_bench.model_utils.model.chat import ChatModel, Message
 from tau_bench.model_utils.model.completion import approx_cost_for_datapoint, approx_prompt_str
 from tau_bench.model_utils.model.general_model import wrap_temperature
 from tau_bench.model_utils.model.utils import approx_num_tokens
+from tau_bench.model_utils.model.vllm_utils import (
+    DEFAULT_BATCH_WINDOW_MS,
+    DEFAULT_MAX_BATCH_SIZE,
+    send_each,
+    shared_batcher,
+)
 
 PRICE_PER_INPUT_TOKEN_MAP = {
     "Qwen/Qwen2-0.5B-Instruct": 0.0,
@@ -58,6 +66,8 @@ class VLLMChatModel(ChatModel):
         capability: float | None = None,
         latency_ms_per_output_token: float | None = None,
         max_context_length: int | None = None,
+        batch_window_ms: float = DEFAULT_BATCH_WINDOW_MS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
     ) -> None:
         from openai import AsyncOpenAI, OpenAI
 
@@ -91,6 +101,22 @@ class VLLMChatModel(ChatModel):
             if max_context_length is not None
             else MAX_CONTEXT_LENGTH_MAP.get(model, MAX_CONTEXT_LENGTH_FALLBACK)
         )
+        # Chat completions take one conversation per request, so a batch is
+        # sent as a burst of concurrent requests that the server schedules
+        # together.
+        self.batcher = shared_batcher(
+            (base_url, model), self._send_batch, window_ms=batch_window_ms, max_batch_size=max_batch_size
+        )
+
+    def _send_batch(self, temperature: float, batch: list[list[dict[str, str]]]) -> list[Any]:
+        return send_each(
+            lambda msgs: self.client.chat.completions.create(
+                model=self.model,
+                messages=msgs,
+                temperature=wrap_temperature(temperature=temperature),
+            ),
+            batch,
+        )
 
     def get_approx_cost(self, dp: Datapoint) -> float:
         cost_per_token = self.price_per_input_token
@@ -116,11 +142,7 @@ class VLLMChatModel(ChatModel):
         if temperature is None:
             temperature = self.temperature
         msgs = self.build_generate_message_state(messages)
-        res = self.client.chat.completions.create(
-            model=self.model,
-            messages=msgs,
-            temperature=wrap_temperature(temperature=temperature),
-        )
+        res = self.batcher.submit(temperature, msgs)
         return self.handle_generate_message_response(
             prompt=msgs, content=res.choices[0].message.content, force_json=force_json
         )
@@ -10,7 +10,15 @@ from tau_bench.model_utils.model.completion import (
     approx_prompt_str,
 )
 from tau_bench.model_utils.model.utils import approx_num_tokens
-from tau_bench.model_utils.model.vllm_utils import generate_request
+from tau_bench.model_utils.model.vllm_utils import (
+    DEFAULT_BATCH_WINDOW_MS,
+    DEFAULT_MAX_BATCH_SIZE,
+    completions_request,
+    generate_request,
+    send_batched,
+    send_each,
+    shared_batcher,
+)
 
 PRICE_PER_INPUT_TOKEN_MAP = {
     "Qwen/Qwen2-0.5B-Instruct": 0.0,
@@ -66,6 +74,8 @@ class VLLMCompletionModel(CompletionModel):
         capability: float | None = None,
         latency_ms_per_output_token: float | None = None,
         max_context_length: int | None = None,
+        batch_window_ms: float = DEFAULT_BATCH_WINDOW_MS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
     ) -> None:
         self.model = model
         self.base_url = base_url
@@ -91,18 +101,40 @@ class VLLMCompletionModel(CompletionModel):
             if max_context_length is not None
             else MAX_CONTEXT_LENGTH_MAP.get(model, MAX_CONTEXT_LENGTH_FALLBACK)
         )
+        self.batcher = shared_batcher(
+            (self.url, model), self._send_batch, window_ms=batch_window_ms, max_batch_size=max_batch_size
+        )
+
+    def _send_batch(self, key: tuple[float, bool], prompts: list[str]) -> list[Any]:
+        temperature, force_json = key
+        if self.url.rstrip("/").endswith("completions"):
+            # The OpenAI-compatible endpoint takes a list of prompts.
+            return send_batched(
+                lambda batch: completions_request(
+                    url=self.url,
+                    model=self.model,
+                    prompts=batch,
+                    temperature=temperature,
+                    force_json=force_json,
+                ),
+                prompts,
+            )
+        return send_each(
+            lambda prompt: generate_request(
+                url=self.url, prompt=prompt, force_json=force_json, temperature=temperature
+            ),
+            prompts,
+        )
 
     def generate_from_prompt(self, prompt: str, temperature: float = 0.0) -> str:
-        return generate_request(url=self.url, prompt=prompt, temperature=temperature)
+        return self.batcher.submit((temperature, False), prompt)
 
     def parse_force_from_prompt(
         self, prompt: str, typ: BaseModel | dict[str, Any], temperature: float | None = None
     ) -> dict[str, Any]:
         if temperature is None:
             temperature = self.temperature
-        res = generate_request(
-            url=self.url, prompt=prompt, force_json=True, temperature=temperature
-        )
+        res = self.batcher.submit((temperature, True), prompt)
         return self.handle_parse_force_response(prompt=prompt, content=res)
 
     def get_approx_cost(self, dp: Datapoint) -> float:
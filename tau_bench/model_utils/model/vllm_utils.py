@@ -1,9 +1,17 @@
-from typing import Any
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable
 
 import requests
 
 from tau_bench.model_utils.model.general_model import wrap_temperature
 
+# Requests from concurrent conversations are held this long to form a batch.
+DEFAULT_BATCH_WINDOW_MS = float(os.environ.get("TAU_BENCH_VLLM_BATCH_WINDOW_MS", "10"))
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("TAU_BENCH_VLLM_MAX_BATCH_SIZE", "32"))
+
 
 def generate_request(
     url: str,
@@ -34,3 +42,188 @@ def generate_request(
     text = json_res["text"][0]
     assert isinstance(text, str)
     return text.removeprefix(prompt)
+
+
+def completions_request(
+    url: str,
+    model: str,
+    prompts: list[str],
+    temperature: float = 0.0,
+    force_json: bool = False,
+    **req_body_kwargs: Any,
+) -> list[str]:
+    """Sends several prompts in one request to an OpenAI-compatible
+    `/v1/completions` endpoint and returns the texts in prompt order.
+
+    A prompt that got an empty completion has a ValueError in place of its
+    text, so that it does not fail the other prompts; a request that fails
+    as a whole raises.
+    """
+    args = {
+        "model": model,
+        "prompt": prompts,
+        "temperature": wrap_temperature(temperature),
+        "max_tokens": 4096,
+        **req_body_kwargs,
+    }
+    if force_json:
+        args["stop"] = ["```"]
+    res = requests.post(url, json=args)
+    res.raise_for_status()
+    json_res = res.json()
+    choices = json_res.get("choices")
+    if choices is None or len(choices) != len(prompts):
+        raise ValueError(f"Unexpected response: {json_res}")
+    texts: list[Any] = [""] * len(prompts)
+    for choice in choices:
+        texts[choice["index"]] = choice["text"]
+    return [ValueError(f"Empty response: {json_res}") if len(text) == 0 else text for text in texts]
+
+
+class MicroBatcher(object):
+    """Gathers requests from concurrent callers into batches.
+
+    A batch is sent once `max_batch_size` requests with the same group key
+    are waiting, or `window_ms` after the first of them arrived.
+    `send_batch(key, items)` returns one result per item, in order; a result
+    that is an exception is raised in its caller. A window of 0 disables
+    batching and calls `send_batch` with a single item directly.
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[Hashable, list[Any]], list[Any]],
+        window_ms: float = DEFAULT_BATCH_WINDOW_MS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ) -> None:
+        self.send_batch = send_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.num_batches = 0
+        self.num_requests = 0
+        self._pending: dict[Hashable, list[tuple[Any, Future]]] = {}
+        self._first_arrival: dict[Hashable, float] = {}
+        self._cond = threading.Condition()
+        self._executor: ThreadPoolExecutor | None = None
+        self._worker: threading.Thread | None = None
+
+    def submit(self, key: Hashable, item: Any) -> Any:
+        if self.window <= 0 or self.max_batch_size <= 1:
+            return self._unwrap(self.send_batch(key, [item])[0])
+        future: Future = Future()
+        with self._cond:
+            if self._worker is None:
+                self._executor = ThreadPoolExecutor(thread_name_prefix="vllm-batch")
+                self._worker = threading.Thread(target=self._collect, name="vllm-batcher", daemon=True)
+                self._worker.start()
+            if key not in self._pending:
+                self._pending[key] = []
+                self._first_arrival[key] = time.monotonic()
+            self._pending[key].append((item, future))
+            self._cond.notify()
+        return self._unwrap(future.result())
+
+    @staticmethod
+    def _unwrap(result: Any) -> Any:
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def _collect(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    ready = [
+                        key
+                        for key, items in self._pending.items()
+                        if len(items) >= self.max_batch_size or now - self._first_arrival[key] >= self.window
+                    ]
+                    if len(ready) > 0:
+                        break
+                    if len(self._pending) == 0:
+                        self._cond.wait()
+                    else:
+                        deadline = min(self._first_arrival.values()) + self.window
+                        self._cond.wait(timeout=max(0.0, deadline - now))
+                batches = []
+                for key in ready:
+                    items = self._pending[key]
+                    batches.append((key, items[: self.max_batch_size]))
+                    if len(items) > self.max_batch_size:
+                        self._pending[key] = items[self.max_batch_size :]
+                        self._first_arrival[key] = now
+                    else:
+                        del self._pending[key]
+                        del self._first_arrival[key]
+                self.num_batches += len(batches)
+                self.num_requests += sum(len(items) for _, items in batches)
+            # Sending happens off the collecting thread, so the next batch
+            # can form while this one is in flight.
+            for key, items in batches:
+                self._executor.submit(self._send, key, items)
+
+    def _send(self, key: Hashable, items: list[tuple[Any, Future]]) -> None:
+        try:
+            results = self.send_batch(key, [item for item, _ in items])
+        except Exception as e:
+            results = [e] * len(items)
+        for (_, future), result in zip(items, results):
+            future.set_result(result)
+
+    def mean_batch_size(self) -> float:
+        with self._cond:
+            return self.num_requests / self.num_batches if self.num_batches > 0 else 0.0
+
+
+_batchers: dict[Hashable, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def shared_batcher(
+    name: Hashable,
+    send_batch: Callable[[Hashable, list[Any]], list[Any]],
+    window_ms: float = DEFAULT_BATCH_WINDOW_MS,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+) -> MicroBatcher:
+    """Returns the process-wide batcher for a server and model, so that the
+    model objects of different conversations share batches.
+
+    Model objects with different batch settings get different batchers. The
+    batcher keeps the `send_batch` of the first model object that asked for
+    it, so `send_batch` must depend on nothing but `name`.
+    """
+    key = (name, window_ms, max_batch_size)
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = MicroBatcher(send_batch, window_ms=window_ms, max_batch_size=max_batch_size)
+        return _batchers[key]
+
+
+def send_batched(send: Callable[[list[Any]], list[Any]], items: list[Any]) -> list[Any]:
+    """Sends the requests of a batch in one call to `send`. When that call
+    fails as a whole, e.g. because one prompt is too long for the server,
+    each request is sent again on its own, so only the bad one fails.
+    Failures are returned in place of results."""
+    try:
+        return send(items)
+    except Exception as e:
+        if len(items) == 1:
+            return [e]
+    return send_each(lambda item: MicroBatcher._unwrap(send([item])[0]), items)
+
+
+def send_each(fn: Callable[[Any], Any], items: list[Any]) -> list[Any]:
+    """Sends the requests of a batch concurrently, for endpoints that take one
+    request at a time. Failures are returned in place of results."""
+
+    def call(item: Any) -> Any:
+        try:
+            return fn(item)
+        except Exception as e:
+            return e
+
+    if len(items) == 1:
+        return [call(items[0])]
+    with ThreadPoolExecutor(max_workers=len(items)) as executor:
+        return list(executor.map(call, items))
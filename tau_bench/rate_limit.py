@@ -0,0 +1,357 @@
+import asyncio
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import tabulate
+
+# HTTP statuses worth retrying: throttling, timeouts and transient server errors.
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# Exception type names, across requests, httpx, azure-core, openai and
+# litellm, that mean the request never got a usable answer.
+RETRYABLE_ERROR_NAMES = (
+    "Timeout",
+    "ConnectionError",
+    "APIConnectionError",
+    "ServiceRequestError",
+    "ServiceResponseError",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "RateLimitError",
+)
+
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_MAX_IN_FLIGHT = 64
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+# The in-flight limit is halved at most once per this many seconds, so a
+# burst of 429s from requests sent together counts as one signal.
+DECREASE_INTERVAL = 2.0
+# Seconds of allowance a bucket can hold, as a fraction of a minute.
+BURST_SECONDS = 10.0
+
+
+class TokenBucket(object):
+    """Refills at `per_minute` units per minute and holds up to
+    BURST_SECONDS of them. The level may go negative: a request larger than
+    the bucket still goes through once it is full, and later ones wait for
+    the debt to be repaid."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        self._refill(now)
+        needed = min(cost, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, cost: float) -> None:
+        self.level -= cost
+
+    def adjust(self, delta: float) -> None:
+        self.level -= delta
+
+
+class RateLimiter(object):
+    """Admission control for one deployment.
+
+    Limits requests and tokens per minute with token buckets, and the number
+    of requests in flight with an AIMD window: each success grows the window
+    by 1/window, each throttling response halves it. A Retry-After from the
+    provider pauses every caller of the deployment, not just the one that
+    got it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        min_in_flight: int = 1,
+    ) -> None:
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min_in_flight
+        self.window = float(max_in_flight)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0}
+        self._cond = threading.Condition()
+
+    def _try_acquire(self, cost: float) -> Optional[float]:
+        # Returns 0 once a slot is taken, the seconds to wait for a bucket or
+        # a pause, or None when waiting for an in-flight request to finish.
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.window):
+            return None
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(cost, now))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(cost)
+        self.in_flight += 1
+        self.stats["requests"] += 1
+        return 0.0
+
+    def acquire(self, cost: float) -> None:
+        with self._cond:
+            while True:
+                wait = self._try_acquire(cost)
+                if wait == 0:
+                    return
+                self._cond.wait(timeout=wait if wait is not None else 1.0)
+
+    async def acquire_async(self, cost: float) -> None:
+        while True:
+            with self._cond:
+                wait = self._try_acquire(cost)
+            if wait == 0:
+                return
+            await asyncio.sleep(min(wait, 1.0) if wait is not None else 0.05)
+
+    def release(self, cost: float, used_tokens: Optional[float], throttled: bool, retry_after: Optional[float]) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if used_tokens is not None and self.tokens is not None:
+                self.tokens.adjust(used_tokens - cost)
+            if throttled:
+                self.stats["throttled"] += 1
+                if now - self.last_decrease >= DECREASE_INTERVAL:
+                    self.window = max(float(self.min_in_flight), self.window / 2)
+                    self.last_decrease = now
+                if retry_after is not None:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            else:
+                self.window = min(float(self.max_in_flight), self.window + 1.0 / self.window)
+            self._cond.notify_all()
+
+    def count(self, stat: str) -> None:
+        with self._cond:
+            self.stats[stat] += 1
+
+
+def _status(e: BaseException) -> Optional[int]:
+    for value in (
+        getattr(e, "status_code", None),
+        getattr(e, "status", None),
+        getattr(getattr(e, "response", None), "status_code", None),
+    ):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_throttled(e: BaseException) -> bool:
+    return _status(e) == 429 or "RateLimit" in type(e).__name__
+
+
+def is_retryable(e: BaseException) -> bool:
+    status = _status(e)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    return any(name in type(e).__name__ for name in RETRYABLE_ERROR_NAMES)
+
+
+def retry_after(e: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait, from Retry-After(-ms) headers."""
+    headers = getattr(getattr(e, "response", None), "headers", None) or getattr(e, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return float(value) / 1000.0
+        value = headers.get("retry-after")
+    except AttributeError:
+        return None
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int, hint: Optional[float]) -> float:
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if hint is not None:
+        delay += hint
+    return delay
+
+
+def estimate_tokens(kwargs: Dict[str, Any]) -> float:
+    """Rough token count of a request, about four characters per token."""
+    size = len(json.dumps(kwargs.get("messages"), default=str))
+    if kwargs.get("tools") is not None:
+        size += len(json.dumps(kwargs["tools"], default=str))
+    return size / 4 + (kwargs.get("max_tokens") or 0)
+
+
+def used_tokens(res: Any) -> Optional[float]:
+    usage = getattr(res, "usage", None)
+    if usage is None and isinstance(res, dict):
+        usage = res.get("usage")
+    if isinstance(usage, dict):
+        return usage.get("total_tokens")
+    return getattr(usage, "total_tokens", None)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def configure(
+    rpm: Optional[int] = None,
+    tpm: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    max_retries: Optional[int] = None,
+) -> None:
+    """Sets the per-deployment limits for this process and its children."""
+    for name, value in (
+        ("TAU_BENCH_LLM_RPM", rpm),
+        ("TAU_BENCH_LLM_TPM", tpm),
+        ("TAU_BENCH_LLM_MAX_IN_FLIGHT", max_in_flight),
+        ("TAU_BENCH_LLM_MAX_RETRIES", max_retries),
+    ):
+        if value is not None:
+            os.environ[name] = str(value)
+
+
+def _env_number(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """Returns the process-wide limiter of a deployment.
+
+    TAU_BENCH_LLM_RPM and TAU_BENCH_LLM_TPM give the request and token limits
+    of each deployment, TAU_BENCH_LLM_MAX_IN_FLIGHT the largest in-flight
+    window.
+    """
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        return limiter
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(
+                name,
+                rpm=_env_number("TAU_BENCH_LLM_RPM"),
+                tpm=_env_number("TAU_BENCH_LLM_TPM"),
+                max_in_flight=int(_env_number("TAU_BENCH_LLM_MAX_IN_FLIGHT") or DEFAULT_MAX_IN_FLIGHT),
+            )
+        return _limiters[name]
+
+
+def _max_retries() -> int:
+    value = os.environ.get("TAU_BENCH_LLM_MAX_RETRIES")
+    return int(value) if value else DEFAULT_MAX_RETRIES
+
+
+def call(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Calls `fn(*args, **kwargs)`, an LLM request to deployment `name`,
+    under its rate limiter, retrying transient failures with jittered
+    exponential backoff. Chat completions have no side effects, so a retry
+    is always safe. Other errors are raised at once."""
+    limiter = get_rate_limiter(name)
+    cost = estimate_tokens(kwargs)
+    max_retries = _max_retries()
+    attempt = 0
+    while True:
+        limiter.acquire(cost)
+        try:
+            res = fn(*args, **kwargs)
+        except Exception as e:
+            hint = retry_after(e)
+            limiter.release(cost, None, is_throttled(e), hint)
+            if not is_retryable(e) or attempt >= max_retries:
+                limiter.count("failed")
+                raise
+            limiter.count("retries")
+            time.sleep(backoff(attempt, hint))
+            attempt += 1
+            continue
+        limiter.release(cost, used_tokens(res), False, None)
+        return res
+
+
+async def acall(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Async counterpart of `call`, for coroutine functions."""
+    limiter = get_rate_limiter(name)
+    cost = estimate_tokens(kwargs)
+    max_retries = _max_retries()
+    attempt = 0
+    while True:
+        await limiter.acquire_async(cost)
+        try:
+            res = await fn(*args, **kwargs)
+        except Exception as e:
+            hint = retry_after(e)
+            limiter.release(cost, None, is_throttled(e), hint)
+            if not is_retryable(e) or attempt >= max_retries:
+                limiter.count("failed")
+                raise
+            limiter.count("retries")
+            await asyncio.sleep(backoff(attempt, hint))
+            attempt += 1
+            continue
+        limiter.release(cost, used_tokens(res), False, None)
+        return res
+
+
+class RateLimitedClient(object):
+    """Wraps a ChatCompletionsClient so `complete` goes through `call`."""
+
+    def __init__(self, client: Any, name: str) -> None:
+        self.client = client
+        self.name = name
+
+    def complete(self, *args: Any, **kwargs: Any) -> Any:
+        return call(self.name, self.client.complete, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+
+def print_rate_limit_stats() -> None:
+    rows = []
+    for name, limiter in sorted(_limiters.items()):
+        with limiter._cond:
+            s = dict(limiter.stats)
+            window = limiter.window
+        rows.append((name, s["requests"], s["retries"], s["throttled"], s["failed"], f"{window:.1f}"))
+    if len(rows) == 0:
+        return
+    print(tabulate.tabulate(rows, headers=["Deployment", "Requests", "Retries", "Throttled", "Failed", "In-flight window"]))
@@ -0,0 +1,303 @@
+import ast
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from tau_bench.completion_cache import CachedObject
+
+REPLAY_PROVIDER = "replay"
+DEFAULT_REPLAY_FILES = "final_results/*.json:historical_trajectories/*.json"
+USER_GREETING = "Hi! How can I help you today?"
+FALLBACK_AGENT_REPLY = "I'm sorry, I can't help with that."
+FALLBACK_USER_REPLY = "###STOP###"
+
+Key = Tuple[Any, ...]
+
+
+def _parse_tool_calls(value: Any) -> List[Dict[str, Any]]:
+    # Some result files store tool calls as the repr of a Python list.
+    if isinstance(value, str):
+        if value in ("", "None"):
+            return []
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            value = ast.literal_eval(value)
+    return list(value or [])
+
+
+def _parse_arguments(arguments: Any) -> Dict[str, Any]:
+    if isinstance(arguments, dict):
+        return arguments
+    try:
+        return json.loads(arguments)
+    except (TypeError, json.JSONDecodeError):
+        return ast.literal_eval(arguments)
+
+
+def _content(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    return "" if content is None or content == "None" else str(content)
+
+
+def _turn(message: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """What a message contributes to the agent-side prefix key.
+
+    Tool outputs are left out, so a recorded conversation replays the same
+    way even if the tools now answer slightly differently.
+    """
+    role = message.get("role")
+    if role == "system":
+        return None
+    if role == "assistant":
+        tool_calls = _parse_tool_calls(message.get("tool_calls"))
+        if len(tool_calls) > 0:
+            function = tool_calls[0]["function"]
+            arguments = _parse_arguments(function["arguments"])
+            return ("call", function["name"], json.dumps(arguments, sort_keys=True))
+        return ("say", _content(message))
+    if role == "tool":
+        return ("tool",)
+    return (role, _content(message))
+
+
+def _dialog(messages: List[Dict[str, Any]]) -> Tuple[Tuple[str, str], ...]:
+    """The conversation as the user sees it: text turns of both sides."""
+    dialog = []
+    for message in messages:
+        turn = _turn(message)
+        if turn is None:
+            continue
+        if turn[0] == "user":
+            dialog.append(("user", turn[1]))
+        elif turn[0] == "say":
+            dialog.append(("agent", turn[1]))
+    return tuple(dialog)
+
+
+class ReplayIndex(object):
+    """Next-message lookup over recorded trajectories.
+
+    Agent requests are matched on the full prefix of the conversation so
+    far. User simulator requests are matched on the task instruction found in
+    the system prompt together with the text dialog so far.
+    """
+
+    def __init__(self, paths: List[str]) -> None:
+        self.agent_turns: Dict[Key, Dict[str, Any]] = {}
+        self.user_turns: Dict[Key, str] = {}
+        self.instructions: List[str] = []
+        self._instruction_by_prompt: Dict[str, Optional[str]] = {}
+        self.num_trajectories = 0
+        for path in paths:
+            with open(path, "r") as f:
+                try:
+                    results = json.load(f)
+                except json.JSONDecodeError:
+                    continue
+            if not isinstance(results, list):
+                continue
+            for result in results:
+                if isinstance(result, dict) and isinstance(result.get("traj"), list):
+                    self.add(result)
+        self.instructions.sort(key=len, reverse=True)
+
+    def add(self, result: Dict[str, Any]) -> None:
+        traj = result["traj"]
+        task = (result.get("info") or {}).get("task") or {}
+        instruction = task.get("instruction") if isinstance(task, dict) else None
+        prefix: List[Tuple[Any, ...]] = []
+        try:
+            for message in traj:
+                turn = _turn(message)
+                if turn is None:
+                    continue
+                if message.get("role") == "assistant":
+                    self.agent_turns.setdefault(tuple(prefix), message)
+                prefix.append(turn)
+            if instruction is not None:
+                dialog = _dialog(traj)
+                for i, (side, text) in enumerate(dialog):
+                    if side == "user":
+                        self.user_turns.setdefault((instruction, dialog[:i]), text)
+                if instruction not in self.instructions:
+                    self.instructions.append(instruction)
+        except (KeyError, TypeError, ValueError, SyntaxError):
+            # Malformed trajectories are skipped as a whole.
+            return
+        self.num_trajectories += 1
+
+    def instruction_in(self, system_prompt: str) -> Optional[str]:
+        if system_prompt not in self._instruction_by_prompt:
+            self._instruction_by_prompt[system_prompt] = next(
+                (instruction for instruction in self.instructions if instruction in system_prompt), None
+            )
+        return self._instruction_by_prompt[system_prompt]
+
+    def next_agent_message(self, messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        prefix = tuple(turn for turn in (_turn(message) for message in messages) if turn is not None)
+        return self.agent_turns.get(prefix)
+
+    def next_user_message(self, messages: List[Dict[str, Any]]) -> Optional[str]:
+        system_prompt = _content(messages[0]) if messages and messages[0].get("role") == "system" else ""
+        instruction = self.instruction_in(system_prompt)
+        if instruction is None:
+            return None
+        # The simulator sees the conversation with the roles swapped and
+        # starts from a fixed greeting.
+        dialog = []
+        for message in messages[2:]:
+            if message.get("role") == "assistant":
+                dialog.append(("user", _content(message)))
+            elif message.get("role") == "user":
+                dialog.append(("agent", _content(message)))
+        return self.user_turns.get((instruction, tuple(dialog)))
+
+
+def _is_user_simulator_request(messages: List[Dict[str, Any]]) -> bool:
+    return (
+        len(messages) >= 2
+        and messages[0].get("role") == "system"
+        and messages[1].get("role") == "user"
+        and messages[1].get("content") == USER_GREETING
+    )
+
+
+class ReplayProvider(object):
+    """Serves chat completions from recorded trajectories instead of a model.
+
+    Responses carry a synthetic token count and are delayed by a fixed
+    latency, so harness throughput can be measured without a live model.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        latency: float = 0.0,
+        tokens_per_response: Optional[int] = None,
+    ) -> None:
+        self.index = ReplayIndex(paths)
+        self.latency = latency
+        self.tokens_per_response = tokens_per_response
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._next_call_id = 0
+
+    def _tool_call_id(self) -> str:
+        with self._lock:
+            self._next_call_id += 1
+            return f"call_replay_{self._next_call_id}"
+
+    def respond(self, messages: List[Dict[str, Any]]) -> CachedObject:
+        from tau_bench.trapi_infer import model_dump
+
+        messages = [model_dump(message) for message in messages]
+        if _is_user_simulator_request(messages):
+            text = self.index.next_user_message(messages)
+            found = text is not None
+            message = {"role": "assistant", "content": text if found else FALLBACK_USER_REPLY, "tool_calls": None}
+        else:
+            recorded = self.index.next_agent_message(messages)
+            found = recorded is not None
+            message = self._agent_message(recorded) if found else {
+                "role": "assistant",
+                "content": FALLBACK_AGENT_REPLY,
+                "tool_calls": None,
+            }
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return self._response(message, messages)
+
+    def _agent_message(self, recorded: Dict[str, Any]) -> Dict[str, Any]:
+        tool_calls = _parse_tool_calls(recorded.get("tool_calls"))
+        if len(tool_calls) == 0:
+            return {"role": "assistant", "content": _content(recorded), "tool_calls": None}
+        function = tool_calls[0]["function"]
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": tool_calls[0].get("id") or self._tool_call_id(),
+                    "type": "function",
+                    "function": {
+                        "name": function["name"],
+                        "arguments": json.dumps(_parse_arguments(function["arguments"])),
+                    },
+                }
+            ],
+        }
+
+    def _response(self, message: Dict[str, Any], messages: List[Dict[str, Any]]) -> CachedObject:
+        if self.tokens_per_response is not None:
+            completion_tokens = self.tokens_per_response
+        else:
+            completion_tokens = max(1, len(json.dumps(message)) // 4)
+        prompt_tokens = sum(len(_content(m)) for m in messages) // 4
+        return CachedObject(
+            {
+                "model": REPLAY_PROVIDER,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": "tool_calls" if message["tool_calls"] else "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+    def completion(self, messages: List[Dict[str, Any]]) -> CachedObject:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return self.respond(messages)
+
+    async def acompletion(self, messages: List[Dict[str, Any]]) -> CachedObject:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return self.respond(messages)
+
+
+_provider: Optional[ReplayProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_replay_provider() -> ReplayProvider:
+    """Returns the process-wide replay provider, built from the environment.
+
+    TAU_BENCH_REPLAY_FILES lists result-file globs separated by ":",
+    TAU_BENCH_REPLAY_LATENCY_MS adds a delay to each response and
+    TAU_BENCH_REPLAY_TOKENS fixes the token count reported per response.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            patterns = os.environ.get("TAU_BENCH_REPLAY_FILES", DEFAULT_REPLAY_FILES)
+            paths = sorted({path for pattern in patterns.split(":") if pattern for path in glob.glob(pattern)})
+            tokens = os.environ.get("TAU_BENCH_REPLAY_TOKENS")
+            _provider = ReplayProvider(
+                paths,
+                latency=float(os.environ.get("TAU_BENCH_REPLAY_LATENCY_MS", "0")) / 1000.0,
+                tokens_per_response=int(tokens) if tokens else None,
+            )
+            print(f"Replay provider: {_provider.index.num_trajectories} trajectories from {len(paths)} files")
+        return _provider
+
+
+def print_replay_stats() -> None:
+    if _provider is None:
+        return
+    print(f"Replay provider: {_provider.hits} recorded responses served, {_provider.misses} fallbacks")
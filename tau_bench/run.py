@@ -2,16 +2,27 @@
 
 import os
 import json
+import asyncio
+import importlib
 import random
+import threading
 import traceback
 from math import comb
-import multiprocessing
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Type
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 
 from tau_bench.envs import get_env
-from tau_bench.agents.base import Agent
+from tau_bench.envs import observation
+from tau_bench.envs.base import Env
+from tau_bench.envs import mcp_session
+from tau_bench.envs.mcp_session import print_tool_call_stats
+from tau_bench.globals import print_prompt_cache_usage
+from tau_bench import completion_cache, history, rate_limit, tracing
+from tau_bench.replay_provider import REPLAY_PROVIDER, print_replay_stats
+from tau_bench.agents.base import Agent, AsyncAgent
+from tau_bench.checkpoint import CheckpointWriter, config_path, is_successful, jsonl_path, load_completed, results_path
+from tau_bench.shard import shard_local_path
 from tau_bench.types import EnvRunResult, RunConfig
 from litellm import provider_list
 from tau_bench.envs.user import UserStrategy
@@ -33,12 +44,24 @@ def make_serializable(obj):
 
 def run(config: RunConfig) -> List[EnvRunResult]:
     assert config.env in ["retail", "airline"], "Only retail and airline envs are supported"
-    assert config.model_provider in provider_list, "Invalid model provider"
-    assert config.user_model_provider in provider_list, "Invalid user model provider"
+    assert config.model_provider in provider_list + [REPLAY_PROVIDER], "Invalid model provider"
+    assert config.user_model_provider in provider_list + [REPLAY_PROVIDER], "Invalid user model provider"
     assert config.agent_strategy in ["tool-calling", "act", "react", "few-shot", "one-shot", "assertions-agent", "orchestrator", "tool-calling-with-preconditions", "tool-calling-with-preconditions-and-python", "tool-calling-with-subtasks-check", "tool-calling-with-subtasks-feedback", "tool-calling-with-dynamic-subtasks", "tool-calling-with-reference", 'tool-calling-with-dynamic-subtasks-with-feedback'], "Invalid agent strategy"
     assert config.task_split in ["train", "test", "dev"], "Invalid task split"
     assert config.user_strategy in [item.value for item in UserStrategy], "Invalid user strategy"
 
+    assert 0 <= config.shard_index < config.num_shards, "Invalid shard"
+    if config.resume and config.ckpt_path == "":
+        raise ValueError("--resume needs the --ckpt-path of the run to resume")
+
+    completion_cache.configure(config.completion_cache, config.completion_cache_path)
+    rate_limit.configure(config.llm_rpm, config.llm_tpm, config.llm_max_in_flight, config.llm_max_retries)
+    history.configure(config.history_compaction, config.history_token_budget)
+    observation.configure(config.observation_encoding)
+    mcp_session.configure(config.mcp_transport)
+    if config.trace_path is not None:
+        tracing.tracer.start_recording()
+
     random.seed(config.seed)
     time_str = datetime.now().strftime("%m%d%H%M%S")
     if config.ckpt_path == "":  
@@ -48,8 +71,15 @@ def run(config: RunConfig) -> List[EnvRunResult]:
         ckpt_path = f"{config.log_dir}/{config.agent_strategy}-{agent_model_name}-{config.temperature}_range_{config.start_index}-{config.end_index}_user-{user_model_name}-{config.user_strategy}_{time_str}.json"
     else:
         ckpt_path = config.ckpt_path
+    # Shards never share a checkpoint, even when given the same --ckpt-path.
+    ckpt_path = shard_local_path(ckpt_path, config.shard_index, config.num_shards)
     if not os.path.exists(config.log_dir):
         os.makedirs(config.log_dir)
+    if os.path.dirname(ckpt_path) and not os.path.exists(os.path.dirname(ckpt_path)):
+        os.makedirs(os.path.dirname(ckpt_path))
+    # Lets the shard merge check that all shards ran the same sweep.
+    with open(config_path(ckpt_path), "w") as f:
+        json.dump(config.model_dump(), f, indent=2)
 
     print(f"Loading user with strategy: {config.user_strategy}")
     env = get_env(
@@ -60,291 +90,307 @@ def run(config: RunConfig) -> List[EnvRunResult]:
         task_split=config.task_split,
         mcp_server=config.mcp_server
     )
-    agent = agent_factory(
-        tools_info=env.tools_info,
-        wiki=env.wiki,
-        config=config,
-    )
     end_index = (
         len(env.tasks) if config.end_index == -1 else min(config.end_index, len(env.tasks))
     )
+    tools_info = env.tools_info
+    wiki = env.wiki
+    env.close()
     results: List[EnvRunResult] = []
-    lock = multiprocessing.Lock()
+    lock = threading.Lock()
+    cancelled = threading.Event()
+    active_envs: Dict[int, Any] = {}
+    # Results are appended to a JSONL checkpoint as tasks finish; the JSON
+    # array at ckpt_path is only written once the run completes.
+    checkpoint = CheckpointWriter(jsonl_path(ckpt_path))
     if config.task_ids and len(config.task_ids) > 0:
-        print(f"Running tasks {config.task_ids} (checkpoint path: {ckpt_path})")
+        print(f"Running tasks {config.task_ids} (checkpoint path: {checkpoint.path})")
     else:
         print(
-            f"Running tasks {config.start_index} to {end_index} (checkpoint path: {ckpt_path})"
+            f"Running tasks {config.start_index} to {end_index} (checkpoint path: {checkpoint.path})"
     )
-    for i in range(config.num_trials):
-        if config.task_ids and len(config.task_ids) > 0:
-            idxs = config.task_ids
-        else:
-            idxs = list(range(config.start_index, end_index))
-        if config.shuffle:
-            random.shuffle(idxs)
-
-        def _run(idx: int) -> EnvRunResult:
-            isolated_env = get_env(
-                config.env,
-                user_strategy=config.user_strategy,
-                user_model=config.user_model,
-                task_split=config.task_split,
-                user_provider=config.user_model_provider,
-                task_index=idx,
-                mcp_server=config.mcp_server,
-            )
-
-            print(f"Running task {idx}")
-            # res = agent.solve(
-            #     env=isolated_env,
-            #     task_index=idx,
-            # )
-            # result = EnvRunResult(
-            #     task_id=idx,
-            #     reward=res.reward,
-            #     info=res.info,
-            #     traj=res.messages,
-            #     trial=i,
-            #     records=res.records,
-            # )
-            try:
-                # print(agent)
-                # print(config.new_func)
-                if config.new_func is not None:
-                    res = agent.solve(
-                        env=isolated_env,
-                        new_func_name=config.new_func,
-                        task_index=idx,
-                    )
-                else:
-                    res = agent.solve(
-                        env=isolated_env,
-                        task_index=idx,
-                    )
-                result = EnvRunResult(
-                    task_id=idx,
-                    reward=res.reward,
-                    info=res.info,
-                    traj=res.messages,
-                    trial=i,
-                    records=res.records,
-                )
-            except Exception as e:
-                result = EnvRunResult(
-                    task_id=idx,
-                    reward=0.0,
-                    info={"error": str(e), "traceback": traceback.format_exc()},
-                    traj=[],
-                    trial=i,
-                    records={},
-                )
-            print(
-                "✅" if result.reward == 1 else "❌",
-                f"task_id={idx}",
-                result.info,
-            )
-            print("-----")
-            # print(result.records)
-            with lock:
-                data = []
-                if os.path.exists(ckpt_path) and os.path.getsize(ckpt_path) > 0:
-                    with open(ckpt_path, "r") as f:
-                        try:
-                            data = json.load(f)
-                        except json.JSONDecodeError:
-                            print(f"Warning: Failed to decode JSON from {ckpt_path}. Starting fresh.")
-                            data = []
-                with open(ckpt_path, "w") as f:
-                    temp = make_serializable(result.model_dump())
-                    json.dump(data + [temp], f, indent=2)
-                return result
-
-        # with ThreadPoolExecutor(max_workers=config.max_concurrency) as executor:
-        #     res = list(executor.map(_run, idxs))
-        #     results.extend(res)
-        for i in idxs:
-            result = _run(i)
-            results.append(result)
-
-    display_metrics(results)
 
-    with open(ckpt_path, "w") as f:
-        json.dump([make_serializable(result.model_dump()) for result in results], f, indent=2)
-        print(f"\n📄 Results saved to {ckpt_path}\n")
-    return results
-
-
-def agent_factory(
-    tools_info: List[Dict[str, Any]], wiki, config: RunConfig
-) -> Agent:
-    if config.agent_strategy == "tool-calling":
-        # native tool calling
-        from tau_bench.agents.tool_calling_agent import ToolCallingAgent
-
-        return ToolCallingAgent(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
+    def _make_env(idx: int):
+        # Every task gets its own Env, and with it its own state session on
+        # the MCP server, and its own agent, since some agents keep per-task
+        # state on the instance.
+        return get_env(
+            config.env,
+            user_strategy=config.user_strategy,
+            user_model=config.user_model,
+            task_split=config.task_split,
+            user_provider=config.user_model_provider,
+            task_index=idx,
+            mcp_server=config.mcp_server,
         )
-    elif config.agent_strategy == "tool-calling-with-preconditions":
-        # tool calling with preconditions
-        from tau_bench.agents.tool_calling_with_preconditions import ToolCallingAgentWithPreconditions
 
-        return ToolCallingAgentWithPreconditions(
+    def _make_agent() -> Agent:
+        return agent_factory(
             tools_info=tools_info,
             wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
+            config=config,
         )
-    elif config.agent_strategy == "tool-calling-with-reference":
-        # tool calling with reference
-        from tau_bench.agents.tool_calling_with_reference import ToolCallingAgentWithReference
 
-        return ToolCallingAgentWithReference(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
+    def _solve_kwargs(isolated_env, idx: int) -> Dict[str, Any]:
+        kwargs = {"env": isolated_env, "task_index": idx}
+        if config.new_func is not None:
+            kwargs["new_func_name"] = config.new_func
+        return kwargs
+
+    def _error_result(trial: int, idx: int, e: Exception) -> EnvRunResult:
+        return EnvRunResult(
+            task_id=idx,
+            reward=0.0,
+            info={"error": str(e), "traceback": traceback.format_exc()},
+            traj=[],
+            trial=trial,
+            records={},
         )
-    elif config.agent_strategy == "tool-calling-with-subtasks-check":
-        # tool calling with preconditions
-        from tau_bench.agents.tool_calling_with_subtasks_check import ToolCallingWithSubtasksCheckAgent
 
-        return ToolCallingWithSubtasksCheckAgent(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
-        )
-    elif config.agent_strategy == "tool-calling-with-subtasks-feedback":
-        # tool calling with preconditions
-        from tau_bench.agents.tool_calling_with_subtasks_feedback import ToolCallingWithSubtasksFeedbackAgent
-
-        return ToolCallingWithSubtasksFeedbackAgent(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
-        )
-    elif config.agent_strategy == "tool-calling-with-dynamic-subtasks":
-        # tool calling with preconditions
-        from tau_bench.agents.tool_calling_with_dynamic_subtasks import ToolCallingWithDynamicSubtasks
-
-        return ToolCallingWithDynamicSubtasks(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
-        )
-    elif config.agent_strategy == "tool-calling-with-dynamic-subtasks-with-feedback":
-        # tool calling with preconditions
-        from tau_bench.agents.tool_calling_with_dynamic_subtasks_with_feedback import ToolCallingWithDynamicSubtasksWithFeedback
-
-        return ToolCallingWithDynamicSubtasksWithFeedback(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
+    def _record(trial: int, idx: int, res, env: Optional[Env] = None) -> Optional[EnvRunResult]:
+        if cancelled.is_set():
+            # Conversations cut short by a cancel are not real results.
+            return None
+        if isinstance(res, EnvRunResult):
+            result = res
+        else:
+            result = EnvRunResult(
+                task_id=idx,
+                reward=res.reward,
+                info=res.info,
+                traj=res.messages,
+                trial=trial,
+                records=res.records,
+            )
+        print(
+            "✅" if result.reward == 1 else "❌",
+            f"task_id={idx}",
+            result.info,
         )
-    elif config.agent_strategy == "tool-calling-with-preconditions-and-python":
-        # tool calling with preconditions
-        from tau_bench.agents.tool_calling_with_preconditions_and_python import ToolCallingAgentWithPreconditionsAndPython
-
-        return ToolCallingAgentWithPreconditionsAndPython(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
+        task_span = tracing.current_span()
+        if task_span is not None and isinstance(result.info, dict):
+            # Seconds spent per span category, to tell a slow model from a
+            # slow tool or scoring when reading the results.
+            timings = tracing.tracer.task_timings(trial, idx)
+            timings[tracing.TASK] = task_span.duration
+            result.info = {**result.info, "timings": timings}
+            compactor = history.get_compactor()
+            if isinstance(compactor, history.HistoryCompactor):
+                result.info["history_tokens_saved"] = compactor.saved_tokens(trial, idx)
+        if env is not None and isinstance(result.info, dict) and env.observation_encoder.mode != "raw":
+            result.info["observation_bytes"] = dict(env.observation_bytes)
+            if len(env.raw_observations) > 0:
+                # What projection hid from the agent, by action index.
+                result.info["raw_observations"] = dict(env.raw_observations)
+        print("-----")
+        checkpoint.write(make_serializable(result.model_dump()))
+        return result
+
+    def _run(trial: int, idx: int) -> Optional[EnvRunResult]:
+        if cancelled.is_set():
+            return None
+        # Trials sample the same prompts again, so they are cached apart.
+        token = completion_cache.set_namespace(f"trial-{trial}")
+        try:
+            with tracing.span("task", tracing.TASK, trial=trial, task_id=idx):
+                return _run_task(trial, idx)
+        finally:
+            completion_cache.reset_namespace(token)
+
+    def _run_task(trial: int, idx: int) -> Optional[EnvRunResult]:
+        isolated_env = _make_env(idx)
+        agent = _make_agent()
+        job_id = id(isolated_env)
+        with lock:
+            active_envs[job_id] = isolated_env
+
+        print(f"Running task {idx}")
+        try:
+            res = agent.solve(**_solve_kwargs(isolated_env, idx))
+        except Exception as e:
+            res = _error_result(trial, idx, e)
+        finally:
+            with lock:
+                active_envs.pop(job_id, None)
+            isolated_env.close()
+        return _record(trial, idx, res, isolated_env)
+
+    async def _run_async(semaphore: asyncio.Semaphore, trial: int, idx: int) -> Optional[EnvRunResult]:
+        # Each coroutine runs in its own context, so the namespace does not
+        # leak between conversations.
+        completion_cache.set_namespace(f"trial-{trial}")
+        async with semaphore:
+            with tracing.span("task", tracing.TASK, trial=trial, task_id=idx):
+                # Building an Env talks to the MCP server and may already query
+                # the user model, so it happens off the event loop.
+                isolated_env = await asyncio.to_thread(_make_env, idx)
+                agent = _make_agent()
+                print(f"Running task {idx}")
+                try:
+                    res = await agent.solve_async(**_solve_kwargs(isolated_env, idx))
+                except Exception as e:
+                    res = _error_result(trial, idx, e)
+                finally:
+                    await asyncio.to_thread(isolated_env.close)
+                return _record(trial, idx, res, isolated_env)
+
+    async def _run_all_async(pending: List[Tuple[int, int]]) -> List[Optional[EnvRunResult]]:
+        # Blocking work (Env setup, scoring, non-async user simulators) shares
+        # a pool sized like the run, so it does not throttle the conversations.
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=max(1, config.max_concurrency))
         )
-    elif config.agent_strategy == "one-shot":
-        # native tool calling
-        from tau_bench.agents.one_shot_agent import OneShotAgent
+        semaphore = asyncio.Semaphore(max(1, config.max_concurrency))
+        return await asyncio.gather(*(_run_async(semaphore, *job) for job in pending))
+
+    def _run_threaded(pending: List[Tuple[int, int]]) -> List[EnvRunResult]:
+        # Conversations spend almost all of their time waiting on the LLM, so
+        # threads are enough to overlap them. Results are collected in job order
+        # regardless of the order in which tasks finish.
+        executor = ThreadPoolExecutor(max_workers=max(1, config.max_concurrency))
+        futures = {job: executor.submit(_run, *job) for job in pending}
+        run_results: List[EnvRunResult] = []
+        try:
+            for job in jobs:
+                result = completed[job] if job in completed else futures[job].result()
+                if result is not None:
+                    run_results.append(result)
+        except KeyboardInterrupt:
+            print("Cancelling: waiting for in-flight tasks to stop...")
+            cancelled.set()
+            with lock:
+                for active_env in active_envs.values():
+                    active_env.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            checkpoint.close()
+        return run_results
+
+    jobs: List[Tuple[int, int]] = []
+    for trial in range(config.num_trials):
+        if config.task_ids and len(config.task_ids) > 0:
+            idxs = list(config.task_ids)
+        else:
+            idxs = list(range(config.start_index, end_index))
+        if config.shuffle:
+            random.shuffle(idxs)
+        jobs.extend((trial, idx) for idx in idxs)
+    if config.num_shards > 1:
+        jobs = [job for job in jobs if shard_of(job, config.num_shards) == config.shard_index]
+        print(f"Shard {config.shard_index}/{config.num_shards}: {len(jobs)} tasks")
+
+    completed: Dict[Tuple[int, int], EnvRunResult] = {}
+    if config.resume:
+        completed = load_completed(ckpt_path, only_successful=config.resume_only_successful)
+        completed = {job: completed[job] for job in jobs if job in completed}
+        print(f"Resuming: {len(completed)} of {len(jobs)} tasks already finished")
+
+    pending = [job for job in jobs if job not in completed]
+    if issubclass(agent_class(config), AsyncAgent):
+        # Async agents run as coroutines on one event loop, with at most
+        # max_concurrency conversations in flight. Ctrl-C cancels them all.
+        try:
+            new_results = dict(zip(pending, asyncio.run(_run_all_async(pending))))
+        finally:
+            checkpoint.close()
+        for job in jobs:
+            result = completed[job] if job in completed else new_results[job]
+            if result is not None:
+                results.append(result)
+    else:
+        results = _run_threaded(pending)
 
-        return OneShotAgent(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
-        )
-    elif config.agent_strategy == "assertions-agent":
-        # native tool calling
-        from tau_bench.agents.assertions_agent import AssertionsAgent
+    display_metrics(results)
+    print_tool_call_stats()
+    completion_cache.print_completion_cache_stats()
+    rate_limit.print_rate_limit_stats()
+    print_prompt_cache_usage()
+    tracing.print_trace_summary()
+    compactor = history.get_compactor()
+    if isinstance(compactor, history.HistoryCompactor):
+        print(f"History compaction ({compactor.mode}) saved about {compactor.total_saved_tokens()} prompt tokens")
+    if config.observation_encoding != "raw":
+        raw = sum(r.info.get("observation_bytes", {}).get("raw", 0) for r in results if isinstance(r.info, dict))
+        encoded = sum(r.info.get("observation_bytes", {}).get("encoded", 0) for r in results if isinstance(r.info, dict))
+        print(f"Observation encoding ({config.observation_encoding}): {raw} bytes of tool output sent as {encoded}")
+    if config.trace_path is not None:
+        tracing.tracer.export_chrome_trace(config.trace_path)
+        print(f"Trace written to {config.trace_path}")
+    print_replay_stats()
+
+    with open(results_path(ckpt_path), "w") as f:
+        json.dump([make_serializable(result.model_dump()) for result in results], f, indent=2)
+        print(f"\n📄 Results saved to {results_path(ckpt_path)}\n")
+    return results
 
-        return AssertionsAgent(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
-        )
-    elif config.agent_strategy == "orchestrator":
-        # native tool calling
-        from tau_bench.agents.orchestrator import Orchestrator
 
-        return Orchestrator(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            temperature=config.temperature,
-        )
-    elif config.agent_strategy == "act":
-        # `act` from https://arxiv.org/abs/2210.03629
-        from tau_bench.agents.chat_react_agent import ChatReActAgent
+def shard_of(job: Tuple[int, int], num_shards: int) -> int:
+    """Assigns a (trial, task_id) pair to a shard.
+
+    Depends only on the pair itself, so every shard agrees on the split no
+    matter how the task list was ordered or shuffled.
+    """
+    trial, task_id = job
+    return (trial * 7919 + task_id) % num_shards
+
+
+# Maps each agent strategy to the module and class that implements it. The
+# modules are imported lazily, so a run only loads the agent it uses.
+AGENT_CLASSES: Dict[str, Tuple[str, str]] = {
+    # native tool calling
+    "tool-calling": ("tau_bench.agents.tool_calling_agent", "ToolCallingAgent"),
+    "tool-calling-with-preconditions": ("tau_bench.agents.tool_calling_with_preconditions", "ToolCallingAgentWithPreconditions"),
+    "tool-calling-with-reference": ("tau_bench.agents.tool_calling_with_reference", "ToolCallingAgentWithReference"),
+    "tool-calling-with-subtasks-check": ("tau_bench.agents.tool_calling_with_subtasks_check", "ToolCallingWithSubtasksCheckAgent"),
+    "tool-calling-with-subtasks-feedback": ("tau_bench.agents.tool_calling_with_subtasks_feedback", "ToolCallingWithSubtasksFeedbackAgent"),
+    "tool-calling-with-dynamic-subtasks": ("tau_bench.agents.tool_calling_with_dynamic_subtasks", "ToolCallingWithDynamicSubtasks"),
+    "tool-calling-with-dynamic-subtasks-with-feedback": ("tau_bench.agents.tool_calling_with_dynamic_subtasks_with_feedback", "ToolCallingWithDynamicSubtasksWithFeedback"),
+    "tool-calling-with-preconditions-and-python": ("tau_bench.agents.tool_calling_with_preconditions_and_python", "ToolCallingAgentWithPreconditionsAndPython"),
+    "one-shot": ("tau_bench.agents.one_shot_agent", "OneShotAgent"),
+    "assertions-agent": ("tau_bench.agents.assertions_agent", "AssertionsAgent"),
+    "orchestrator": ("tau_bench.agents.orchestrator", "Orchestrator"),
+    # `act` and `react` from https://arxiv.org/abs/2210.03629
+    "act": ("tau_bench.agents.chat_react_agent", "ChatReActAgent"),
+    "react": ("tau_bench.agents.chat_react_agent", "ChatReActAgent"),
+    "few-shot": ("tau_bench.agents.few_shot_agent", "FewShotToolCallingAgent"),
+}
+
+
+def agent_class(config: RunConfig) -> Type[Agent]:
+    """Returns the agent class for config.agent_strategy without building an agent."""
+    if config.agent_strategy not in AGENT_CLASSES:
+        raise ValueError(f"Unknown agent strategy: {config.agent_strategy}")
+    module_name, class_name = AGENT_CLASSES[config.agent_strategy]
+    return getattr(importlib.import_module(module_name), class_name)
 
-        return ChatReActAgent(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            use_reasoning=False,
-            temperature=config.temperature,
-        )
-    elif config.agent_strategy == "react":
-        # `react` from https://arxiv.org/abs/2210.03629
-        from tau_bench.agents.chat_react_agent import ChatReActAgent
 
-        return ChatReActAgent(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            use_reasoning=True,
-            temperature=config.temperature,
-        )
+def agent_factory(
+    tools_info: List[Dict[str, Any]], wiki, config: RunConfig
+) -> Agent:
+    cls = agent_class(config)
+    kwargs: Dict[str, Any] = {}
+    if config.agent_strategy in ("act", "react"):
+        kwargs["use_reasoning"] = config.agent_strategy == "react"
     elif config.agent_strategy == "few-shot":
-        from tau_bench.agents.few_shot_agent import FewShotToolCallingAgent
         assert config.few_shot_displays_path is not None, "Few shot displays path is required for few-shot agent strategy"
         with open(config.few_shot_displays_path, "r") as f:
-            few_shot_displays = [json.loads(line)["messages_display"] for line in f]
-
-        return FewShotToolCallingAgent(
-            tools_info=tools_info,
-            wiki=wiki,
-            model=config.model,
-            provider=config.model_provider,
-            few_shot_displays=few_shot_displays,
-            temperature=config.temperature,
-        )
-    else:
-        raise ValueError(f"Unknown agent strategy: {config.agent_strategy}")
+            kwargs["few_shot_displays"] = [json.loads(line)["messages_display"] for line in f]
+    return cls(
+        tools_info=tools_info,
+        wiki=wiki,
+        model=config.model,
+        provider=config.model_provider,
+        temperature=config.temperature,
+        **kwargs,
+    )
 
 
 def display_metrics(results: List[EnvRunResult]) -> None:
-    def is_successful(reward: float) -> bool:
-        return (1 - 1e-6) <= reward <= (1 + 1e-6)
-
+    if len(results) == 0:
+        # E.g. a shard that got no tasks, or a resume with nothing left to run.
+        print("🏆 No results")
+        return
     num_trials = len(set([r.trial for r in results]))
     rewards = [r.reward for r in results]
     avg_reward = sum(rewards) / len(rewards)
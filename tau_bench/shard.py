@@ -0,0 +1,209 @@
+# Copyright Sierra
+
+import argparse
+import json
+import multiprocessing
+import os
+import runpy
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from tau_bench.checkpoint import config_path, jsonl_path, load_results
+from tau_bench.types import EnvRunResult
+
+# Fields that are expected to differ between the shards of one sweep.
+SHARD_LOCAL_FIELDS = {
+    "shard_index",
+    "num_shards",
+    "ckpt_path",
+    "log_dir",
+    "max_concurrency",
+    "resume",
+    "resume_only_successful",
+    "llm_rpm",
+    "llm_tpm",
+    "llm_max_in_flight",
+    "llm_max_retries",
+    "trace_path",
+    "mcp_transport",
+    "completion_cache_path",
+}
+
+
+def shard_suffix(shard_index: int, num_shards: int) -> str:
+    return f"shard-{shard_index}-of-{num_shards}"
+
+
+def shard_ckpt_path(output_dir: str, shard_index: int, num_shards: int) -> str:
+    return os.path.join(output_dir, f"{shard_suffix(shard_index, num_shards)}.json")
+
+
+def shard_local_path(ckpt_path: str, shard_index: int, num_shards: int) -> str:
+    """Gives each shard of a sweep its own checkpoint for a `--ckpt-path`
+    they share, unless the path already names the shard."""
+    if num_shards <= 1:
+        return ckpt_path
+    stem, ext = os.path.splitext(ckpt_path)
+    suffix = shard_suffix(shard_index, num_shards)
+    if stem.endswith(suffix):
+        return ckpt_path
+    return f"{stem}_{suffix}{ext or '.json'}"
+
+
+def load_shard_config(ckpt_path: str) -> Optional[Dict[str, Any]]:
+    path = config_path(ckpt_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        config = json.load(f)
+    return {key: value for key, value in config.items() if key not in SHARD_LOCAL_FIELDS}
+
+
+def check_configs(ckpt_paths: List[str]) -> Optional[Dict[str, Any]]:
+    """Raises if the shards were not run with the same configuration."""
+    reference: Optional[Tuple[str, Dict[str, Any]]] = None
+    for path in ckpt_paths:
+        config = load_shard_config(path)
+        if config is None:
+            print(f"Warning: No config found for {path}; skipping the consistency check for it")
+            continue
+        if reference is None:
+            reference = (path, config)
+            continue
+        differing = sorted(
+            key for key in set(config) | set(reference[1]) if config.get(key) != reference[1].get(key)
+        )
+        if len(differing) > 0:
+            raise ValueError(f"{path} and {reference[0]} were run with different settings: {', '.join(differing)}")
+    return None if reference is None else reference[1]
+
+
+def merge_results(ckpt_paths: List[str]) -> List[EnvRunResult]:
+    """Unions shard results, keeping one result per (task_id, trial)."""
+    merged: Dict[Tuple[int, int], EnvRunResult] = {}
+    duplicates = 0
+    for path in ckpt_paths:
+        results_path = jsonl_path(path) if os.path.exists(jsonl_path(path)) else path
+        for result in load_results(results_path):
+            key = (result.task_id, result.trial)
+            if key in merged:
+                duplicates += 1
+            # A later result for the same pair comes from a rerun or a resume.
+            merged[key] = result
+    if duplicates > 0:
+        print(f"Warning: {duplicates} duplicate (task_id, trial) results were dropped")
+    return [merged[key] for key in sorted(merged, key=lambda key: (key[1], key[0]))]
+
+
+def merge(ckpt_paths: List[str], output_path: str) -> List[EnvRunResult]:
+    from tau_bench.run import display_metrics, make_serializable
+
+    check_configs(ckpt_paths)
+    results = merge_results(ckpt_paths)
+    if len(results) == 0:
+        raise ValueError("No results found in the given checkpoints")
+    display_metrics(results)
+    with open(output_path, "w") as f:
+        json.dump([make_serializable(result.model_dump()) for result in results], f, indent=2)
+    print(f"\n📄 Merged {len(results)} results from {len(ckpt_paths)} shards into {output_path}\n")
+    return results
+
+
+def shared_env(run_args: List[str]) -> Optional[str]:
+    """The environment whose dataset the shards of a sweep can share, which
+    they can when they run their MCP servers in process."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--env", type=str, default="retail")
+    parser.add_argument("--mcp-transport", type=str, default=os.environ.get("TAU_BENCH_MCP_TRANSPORT", "stdio"))
+    args, _ = parser.parse_known_args(run_args)
+    if args.mcp_transport != "inprocess" or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return args.env
+
+
+def _run_forked(run_script: str, argv: List[str], log_path: str) -> None:
+    with open(log_path, "w") as log:
+        os.dup2(log.fileno(), sys.stdout.fileno())
+        os.dup2(log.fileno(), sys.stderr.fileno())
+    sys.argv = [run_script, *argv]
+    runpy.run_path(run_script, run_name="__main__")
+
+
+def launch(num_shards: int, output_dir: str, run_args: List[str], run_script: str = "run.py") -> List[str]:
+    """Runs every shard of a sweep as a separate local process.
+
+    With the "inprocess" MCP transport, the shards are forked from this
+    process after it has loaded the dataset, so they share it instead of
+    each loading their own; otherwise each shard is a new interpreter.
+    Returns the checkpoint paths of the shards, for `merge`.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    ckpt_paths = [shard_ckpt_path(output_dir, i, num_shards) for i in range(num_shards)]
+    env_name = shared_env(run_args)
+    if env_name is not None:
+        from tau_bench.envs import get_data_loader
+        from tau_bench.envs.state_store import share_snapshots
+
+        share_snapshots([get_data_loader(env_name)])
+        context = multiprocessing.get_context("fork")
+    procs = []
+    for i, ckpt_path in enumerate(ckpt_paths):
+        argv = [*run_args, "--shard", f"{i}/{num_shards}", "--ckpt-path", ckpt_path]
+        log_path = os.path.splitext(ckpt_path)[0] + ".log"
+        if env_name is not None:
+            proc = context.Process(target=_run_forked, args=(run_script, argv, log_path))
+            proc.start()
+        else:
+            with open(log_path, "w") as log:
+                proc = subprocess.Popen([sys.executable, run_script, *argv], stdout=log, stderr=subprocess.STDOUT)
+        procs.append(proc)
+        print(f"Started shard {i}/{num_shards} (log: {log_path})")
+    failed = []
+    try:
+        for i, proc in enumerate(procs):
+            if isinstance(proc, subprocess.Popen):
+                returncode = proc.wait()
+            else:
+                proc.join()
+                returncode = proc.exitcode
+            if returncode != 0:
+                failed.append(i)
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+        raise
+    if len(failed) > 0:
+        raise RuntimeError(
+            f"Shards {failed} failed; rerun them with --resume and the same --ckpt-path, then merge"
+        )
+    return ckpt_paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a tau-bench sweep in shards and merge the results")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    launch_parser = subparsers.add_parser(
+        "launch", help="Start N local run.py processes, one per shard, then merge their results"
+    )
+    launch_parser.add_argument("--num-shards", type=int, required=True)
+    launch_parser.add_argument("--output-dir", type=str, required=True)
+    launch_parser.add_argument("--run-script", type=str, default="run.py")
+    launch_parser.add_argument("run_args", nargs=argparse.REMAINDER, help="Arguments for run.py, after --")
+
+    merge_parser = subparsers.add_parser("merge", help="Merge the checkpoints of the shards of one sweep")
+    merge_parser.add_argument("ckpt_paths", nargs="+")
+    merge_parser.add_argument("--output", type=str, required=True)
+
+    args = parser.parse_args()
+    if args.command == "launch":
+        run_args = args.run_args[1:] if args.run_args[:1] == ["--"] else args.run_args
+        ckpt_paths = launch(args.num_shards, args.output_dir, run_args, run_script=args.run_script)
+        merge(ckpt_paths, os.path.join(args.output_dir, "merged.json"))
+    else:
+        merge(args.ckpt_paths, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import tabulate
+
+# Span categories, from the outside in. A task contains steps; a step
+# contains the LLM calls, tool calls, user simulator turns and the reward
+# computation made for it.
+TASK = "task"
+STEP = "step"
+LLM = "llm"
+TOOL = "tool"
+USER = "user"
+REWARD = "reward"
+CATEGORIES = [TASK, STEP, LLM, TOOL, USER, REWARD]
+
+# Attributes that are summed per category in the run summary.
+TOKEN_ATTRS = ("prompt_tokens", "completion_tokens")
+BYTE_ATTRS = ("request_bytes", "response_bytes")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("tau_bench_span", default=None)
+
+
+class Span(object):
+    __slots__ = ("name", "category", "start", "end", "attrs", "task", "lane")
+
+    def __init__(self, name: str, category: str, parent: Optional["Span"], attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.category = category
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+        if parent is not None:
+            self.task = parent.task
+            self.lane = parent.lane
+        else:
+            self.task = self if category == TASK else None
+            self.lane = threading.get_ident()
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class Tracer(object):
+    """Collects spans from every thread and event loop of a run.
+
+    Totals per category and per task are always kept. Individual spans are
+    only kept once `start_recording` was called, for `export_chrome_trace`.
+    """
+
+    def __init__(self) -> None:
+        self.epoch = time.perf_counter()
+        self.events: Optional[List[Dict[str, Any]]] = None
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self.tasks: Dict[Tuple[Any, Any], Dict[str, float]] = {}
+        self._lanes: Dict[int, str] = {}
+        self._next_lane = 0
+        self._lock = threading.Lock()
+
+    def start_recording(self) -> None:
+        with self._lock:
+            if self.events is None:
+                self.events = []
+
+    def new_lane(self, label: str) -> int:
+        with self._lock:
+            self._next_lane += 1
+            self._lanes[self._next_lane] = label
+            return self._next_lane
+
+    def finish(self, span: Span) -> None:
+        duration = span.duration
+        with self._lock:
+            totals = self.totals.setdefault(span.category, {"count": 0, "seconds": 0.0, "max": 0.0})
+            totals["count"] += 1
+            totals["seconds"] += duration
+            totals["max"] = max(totals["max"], duration)
+            for attr in TOKEN_ATTRS + BYTE_ATTRS:
+                value = span.attrs.get(attr)
+                if isinstance(value, (int, float)):
+                    totals[attr] = totals.get(attr, 0) + value
+            if span.task is not None:
+                key = (span.task.attrs.get("trial"), span.task.attrs.get("task_id"))
+                per_task = self.tasks.setdefault(key, {})
+                per_task[span.category] = per_task.get(span.category, 0.0) + duration
+            if self.events is not None:
+                self.events.append(
+                    {
+                        "name": span.name,
+                        "cat": span.category,
+                        "ph": "X",
+                        "ts": (span.start - self.epoch) * 1e6,
+                        "dur": duration * 1e6,
+                        "pid": os.getpid(),
+                        "tid": span.lane,
+                        "args": {k: v for k, v in span.attrs.items() if _is_plain(v)},
+                    }
+                )
+
+    def total(self, category: str) -> float:
+        with self._lock:
+            return self.totals.get(category, {}).get("seconds", 0.0)
+
+    def task_timings(self, trial: Any, task_id: Any) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.tasks.get((trial, task_id), {}))
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Writes the recorded spans as Chrome trace-event JSON, one lane
+        per task, for chrome://tracing or Perfetto."""
+        with self._lock:
+            events = list(self.events or [])
+            lanes = dict(self._lanes)
+        pid = os.getpid()
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": lane, "args": {"name": label}}
+            for lane, label in lanes.items()
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+
+
+def _is_plain(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+tracer = Tracer()
+
+
+@contextlib.contextmanager
+def span(name: str, category: Optional[str] = None, **attrs: Any) -> Iterator[Span]:
+    """Times the enclosed block as a child of the current span.
+
+    Works the same in threads and in coroutines, since the current span is
+    a context variable.
+    """
+    current = Span(name, category or name, _current.get(), attrs)
+    if current.category == TASK:
+        current.lane = tracer.new_lane(f"trial {attrs.get('trial')} task {attrs.get('task_id')}")
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        current.end = time.perf_counter()
+        tracer.finish(current)
+
+
+def record(name: str, category: str, seconds: float, **attrs: Any) -> None:
+    """Adds a span that ended now and lasted `seconds`, for code that timed
+    itself."""
+    current = Span(name, category, _current.get(), attrs)
+    current.end = time.perf_counter()
+    current.start = current.end - seconds
+    tracer.finish(current)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def payload_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+
+def print_trace_summary(slowest: int = 5) -> None:
+    with tracer._lock:
+        totals = {category: dict(t) for category, t in tracer.totals.items()}
+        tasks = {key: dict(t) for key, t in tracer.tasks.items()}
+    if len(totals) == 0:
+        return
+    order = CATEGORIES + sorted(set(totals) - set(CATEGORIES))
+    rows = []
+    for category in order:
+        t = totals.get(category)
+        if t is None:
+            continue
+        rows.append(
+            (
+                category,
+                t["count"],
+                f"{t['seconds']:.2f}",
+                f"{1000 * t['seconds'] / t['count']:.0f}",
+                f"{1000 * t['max']:.0f}",
+                int(sum(t.get(attr, 0) for attr in TOKEN_ATTRS)),
+                f"{sum(t.get(attr, 0) for attr in BYTE_ATTRS) / 1024:.0f}",
+            )
+        )
+    print(tabulate.tabulate(rows, headers=["Span", "Count", "Total (s)", "Mean (ms)", "Max (ms)", "Tokens", "Payload (KB)"]))
+    ranked = sorted(tasks.items(), key=lambda item: item[1].get(TASK, 0.0), reverse=True)[:slowest]
+    if len(ranked) > 0:
+        print(
+            tabulate.tabulate(
+                [
+                    (trial, task_id, *(f"{t.get(category, 0.0):.2f}" for category in [TASK, LLM, TOOL, USER, REWARD]))
+                    for (trial, task_id), t in ranked
+                ],
+                headers=["Trial", "Task", "Wall (s)", "LLM (s)", "Tool (s)", "User (s)", "Reward (s)"],
+            )
+        )
@@ -1,37 +1,24 @@
-from azure.ai.inference import ChatCompletionsClient
-from azure.identity import DefaultAzureCredential, ChainedTokenCredential, AzureCliCredential
 import os
 import re
 import inspect
 from pydantic import RootModel
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 import json
 
 import time
 from tau_bench.globals import *
+from tau_bench import tracing
+from tau_bench.history import compact_history
+from tau_bench.completion_cache import get_completion_cache, request_key
+from tau_bench.replay_provider import REPLAY_PROVIDER, get_replay_provider
+from tau_bench.rate_limit import acall as rate_limited_acall, call as rate_limited_call
+from tau_bench.llm_clients import TRAPI_SCOPES, filter_kwargs, get_async_client, get_client, get_credential
 from litellm import completion as llm_completion
+from litellm import acompletion as llm_acompletion
 
-credential = ChainedTokenCredential(
-    AzureCliCredential(),
-    DefaultAzureCredential(
-        exclude_cli_credential=True,
-        # Exclude other credentials we are not interested in.
-        exclude_environment_credential=True,
-        exclude_shared_token_cache_credential=True,
-        exclude_developer_cli_credential=True,
-        exclude_powershell_credential=True,
-        exclude_interactive_browser_credential=True,
-        exclude_visual_studio_code_credentials=True,
-        # DEFAULT_IDENTITY_CLIENT_ID is a variable exposed in
-        # Azure ML Compute jobs that has the client id of the
-        # user-assigned managed identity in it.
-        # See https://learn.microsoft.com/en-us/azure/machine-learning/how-to-identity-based-service-authentication#compute-cluster
-        # In case it is not set the ManagedIdentityCredential will
-        # default to using the system-assigned managed identity, if any.
-        managed_identity_client_id=os.environ.get("DEFAULT_IDENTITY_CLIENT_ID"),
-    )
-)
-scopes = ["api://trapi/.default"]
+# Credentials, connection pools and clients are shared process-wide.
+credential = get_credential()
+scopes = TRAPI_SCOPES
 
 # # Note: Check out the other model deployments here - https://dev.azure.com/msresearch/TRAPI/_wiki/wikis/TRAPI.wiki/15124/Deployment-Model-Information
 # api_version = '2025-03-01-preview'  # Ensure this is a valid API version see: https://learn.microsoft.com/en-us/azure/ai-services/openai/api-version-deprecation#latest-ga-api-release
@@ -56,12 +43,7 @@ deployment_name = "gpt-4o_2024-11-20" #re.sub(r'[^a-zA-Z0-9-_]', '', f'{model_na
 instance = "redmond/interactive/openai" #'gcr/shared/openai' # See https://aka.ms/trapi/models for the instance name
 endpoint = f'https://trapi.research.microsoft.com/{instance}/deployments/'+deployment_name
 
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=credential,
-    credential_scopes=scopes,
-    api_version=api_version
-)
+client = get_client(endpoint, api_version)
 
 completion = client.complete
 # response = client.complete(
@@ -120,12 +102,9 @@ def model_dump(x):
         return x
 
 
-def completion(*args, **kwargs):
-    """
-    Dispatches chat completion calls:
-    - OpenAI-compatible (e.g., vLLM) via LiteLLM when provider/base_url indicate OpenAI API
-    - Azure TRAPI client otherwise (existing path)
-    """
+def _route(kwargs: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+    """Decides between the OpenAI-compatible and the TRAPI path and returns
+    the keyword arguments for the chosen client."""
     provider = kwargs.get("custom_llm_provider")
     base_url = kwargs.pop("base_url", None) or os.environ.get("OPENAI_API_BASE") or os.environ.get("VLLM_BASE_URL")
 
@@ -147,18 +126,113 @@ def completion(*args, **kwargs):
         api_key = kwargs.get("api_key") or os.environ.get("OPENAI_API_KEY")
         if api_key is not None:
             kwargs["api_key"] = api_key
-        start_time = time.time()
-        res = llm_completion(*args, **kwargs)
-        end_time = time.time()
-        llm_time.record_time(end_time - start_time)
-        return res
+        return True, kwargs
 
     # Default Azure TRAPI path (existing behavior)
-    sig = inspect.signature(client.complete)
-    allowed_params = sig.parameters
-    filtered_kwargs = {k: v for k, v in kwargs.items() if k in allowed_params}
-    start_time = time.time()
-    res = client.complete(*args, **filtered_kwargs)
-    end_time = time.time()
-    llm_time.record_time(end_time - start_time)
-    return res
+    return False, filter_kwargs(client, kwargs)
+
+
+def cached_prompt_tokens(usage: Dict[str, Any]) -> int:
+    """Prompt tokens the provider served from its prompt cache."""
+    details = usage.get("prompt_tokens_details") or {}
+    cached = details.get("cached_tokens") if isinstance(details, dict) else None
+    if cached is None:
+        # Anthropic models through LiteLLM report cache reads separately.
+        cached = usage.get("cache_read_input_tokens")
+    return cached or 0
+
+
+def _record_usage(model: Any, res: Any, llm_span: tracing.Span) -> None:
+    dumped = model_dump(res)
+    if not isinstance(dumped, dict):
+        return
+    llm_span.set(response_bytes=tracing.payload_size(dumped.get("choices")))
+    usage = dumped.get("usage")
+    if not isinstance(usage, dict):
+        return
+    cached = cached_prompt_tokens(usage)
+    llm_span.set(
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        cached_tokens=cached,
+    )
+    prompt_cache_usage.record(model, usage.get("prompt_tokens"), cached, llm_span.duration)
+
+
+def _llm_span(kwargs: Dict[str, Any]):
+    return tracing.span(
+        "completion",
+        tracing.LLM,
+        model=kwargs.get("model"),
+        provider=kwargs.get("custom_llm_provider"),
+        request_bytes=tracing.payload_size(kwargs.get("messages")),
+    )
+
+
+def _deployment(kwargs: Dict[str, Any]) -> str:
+    # Rate limits of OpenAI-compatible servers apply per server and model.
+    return f"{kwargs.get('base_url') or kwargs.get('custom_llm_provider')}/{kwargs.get('model')}"
+
+
+def completion(*args, **kwargs):
+    """
+    Dispatches chat completion calls:
+    - OpenAI-compatible (e.g., vLLM) via LiteLLM when provider/base_url indicate OpenAI API
+    - Azure TRAPI client otherwise (existing path)
+    - Recorded trajectories for custom_llm_provider="replay"
+    Agent histories are compacted first when history compaction is on.
+    Responses are served from the completion cache when it is enabled. Model
+    calls are rate limited per deployment and transient failures retried.
+    """
+    with _llm_span(kwargs) as llm_span:
+        if kwargs.get("messages") is not None:
+            kwargs["messages"] = compact_history(kwargs["messages"], kwargs.get("model"))
+        if kwargs.get("custom_llm_provider") == REPLAY_PROVIDER:
+            res = get_replay_provider().completion(kwargs["messages"])
+            _record_usage(kwargs.get("model"), res, llm_span)
+            return res
+        cache = get_completion_cache()
+        if cache is not None:
+            key = request_key(kwargs)
+            cached = cache.lookup(key)
+            if cached is not None:
+                llm_span.set(source="cache")
+                return cached
+        model = kwargs.get("model")
+        use_openai_compatible, kwargs = _route(kwargs)
+        if use_openai_compatible:
+            res = rate_limited_call(_deployment(kwargs), llm_completion, *args, **kwargs)
+        else:
+            res = rate_limited_call(endpoint, client.complete, *args, **kwargs)
+        _record_usage(model, res, llm_span)
+        if cache is not None:
+            cache.store(key, model, res)
+        return res
+
+
+async def acompletion(*args, **kwargs):
+    """Async counterpart of `completion`, with the same dispatch and caching rules."""
+    with _llm_span(kwargs) as llm_span:
+        if kwargs.get("messages") is not None:
+            kwargs["messages"] = compact_history(kwargs["messages"], kwargs.get("model"))
+        if kwargs.get("custom_llm_provider") == REPLAY_PROVIDER:
+            res = await get_replay_provider().acompletion(kwargs["messages"])
+            _record_usage(kwargs.get("model"), res, llm_span)
+            return res
+        cache = get_completion_cache()
+        if cache is not None:
+            key = request_key(kwargs)
+            cached = cache.lookup(key)
+            if cached is not None:
+                llm_span.set(source="cache")
+                return cached
+        model = kwargs.get("model")
+        use_openai_compatible, kwargs = _route(kwargs)
+        if use_openai_compatible:
+            res = await rate_limited_acall(_deployment(kwargs), llm_acompletion, *args, **kwargs)
+        else:
+            res = await rate_limited_acall(endpoint, get_async_client(endpoint, api_version).complete, *args, **kwargs)
+        _record_usage(model, res, llm_span)
+        if cache is not None:
+            cache.store(key, model, res)
+        return res
@@ -27,6 +27,7 @@ class RewardOutputInfo(BaseModel):
 class RewardActionInfo(BaseModel):
     r_actions: float
     gt_data_hash: str
+    data_diff: Optional[Dict[str, List[str]]] = None
 
 
 class RewardResult(BaseModel):
@@ -46,6 +47,8 @@ class SolveResult(BaseModel):
 class EnvInfo(BaseModel):
     task: Task
     source: Optional[str] = None
+    # Set when the observation shown to the agent was projected.
+    raw_observation: Optional[str] = None
     user_cost: Optional[float] = None
     reward_info: Optional[RewardResult] = None
 
@@ -92,4 +95,19 @@ class RunConfig(BaseModel):
     few_shot_displays_path: Optional[str] = None
     mcp_server: str = None
     ckpt_path: str = ""
+    resume: bool = False
+    resume_only_successful: bool = False
+    shard_index: int = 0
+    num_shards: int = 1
+    completion_cache: str = "off"
+    completion_cache_path: Optional[str] = None
+    llm_rpm: Optional[int] = None
+    llm_tpm: Optional[int] = None
+    llm_max_in_flight: Optional[int] = None
+    llm_max_retries: int = 6
+    trace_path: Optional[str] = None
+    history_compaction: str = "off"
+    history_token_budget: Optional[int] = None
+    observation_encoding: str = "raw"
+    mcp_transport: str = "stdio"
     new_func: Optional[str] = None
@@ -0,0 +1,5 @@
+import os
+
+# Use the model cost map bundled with litellm instead of fetching it on import,
+# so the tests run offline and do not race its background download.
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
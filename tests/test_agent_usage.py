@@ -0,0 +1,47 @@
+import litellm
+
+from tau_bench import trapi_infer
+from tau_bench.agents.chat_react_agent import ChatReActAgent
+from tau_bench.agents.few_shot_agent import FewShotToolCallingAgent
+from tau_bench.globals import prompt_cache_usage
+from tau_bench.types import RESPOND_ACTION_NAME
+
+
+def _fake_completion(**kwargs):
+    return litellm.ModelResponse(
+        model=kwargs["model"],
+        choices=[{"index": 0, "message": {"role": "assistant", "content": 'Thought: hi\nAction: {"name": "respond", "arguments": {"content": "Hello"}}'}}],
+        usage={"prompt_tokens": 1000, "completion_tokens": 10, "total_tokens": 1010, "prompt_tokens_details": {"cached_tokens": 768}},
+    )
+
+
+class _Env(object):
+    def reset(self, task_index=None):
+        from tau_bench.types import EnvInfo, EnvResetResponse, Task
+
+        task = Task(user_id="u", actions=[], instruction="", outputs=[])
+        return EnvResetResponse(observation="Hi", info=EnvInfo(task=task))
+
+    def step(self, action):
+        from tau_bench.types import EnvInfo, EnvResponse, Task
+
+        task = Task(user_id="u", actions=[], instruction="", outputs=[])
+        return EnvResponse(observation="Bye", reward=1.0, done=True, info=EnvInfo(task=task))
+
+
+def _cached_tokens(model):
+    return prompt_cache_usage.summary().get(model, [0, 0, 0, 0.0])[2]
+
+
+def test_agents_record_cached_prompt_tokens(monkeypatch):
+    monkeypatch.setattr(trapi_infer, "llm_completion", _fake_completion)
+    agent = ChatReActAgent(tools_info=[], wiki="wiki", model="react-test-model", provider="openai")
+    _, action, cost = agent.generate_next_step([{"role": "user", "content": "Hi"}])
+    assert action.name == RESPOND_ACTION_NAME and cost == 1010
+    assert _cached_tokens("react-test-model") == 768
+
+    agent = FewShotToolCallingAgent(
+        tools_info=[], wiki="wiki", model="few-shot-test-model", provider="openai", few_shot_displays=["example"], num_few_shots=1
+    )
+    agent.solve(_Env())
+    assert _cached_tokens("few-shot-test-model") == 768
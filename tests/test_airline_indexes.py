@@ -0,0 +1,87 @@
+import copy
+import json
+
+import pytest
+
+from tau_bench.envs.airline.data import load_data
+from tau_bench.envs.airline.indexes import search_direct_flights, search_onestop_flights
+from tau_bench.envs.snapshot import Snapshot
+
+
+def scan_direct_flights(flights, origin, destination, date):
+    # The search as it was before the indexes, for reference.
+    results = []
+    for flight in flights.values():
+        if flight["origin"] == origin and flight["destination"] == destination:
+            if date in flight["dates"] and flight["dates"][date]["status"] == "available":
+                results.append({k: v for k, v in flight.items() if k != "dates"})
+                results[-1].update(flight["dates"][date])
+    return results
+
+
+def scan_onestop_flights(flights, origin, destination, date):
+    # The search as it was before the indexes, for reference.
+    results = []
+    for flight1 in flights.values():
+        if flight1["origin"] == origin:
+            for flight2 in flights.values():
+                if flight2["destination"] == destination and flight1["destination"] == flight2["origin"]:
+                    date2 = f"2024-05-{int(date[-2:])+1}" if "+1" in flight1["scheduled_arrival_time_est"] else date
+                    if flight1["scheduled_arrival_time_est"] > flight2["scheduled_departure_time_est"]:
+                        continue
+                    if date in flight1["dates"] and date2 in flight2["dates"]:
+                        if (
+                            flight1["dates"][date]["status"] == "available"
+                            and flight2["dates"][date2]["status"] == "available"
+                        ):
+                            result1 = {k: v for k, v in flight1.items() if k != "dates"}
+                            result1.update(flight1["dates"][date])
+                            result1["date"] = date
+                            result2 = {k: v for k, v in flight2.items() if k != "dates"}
+                            result2.update(flight2["dates"][date])
+                            result2["date"] = date2
+                            results.append([result1, result2])
+    return results
+
+
+def _search(search, flights, *args):
+    try:
+        return json.dumps(search(flights, *args))
+    except KeyError as e:
+        return f"KeyError: {e}"
+
+
+def _edit(flights):
+    flight_numbers = list(flights)
+    # A cancelled leg, a rerouted flight, a retimed flight, a deleted one and a new one.
+    first = flights[flight_numbers[0]]
+    date = next(iter(first["dates"]))
+    first["dates"][date]["status"] = "cancelled"
+    flights[flight_numbers[1]]["destination"] = flights[flight_numbers[2]]["origin"]
+    flights[flight_numbers[3]]["scheduled_departure_time_est"] = "23:30:00"
+    del flights[flight_numbers[4]]
+    new_flight = copy.deepcopy(flights[flight_numbers[5]])
+    new_flight["flight_number"] = "HAT999"
+    new_flight["origin"] = flights[flight_numbers[6]]["destination"]
+    flights["HAT999"] = new_flight
+
+
+def _assert_same_searches(plain, forked):
+    airports = sorted({f["origin"] for f in plain.values()} | {f["destination"] for f in plain.values()})
+    dates = sorted({date for f in plain.values() for date in f["dates"]})
+    for origin in airports:
+        for destination in airports:
+            for date in dates:
+                args = (origin, destination, date)
+                assert _search(search_direct_flights, forked, *args) == _search(scan_direct_flights, plain, *args), args
+                assert _search(search_onestop_flights, forked, *args) == _search(scan_onestop_flights, plain, *args), args
+
+
+@pytest.mark.parametrize("edited", [False, True])
+def test_indexed_search_matches_scan(edited):
+    plain = load_data()["flights"]
+    forked = Snapshot(load_data()).fork()["flights"]
+    if edited:
+        _edit(plain)
+        _edit(forked)
+    _assert_same_searches(plain, forked)
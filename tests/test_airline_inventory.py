@@ -0,0 +1,64 @@
+import copy
+
+import pytest
+
+from tau_bench.envs.airline.data import load_data
+from tau_bench.envs.airline.inventory import CABINS, available_flights
+from tau_bench.envs.snapshot import Snapshot
+
+
+def scan_available_flights(flights, date, cabin, origin=None, destination=None, max_price=None, min_seats=1):
+    results = []
+    for flight_number, flight in flights.items():
+        info = flight["dates"].get(date)
+        if info is None or info["status"] != "available":
+            continue
+        if origin is not None and flight["origin"] != origin:
+            continue
+        if destination is not None and flight["destination"] != destination:
+            continue
+        seats = info["available_seats"][cabin]
+        price = info["prices"][cabin]
+        if seats < min_seats or (max_price is not None and price > max_price):
+            continue
+        results.append(
+            {
+                "flight_number": flight_number,
+                "origin": flight["origin"],
+                "destination": flight["destination"],
+                "date": date,
+                "available_seats": seats,
+                "price": price,
+            }
+        )
+    return results
+
+
+def _edit(flights):
+    flight_numbers = list(flights)
+    for flight_number in flight_numbers[:20]:
+        for info in flights[flight_number]["dates"].values():
+            if info["status"] == "available":
+                info["available_seats"]["economy"] = 0
+                info["prices"]["business"] = 50
+    for info in flights[flight_numbers[20]]["dates"].values():
+        info["status"] = "cancelled"
+    del flights[flight_numbers[21]]
+    new_flight = copy.deepcopy(flights[flight_numbers[22]])
+    new_flight["origin"] = "JFK"
+    flights["HAT999"] = new_flight
+
+
+@pytest.mark.parametrize("edited", [False, True])
+def test_available_flights_matches_scan(edited):
+    plain = load_data()["flights"]
+    forked = Snapshot(load_data()).fork()["flights"]
+    if edited:
+        _edit(plain)
+        _edit(forked)
+    dates = sorted({date for flight in plain.values() for date in flight["dates"]})
+    queries = [{}, {"origin": "JFK"}, {"origin": "JFK", "destination": "SFO"}, {"max_price": 200}, {"min_seats": 10}]
+    for date in dates + ["2024-06-01"]:
+        for cabin in CABINS:
+            for query in queries:
+                assert available_flights(forked, date, cabin, **query) == scan_available_flights(plain, date, cabin, **query)
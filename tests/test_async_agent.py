@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from tau_bench.agents.base import AsyncAgent
+from tau_bench.agents.chat_react_agent import ChatReActAgent
+from tau_bench.agents.tool_calling_agent import ToolCallingAgent
+from tau_bench.run import agent_class
+from tau_bench.types import RunConfig
+
+
+class _EchoAgent(AsyncAgent):
+    async def solve_async(self, env, task_index=None, max_num_steps=30):
+        return task_index
+
+
+def _config(agent_strategy):
+    return RunConfig(model_provider="openai", user_model_provider="openai", model="m", agent_strategy=agent_strategy)
+
+
+def test_solve_runs_outside_an_event_loop():
+    assert _EchoAgent().solve(env=None, task_index=3) == 3
+
+
+def test_solve_inside_an_event_loop_points_to_solve_async():
+    async def main():
+        with pytest.raises(RuntimeError, match="solve_async"):
+            _EchoAgent().solve(env=None, task_index=3)
+        return await _EchoAgent().solve_async(env=None, task_index=4)
+
+    assert asyncio.run(main()) == 4
+
+
+def test_agent_class_resolves_without_building_an_agent():
+    assert agent_class(_config("tool-calling")) is ToolCallingAgent
+    assert issubclass(agent_class(_config("tool-calling")), AsyncAgent)
+    assert agent_class(_config("react")) is ChatReActAgent
+    assert not issubclass(agent_class(_config("react")), AsyncAgent)
+    with pytest.raises(ValueError, match="Unknown agent strategy"):
+        agent_class(_config("no-such-agent"))
@@ -0,0 +1,60 @@
+import json
+import os
+
+from tau_bench.checkpoint import CheckpointWriter, load_completed, results_path
+
+
+def _record(task_id, reward, trial=0, error=None):
+    info = {} if error is None else {"error": error, "traceback": ""}
+    return {"task_id": task_id, "reward": reward, "info": info, "traj": [], "trial": trial, "records": {}}
+
+
+def test_load_completed(tmp_path):
+    ckpt_path = os.path.join(tmp_path, "run.json")
+    with CheckpointWriter(os.path.join(tmp_path, "run.jsonl")) as writer:
+        writer.write(_record(0, 0.0))
+        writer.write(_record(1, 1.0))
+        writer.write(_record(2, 0.0, error="Connection closed"))
+        # Task 0 was run again and succeeded, so that result wins.
+        writer.write(_record(0, 1.0))
+        writer.write(_record(3, 0.0))
+    with open(os.path.join(tmp_path, "run.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(_record(4, 1.0))[:20])
+
+    completed = load_completed(ckpt_path)
+    assert sorted(completed) == [(0, 0), (0, 1), (0, 3)]
+    assert completed[(0, 0)].reward == 1.0
+
+    completed = load_completed(ckpt_path, only_successful=True)
+    assert sorted(completed) == [(0, 0), (0, 1)]
+
+
+def test_writer_terminates_truncated_line(tmp_path):
+    path = os.path.join(tmp_path, "run.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(_record(0, 1.0)) + "\n" + json.dumps(_record(1, 1.0))[:20])
+    with CheckpointWriter(path) as writer:
+        writer.write(_record(2, 1.0))
+    assert sorted(load_completed(path)) == [(0, 0), (0, 2)]
+
+
+def test_last_error_overrides_earlier_result(tmp_path):
+    path = os.path.join(tmp_path, "run.jsonl")
+    with CheckpointWriter(path) as writer:
+        writer.write(_record(0, 1.0))
+        writer.write(_record(0, 0.0, error="Timed out"))
+    assert load_completed(path) == {}
+
+
+def test_results_never_overwrite_the_jsonl_checkpoint(tmp_path):
+    path = os.path.join(tmp_path, "run.jsonl")
+    assert results_path(path) == os.path.join(tmp_path, "run.json")
+    assert results_path(os.path.join(tmp_path, "run.json")) == os.path.join(tmp_path, "run.json")
+    with CheckpointWriter(path) as writer:
+        writer.write(_record(0, 1.0))
+    with open(results_path(path), "w", encoding="utf-8") as f:
+        json.dump([_record(0, 1.0)], f)
+    # A resumed run appends to the checkpoint, which stays valid JSONL.
+    with CheckpointWriter(path) as writer:
+        writer.write(_record(1, 1.0))
+    assert sorted(load_completed(path)) == [(0, 0), (0, 1)]
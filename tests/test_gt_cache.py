@@ -0,0 +1,19 @@
+import os
+
+from tau_bench.envs.gt_cache import file_content_hash, tools_content_hash
+
+
+def test_hashes_follow_files_rewritten_in_place(tmp_path):
+    server = os.path.join(tmp_path, "server.py")
+    with open(server, "w") as f:
+        f.write("TOOLS = []\n")
+    file_hash, tools_hash = file_content_hash(server), tools_content_hash(server)
+    assert file_content_hash(server) == file_hash and tools_content_hash(server) == tools_hash
+
+    with open(server, "w") as f:
+        f.write("TOOLS = [1]\n")
+    st = os.stat(server)
+    # Make sure the rewrite is visible even on filesystems with coarse mtimes.
+    os.utime(server, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert file_content_hash(server) != file_hash
+    assert tools_content_hash(server) != tools_hash
@@ -0,0 +1,60 @@
+import json
+
+from tau_bench.history import HistoryCompactor
+
+
+def _call(call_id, name, arguments):
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}],
+    }
+
+
+def _output(call_id, name, content):
+    return {"role": "tool", "tool_call_id": call_id, "name": name, "content": json.dumps(content)}
+
+
+def _contents(messages):
+    return [message["content"] for message in messages if message["role"] == "tool"]
+
+
+def test_elides_record_returned_again():
+    order = {"order_id": "#W1", "status": "pending"}
+    messages = [
+        {"role": "user", "content": "Cancel my order"},
+        _call("1", "get_order_details", {"order_id": "#W1"}),
+        _output("1", "get_order_details", order),
+        _call("2", "cancel_pending_order", {"order_id": "#W1", "reason": "no longer needed"}),
+        _output("2", "cancel_pending_order", {**order, "status": "cancelled"}),
+    ]
+    compacted = HistoryCompactor("elide").compact(messages)
+    assert _contents(compacted)[0].startswith("[Output elided")
+    assert _contents(compacted)[1] == messages[-1]["content"]
+    assert _contents(messages)[0] == json.dumps(order)
+
+
+def test_elides_repeated_call():
+    messages = [
+        _call("1", "search_direct_flight", {"origin": "JFK", "destination": "SFO", "date": "2024-05-20"}),
+        _output("1", "search_direct_flight", []),
+        _call("2", "search_direct_flight", {"origin": "JFK", "destination": "SFO", "date": "2024-05-20"}),
+        _output("2", "search_direct_flight", []),
+    ]
+    assert _contents(HistoryCompactor("elide").compact(messages))[0].startswith("[Output elided")
+
+
+def test_keeps_other_records_sharing_an_argument():
+    user = {"name": {"first_name": "Ada"}, "reservations": ["R1"]}
+    messages = [
+        _call("1", "get_user_details", {"user_id": "ada_1"}),
+        _output("1", "get_user_details", user),
+        _call("2", "get_order_details", {"order_id": "#W1"}),
+        _output("2", "get_order_details", {"order_id": "#W1", "user_id": "ada_1"}),
+        _call("3", "book_reservation", {"user_id": "ada_1", "origin": "JFK", "destination": "SFO"}),
+        _output("3", "book_reservation", {"reservation_id": "R2", "user_id": "ada_1"}),
+        _call("4", "return_delivered_order_items", {"order_id": "#W2", "item_ids": ["1"]}),
+        _output("4", "return_delivered_order_items", {"order_id": "#W2"}),
+    ]
+    compacted = HistoryCompactor("elide").compact(messages)
+    assert _contents(compacted) == _contents(messages)
@@ -0,0 +1,90 @@
+import gc
+import json
+import os
+
+import pytest
+
+from tau_bench.checkpoint import CheckpointWriter, config_path, jsonl_path
+from tau_bench.shard import check_configs, launch, merge_results, shard_ckpt_path, shard_local_path
+
+
+def _record(task_id, trial, reward):
+    return {"task_id": task_id, "reward": reward, "info": {}, "traj": [], "trial": trial, "records": {}}
+
+
+def _write_shard(tmp_path, name, records, config):
+    ckpt_path = os.path.join(tmp_path, f"{name}.json")
+    with CheckpointWriter(jsonl_path(ckpt_path)) as writer:
+        for record in records:
+            writer.write(record)
+    with open(config_path(ckpt_path), "w") as f:
+        json.dump(config, f)
+    return ckpt_path
+
+
+def test_merge_results_keeps_last_result_per_pair(tmp_path):
+    config = {"env": "retail", "model": "m"}
+    a = _write_shard(tmp_path, "a", [_record(0, 0, 0.0), _record(1, 0, 1.0)], config)
+    b = _write_shard(tmp_path, "b", [_record(0, 0, 1.0), _record(0, 1, 0.0)], config)
+    results = merge_results([a, b])
+    assert [(r.task_id, r.trial, r.reward) for r in results] == [(0, 0, 1.0), (1, 0, 1.0), (0, 1, 0.0)]
+
+
+def test_check_configs_ignores_shard_local_fields(tmp_path):
+    a = _write_shard(tmp_path, "a", [], {"env": "retail", "shard_index": 0, "completion_cache_path": "/x"})
+    b = _write_shard(tmp_path, "b", [], {"env": "retail", "shard_index": 1, "completion_cache_path": "/y"})
+    assert check_configs([a, b]) == {"env": "retail"}
+
+
+def test_check_configs_rejects_different_settings(tmp_path):
+    a = _write_shard(tmp_path, "a", [], {"env": "retail", "model": "m", "seed": 10})
+    b = _write_shard(tmp_path, "b", [], {"env": "retail", "model": "n", "seed": 11})
+    with pytest.raises(ValueError, match="model, seed"):
+        check_configs([a, b])
+
+
+def test_shard_local_path():
+    assert shard_local_path("results/run.json", 1, 4) == "results/run_shard-1-of-4.json"
+    assert shard_local_path("results/run.jsonl", 1, 4) == "results/run_shard-1-of-4.jsonl"
+    assert shard_local_path("results/run.json", 0, 1) == "results/run.json"
+    launched = shard_ckpt_path("results/sweep", 2, 4)
+    assert shard_local_path(launched, 2, 4) == launched
+    assert len({shard_local_path("run.json", i, 4) for i in range(4)}) == 4
+
+
+RUN_SCRIPT = """
+import json
+import sys
+
+from tau_bench.envs import snapshot
+
+ckpt_path = sys.argv[sys.argv.index("--ckpt-path") + 1]
+with open(ckpt_path, "w") as f:
+    json.dump(sorted(map(str, snapshot._snapshots)), f)
+"""
+
+
+@pytest.mark.parametrize("transport", ["inprocess", "stdio"])
+def test_launch_shares_datasets_with_inprocess_shards(tmp_path, transport):
+    run_script = os.path.join(tmp_path, "fake_run.py")
+    with open(run_script, "w") as f:
+        f.write(RUN_SCRIPT)
+    try:
+        ckpt_paths = launch(2, os.path.join(tmp_path, "sweep"), ["--env", "airline", "--mcp-transport", transport], run_script)
+    finally:
+        gc.unfreeze()
+    for ckpt_path in ckpt_paths:
+        with open(ckpt_path) as f:
+            loaded = json.load(f)
+        assert loaded == (["tau_bench.envs.airline.data:load_data"] if transport == "inprocess" else [])
+
+
+def test_more_shards_than_tasks(capsys):
+    from tau_bench.run import display_metrics, shard_of
+
+    jobs = [(0, task_id) for task_id in range(2)]
+    shards = [[job for job in jobs if shard_of(job, 8) == i] for i in range(8)]
+    assert sorted(job for shard in shards for job in shard) == jobs
+    assert any(len(shard) == 0 for shard in shards)
+    display_metrics([])
+    assert "No results" in capsys.readouterr().out
@@ -0,0 +1,111 @@
+import copy
+import json
+
+import pytest
+
+from tau_bench.envs.hashing import changed_records, consistent_hash, data_hash, to_hashable
+from tau_bench.envs.retail.data import load_data
+from tau_bench.envs.snapshot import Snapshot, find_items
+
+
+def _data():
+    return {
+        "users": {
+            "u1": {"name": "Ada", "zip": "10001", "orders": ["o1"]},
+            "u2": {"name": "Bob", "zip": "94105", "orders": []},
+        },
+        "orders": {"o1": {"user_id": "u1", "items": [{"item_id": "i1", "price": 10.0}], "status": "pending"}},
+        "version": [1],
+    }
+
+
+def _edit(data):
+    for user_id in list(data["users"]):
+        data["users"][user_id]["orders"].append("o2")
+    for order_id in list(data["orders"]):
+        data["orders"][order_id]["items"][0]["price"] = 12.5
+    data["orders"]["o2"] = {"user_id": "u1", "items": [], "status": "pending"}
+    del data["users"]["u2"]
+
+
+def test_scan_does_not_copy():
+    forked = Snapshot(_data()).fork()
+    assert [user["name"] for user in forked["users"].values()] == ["Ada", "Bob"]
+    assert [order_id for order_id, _ in forked["orders"].items()] == ["o1"]
+    assert json.dumps(forked["orders"].values()) == json.dumps(list(_data()["orders"].values()))
+    assert forked["users"].overlay == {} and forked["orders"].overlay == {}
+    assert changed_records(forked) == {}
+
+
+def test_scanned_records_are_read_only():
+    snapshot = Snapshot(_data())
+    forked = snapshot.fork()
+    other = snapshot.fork()
+    for _, user in forked["users"].items():
+        with pytest.raises(TypeError):
+            user["zip"] = "60601"
+        with pytest.raises(TypeError):
+            user["orders"].append("o2")
+    order = forked["orders"].values()[0]
+    with pytest.raises(TypeError):
+        order["items"][0].update(price=12.5)
+    copied = copy.deepcopy(order)
+    copied["items"][0]["price"] = 12.5
+    assert {k: v for k, v in other["users"].items()} == _data()["users"]
+    assert other["orders"]["o1"] == _data()["orders"]["o1"]
+
+
+def test_writes_go_to_the_fork():
+    snapshot = Snapshot(_data())
+    forked = snapshot.fork()
+    other = snapshot.fork()
+    _edit(forked)
+    assert forked["users"]["u1"]["orders"] == ["o1", "o2"]
+    assert forked["orders"]["o1"]["items"][0]["price"] == 12.5
+    assert {k: v for k, v in other["users"].items()} == _data()["users"]
+    assert list(other["orders"].values()) == list(_data()["orders"].values())
+
+    snapshot.reset_fork(forked)
+    assert {k: v for k, v in forked["users"].items()} == _data()["users"]
+
+
+def test_find_items_sees_writes_made_through_lookups():
+    snapshot = Snapshot(_data())
+    forked = snapshot.fork()
+    for user_id in list(forked["users"]):
+        forked["users"][user_id]["zip"] = "60601"
+    assert [user_id for user_id, _ in find_items(forked["users"], lambda user: user["zip"], "60601")] == ["u1", "u2"]
+    assert find_items(forked["users"], lambda user: user["zip"], "10001") == []
+    assert [user_id for user_id, _ in find_items(snapshot.fork()["users"], lambda user: user["zip"], "10001")] == ["u1"]
+
+
+def test_data_hash_matches_plain_dict():
+    plain = _data()
+    forked = Snapshot(_data()).fork()
+    assert data_hash(forked) == data_hash(plain)
+    _edit(plain)
+    _edit(forked)
+    assert data_hash(forked) == data_hash(plain)
+    assert changed_records(forked) == {
+        "users": {"u1": changed_records(plain)["users"]["u1"], "u2": None},
+        "orders": changed_records(plain)["orders"],
+    }
+
+
+def test_data_hash_tracks_full_hash_on_retail_data():
+    plain = load_data()
+    forked = Snapshot(load_data()).fork()
+    # Reading every record copies it into the fork without changing it.
+    for user_id in list(forked["users"]):
+        forked["users"][user_id]
+    assert len(forked["users"].overlay) == len(plain["users"])
+    assert changed_records(forked) == {}
+    assert data_hash(forked) == data_hash(plain)
+    order_id = next(iter(plain["orders"]))
+    for data in (plain, forked):
+        data["orders"][order_id]["status"] = "cancelled"
+    assert data_hash(forked) == data_hash(plain)
+    assert data_hash(forked) != data_hash(load_data())
+    assert consistent_hash(to_hashable(forked["orders"][order_id])) == consistent_hash(
+        to_hashable(plain["orders"][order_id])
+    )
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from tau_bench.envs.state_store import SessionFastMCP, get_data, state_store
+
+
+def _servers():
+    servers = []
+    for source in ["tau_bench.envs.retail.data:load_data", "tau_bench.envs.airline.data:load_data"]:
+        mcp = SessionFastMCP(f"test server for {source}", default_source=source)
+
+        @mcp.tool()
+        def collections() -> list:
+            return sorted(get_data())
+
+        servers.append(mcp)
+    return servers
+
+
+def _call(mcp, name, arguments):
+    async def call():
+        return await mcp.call_tool(name, arguments)
+
+    return asyncio.run(call())
+
+
+def test_default_session_is_per_server():
+    retail, airline = _servers()
+    assert "flights" in str(_call(airline, "collections", {}))
+    assert "orders" in str(_call(retail, "collections", {}))
+    assert "flights" in str(_call(airline, "collections", {}))
+    assert retail.default_session_id != airline.default_session_id
+
+
+def test_explicit_session_wins_over_default():
+    retail, airline = _servers()
+    session_id = state_store.open("tau_bench.envs.airline.data:load_data")
+    try:
+        assert "flights" in str(_call(retail, "collections", {"session_id": session_id}))
+    finally:
+        state_store.close(session_id)
+
+
+def test_get_data_needs_a_session():
+    with pytest.raises(RuntimeError):
+        get_data()
@@ -0,0 +1,67 @@
+import pytest
+import requests
+
+from tau_bench.model_utils.model import vllm_utils
+from tau_bench.model_utils.model.vllm_utils import MicroBatcher, completions_request, send_batched, shared_batcher
+
+
+class _Response(object):
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        return self.body
+
+
+def _fake_server(monkeypatch, too_long="too long"):
+    requests_sent = []
+
+    def post(url, json):
+        requests_sent.append(list(json["prompt"]))
+        if too_long in json["prompt"]:
+            return _Response(400, {"error": "prompt is too long"})
+        choices = [{"index": i, "text": "" if prompt == "empty" else prompt.upper()} for i, prompt in enumerate(json["prompt"])]
+        return _Response(200, {"choices": choices})
+
+    monkeypatch.setattr(vllm_utils.requests, "post", post)
+    return requests_sent
+
+
+def test_empty_completion_fails_only_its_prompt(monkeypatch):
+    _fake_server(monkeypatch)
+    texts = completions_request("http://vllm/v1/completions", "m", ["a", "empty", "b"])
+    assert texts[0] == "A" and texts[2] == "B"
+    assert isinstance(texts[1], ValueError)
+
+
+def test_failed_batch_is_retried_per_prompt(monkeypatch):
+    sent = _fake_server(monkeypatch)
+    results = send_batched(lambda batch: completions_request("http://vllm/v1/completions", "m", batch), ["a", "too long", "b"])
+    assert results[0] == "A" and results[2] == "B"
+    assert isinstance(results[1], requests.HTTPError)
+    assert sent[0] == ["a", "too long", "b"] and sorted(map(tuple, sent[1:])) == [("a",), ("b",), ("too long",)]
+
+
+def test_batcher_raises_only_in_the_failed_caller(monkeypatch):
+    _fake_server(monkeypatch)
+    batcher = MicroBatcher(
+        lambda key, batch: send_batched(lambda b: completions_request("http://vllm/v1/completions", "m", b), batch),
+        window_ms=0,
+    )
+    assert batcher.submit(None, "a") == "A"
+    with pytest.raises(requests.HTTPError):
+        batcher.submit(None, "too long")
+
+
+def test_shared_batcher_keeps_settings_apart():
+    def send(key, items):
+        return items
+
+    assert shared_batcher("server", send, window_ms=5, max_batch_size=8) is shared_batcher("server", send, window_ms=5, max_batch_size=8)
+    other = shared_batcher("server", send, window_ms=0, max_batch_size=1)
+    assert other.window == 0 and other.max_batch_size == 1